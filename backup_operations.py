@@ -0,0 +1,217 @@
+"""
+backup_operations.py
+
+This module manages the backups and uploads of the parental accounts workbook on the Nextcloud server.
+Instead of uploading the full workbook on every run, it keeps track of the content (SHA-256 hash) that
+is known to exist at which URL:
+
+- A backup is skipped if the workbook has not changed since the last backup.
+- If the same bytes already exist on the server, the backup or upload is created with a WebDAV COPY
+  instead of transferring the file again.
+- An upload is skipped if the target already holds exactly this content.
+
+The state is stored in a small JSON file. COPY sources are either earlier backups, which are never
+edited, or files whose ETag is known; in the latter case the COPY is sent with If-Match, so a file that
+has been edited on the server in the meantime is never copied. Uploads may run in parallel threads (see
+transfer_scheduler.py); the state file is only read and written under a lock and the transfers record
+their result by reloading it, so concurrent uploads do not lose each other's entries.
+
+Functions:
+- file_hash: Computes the SHA-256 hash of a local file.
+- remember_remote: Records that a downloaded file is present at a URL.
+- backup_file: Creates a backup of a local file unless it is unchanged.
+- upload_file: Uploads a local file, using COPY or skipping it where possible.
+"""
+import hashlib
+import json
+import os
+import threading
+import logging
+from file_operations import copy_file, put_file
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = "elternaccounts-backups.json"
+
+_status_lock = threading.Lock()
+
+
+def file_hash(path: str) -> str:
+    """
+    Computes the SHA-256 hash of a local file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _lade_status(state_path: str) -> dict:
+    """Loads the backup state, or returns an empty state."""
+    status = {"last_backup": None, "backups": {}, "remote": {}}
+    try:
+        with open(state_path, "r", encoding="utf-8") as file:
+            status.update(json.load(file))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Backup-Status {state_path} konnte nicht gelesen werden: {e}")
+    return status
+
+
+def _speichere_status(status: dict, state_path: str) -> None:
+    """Writes the backup state atomically."""
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(status, file, indent=1)
+    os.replace(tmp_path, state_path)
+
+
+def _kopiere_vorhandene(
+    status: dict, digest: str, url: str, username: str, password: str
+) -> bool:
+    """Tries to create ``url`` by copying a file with the same content on the server."""
+    for quelle in status["backups"].get(digest, []):
+        if quelle != url and copy_file(quelle, url, username, password):
+            return True
+    for quelle, eintrag in status["remote"].items():
+        if (
+            quelle != url
+            and eintrag.get("hash") == digest
+            and eintrag.get("etag")
+            and copy_file(quelle, url, username, password, eintrag["etag"])
+        ):
+            return True
+    return False
+
+
+def _uebertrage(
+    path: str,
+    digest: str,
+    url: str,
+    username: str,
+    password: str,
+    status: dict,
+    allow_copy: bool = True,
+) -> tuple:
+    """
+    Creates ``url`` with the content of ``path`` by COPY or PUT.
+
+    Returns the result and the new state entry for ``url`` (None if the transfer failed).
+    """
+    if allow_copy and _kopiere_vorhandene(status, digest, url, username, password):
+        return "kopiert", {"hash": digest, "etag": None}
+    etag = put_file(url, path, username, password)
+    if etag is None:
+        return "fehlgeschlagen", None
+    return "hochgeladen", {"hash": digest, "etag": etag or None}
+
+
+def _vermerke(status: dict, url: str, eintrag) -> None:
+    """Records the state entry of ``url`` returned by _uebertrage."""
+    if eintrag is None:
+        status["remote"].pop(url, None)
+    else:
+        status["remote"][url] = eintrag
+
+
+def remember_remote(url: str, path: str, etag: str, state_path: str = STATE_PATH) -> None:
+    """
+    Records that the content of a local file is present at a URL, e.g. right after downloading it.
+
+    Args:
+        url (str): The URL the file was downloaded from.
+        path (str): The local copy of the file.
+        etag (str): The ETag returned by the server, or None if unknown.
+        state_path (str): Path to the JSON state file.
+    """
+    digest = file_hash(path)
+    with _status_lock:
+        status = _lade_status(state_path)
+        status["remote"][url] = {"hash": digest, "etag": etag or None}
+        _speichere_status(status, state_path)
+
+
+def backup_file(
+    path: str, backup_url: str, username: str, password: str, state_path: str = STATE_PATH
+) -> str:
+    """
+    Creates a backup of a local file on the server unless its content is unchanged.
+
+    Args:
+        path (str): The local file.
+        backup_url (str): The URL of the new backup.
+        username (str): The username for HTTP Basic Authentication.
+        password (str): The password for HTTP Basic Authentication.
+        state_path (str): Path to the JSON state file.
+
+    Returns:
+        str: "unverändert" if the backup was skipped, "kopiert" if it was created with COPY,
+        "hochgeladen" if the file was uploaded and "fehlgeschlagen" if the upload failed.
+    """
+    digest = file_hash(path)
+    with _status_lock:
+        status = _lade_status(state_path)
+    if digest == status["last_backup"]:
+        logger.info(f"Backup übersprungen, {path} ist seit dem letzten Backup unverändert")
+        return "unverändert"
+
+    ergebnis, eintrag = _uebertrage(path, digest, backup_url, username, password, status)
+    with _status_lock:
+        status = _lade_status(state_path)
+        _vermerke(status, backup_url, eintrag)
+        if eintrag is not None:
+            status["last_backup"] = digest
+            status["backups"].setdefault(digest, []).append(backup_url)
+        _speichere_status(status, state_path)
+    logger.info(f"Backup {backup_url}: {ergebnis}")
+    return ergebnis
+
+
+def upload_file(
+    path: str,
+    url: str,
+    username: str,
+    password: str,
+    state_path: str = STATE_PATH,
+    allow_copy: bool = True,
+) -> str:
+    """
+    Uploads a local file unless the target already holds the same content.
+
+    If the content exists elsewhere on the server, the target is created with COPY. A COPY replaces
+    the target file on the server, so shared files (whose shares would be lost) should be uploaded
+    with ``allow_copy=False``.
+
+    Args:
+        path (str): The local file.
+        url (str): The target URL.
+        username (str): The username for HTTP Basic Authentication.
+        password (str): The password for HTTP Basic Authentication.
+        state_path (str): Path to the JSON state file.
+        allow_copy (bool): Whether the target may be created with COPY.
+
+    Returns:
+        str: "unverändert", "kopiert", "hochgeladen" or "fehlgeschlagen", see backup_file.
+    """
+    digest = file_hash(path)
+    with _status_lock:
+        status = _lade_status(state_path)
+    if status["remote"].get(url, {}).get("hash") == digest:
+        logger.info(f"Upload übersprungen, {url} ist bereits aktuell")
+        return "unverändert"
+
+    ergebnis, eintrag = _uebertrage(path, digest, url, username, password, status, allow_copy)
+    with _status_lock:
+        status = _lade_status(state_path)
+        _vermerke(status, url, eintrag)
+        _speichere_status(status, state_path)
+    logger.info(f"Upload {url}: {ergebnis}")
+    return ergebnis
@@ -0,0 +1,125 @@
+"""
+benchmark_mail.py
+
+This script measures the throughput of the mail sending against a local stand-in SMTP server
+(smtp_sink.py) that simulates the round-trip latency of a real provider. It compares the batched sending
+over one connection (email_operations.sende_batches) with the MailDispatcher from mail_dispatcher.py
+for different numbers of worker threads. It runs completely offline.
+
+For every variant it reports the number of SMTP transactions, the accepted recipients, the run time and
+the recipients per second.
+
+Usage:
+    python benchmark_mail.py
+    python benchmark_mail.py --recipients 5000 --batch-size 1 --workers 1 4 8 --latency 0.01
+
+Note:
+email_operations imports the elternaccounts_credentials module, so it has to exist (e.g. as a copy of
+elternaccounts_credentials_copy.py). No network access takes place.
+"""
+import argparse
+import os
+import tempfile
+import time
+from email_operations import erstelle_nachricht, sende_batches
+from mail_dispatcher import MailDispatcher, MailQueue, enqueue_batches
+from smtp_sink import SmtpSink, verbinde_plain
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _empfaenger(anzahl: int) -> list:
+    return [f"eltern{nr}@example.org" for nr in range(anzahl)]
+
+
+def benchmark_batches(recipients: int, batch_size: int, latenz: float) -> dict:
+    """
+    Sends to all recipients with sende_batches over a single connection.
+
+    Args:
+        recipients (int): Number of recipients.
+        batch_size (int): Recipients per SMTP transaction.
+        latenz (float): Simulated latency per SMTP command in seconds.
+
+    Returns:
+        dict: transaktionen, empfaenger, seconds and per_second.
+    """
+    msg = erstelle_nachricht("Benchmark", "Testnachricht", "schule@example.org", "schule@example.org")
+    with SmtpSink(latenz=latenz) as sink:
+        start = time.perf_counter()
+        sende_batches(
+            _empfaenger(recipients), msg, sink.host, sink.port, "u", "p", batch_size, verbinde_plain
+        )
+        seconds = time.perf_counter() - start
+        return {
+            "transaktionen": len(sink.nachrichten),
+            "empfaenger": sink.empfaenger(),
+            "seconds": seconds,
+            "per_second": sink.empfaenger() / seconds,
+        }
+
+
+def benchmark_dispatcher(
+    recipients: int, batch_size: int, workers: int, latenz: float, rate: float
+) -> dict:
+    """
+    Sends to all recipients with a MailDispatcher.
+
+    Args:
+        recipients (int): Number of recipients.
+        batch_size (int): Recipients per SMTP transaction.
+        workers (int): Number of worker threads and connections.
+        latenz (float): Simulated latency per SMTP command in seconds.
+        rate (float): Limit of the token bucket in recipients per second.
+
+    Returns:
+        dict: transaktionen, empfaenger, seconds and per_second.
+    """
+    msg = erstelle_nachricht("Benchmark", "Testnachricht", "schule@example.org", "schule@example.org")
+    with tempfile.TemporaryDirectory() as tmp, SmtpSink(latenz=latenz) as sink:
+        queue = MailQueue(os.path.join(tmp, "queue.sqlite"))
+        enqueue_batches(queue, "benchmark", _empfaenger(recipients), msg, batch_size)
+        dispatcher = MailDispatcher(
+            queue, sink.host, sink.port, "u", "p", workers=workers, rate=rate,
+            burst=max(batch_size, workers), verbinde=verbinde_plain,
+        )
+        ergebnis = dispatcher.run()
+        queue.close()
+        return {
+            "transaktionen": len(sink.nachrichten),
+            "empfaenger": sink.empfaenger(),
+            "seconds": ergebnis["sekunden"],
+            "per_second": sink.empfaenger() / ergebnis["sekunden"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für den Mailversand")
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--rate", type=float, default=1e9, help="Empfänger pro Sekunde")
+    args = parser.parse_args()
+
+    print(f"{'Variante':>16} {'Transakt.':>10} {'Empfänger':>10} {'Zeit [s]':>9} {'Empf./s':>9}")
+    ergebnisse = [("sende_batches", benchmark_batches(args.recipients, args.batch_size, args.latency))]
+    for workers in args.workers:
+        ergebnisse.append(
+            (
+                f"Dispatcher x{workers}",
+                benchmark_dispatcher(
+                    args.recipients, args.batch_size, workers, args.latency, args.rate
+                ),
+            )
+        )
+    for name, ergebnis in ergebnisse:
+        print(
+            f"{name:>16} {ergebnis['transaktionen']:>10} {ergebnis['empfaenger']:>10} "
+            f"{ergebnis['seconds']:>9.2f} {ergebnis['per_second']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
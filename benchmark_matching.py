@@ -0,0 +1,92 @@
+"""
+benchmark_matching.py
+
+This script measures the throughput and accuracy of createElternaccounts on synthetic schools created
+with synthetic_school.py. It runs completely offline.
+
+For every school size it reports:
+- the run time of createElternaccounts (reading the files, matching and writing both CSV outputs),
+- the peak memory allocated by Python during the run (tracemalloc),
+- precision and recall of the generated accounts against the ground truth.
+
+Usage:
+    python benchmark_matching.py
+    python benchmark_matching.py --sizes 1000 10000 --workers 4 --seed 2
+
+Note:
+data_processing imports the elternaccounts_credentials module, so it has to exist (e.g. as a copy of
+elternaccounts_credentials_copy.py). No network access takes place.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from data_processing import createElternaccounts
+from synthetic_school import write_school
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark(students: int, seed: int = 1, workers: int = None) -> dict:
+    """
+    Runs createElternaccounts on a synthetic school and evaluates the result.
+
+    Args:
+        students (int): Number of students of the synthetic school.
+        seed (int): Seed for the generator.
+        workers (int, optional): Passed on to createElternaccounts.
+
+    Returns:
+        dict: The measured values: students, children, seconds, peak_mb, precision and recall.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        schildexport = os.path.join(tmp, "schild.csv")
+        formsdatei = os.path.join(tmp, "forms.xlsx")
+        kontrolloutput = os.path.join(tmp, "elternaccounts-control.csv")
+        outputfile = os.path.join(tmp, "elternaccounts.csv")
+        truth = write_school(schildexport, formsdatei, students, seed)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        createElternaccounts(
+            formsdatei, schildexport, kontrolloutput, outputfile, workers=workers
+        )
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        output = pd.read_csv(outputfile, sep=";")
+        predicted = set(zip(output["email"], output["student-id"].astype(int)))
+
+    korrekt = len(predicted & truth)
+    return {
+        "students": students,
+        "children": len(truth),
+        "seconds": seconds,
+        "peak_mb": peak / 2**20,
+        "precision": korrekt / len(predicted) if predicted else 0.0,
+        "recall": korrekt / len(truth) if truth else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für createElternaccounts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'Schüler':>8} {'Kinder':>8} {'Zeit [s]':>9} {'Peak [MB]':>10} {'Precision':>10} {'Recall':>8}")
+    for students in args.sizes:
+        ergebnis = benchmark(students, args.seed, args.workers)
+        print(
+            f"{ergebnis['students']:>8} {ergebnis['children']:>8} {ergebnis['seconds']:>9.2f} "
+            f"{ergebnis['peak_mb']:>10.1f} {ergebnis['precision']:>10.4f} {ergebnis['recall']:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
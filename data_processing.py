@@ -6,25 +6,51 @@ It focuses on updating XLSX files with data from CSV files and creating parental
 on form data and Schild CSV exports, adhering to specific data merging and validation rules.
 
 Functions:
+- write_xlsx: Writes a DataFrame to an XLSX file in a single streaming pass.
+- append_xlsx: Appends only new submissions of a CSV file to an XLSX file.
 - update_xlsx: Updates an XLSX file with data from a CSV file and backs it up.
+- matchElternaccounts: Matches the children of the form data against a Schild export and returns MatchResult objects.
+- kontroll_dataframe: Builds the control output from match results.
+- accounts_dataframe: Builds the parental accounts from match results.
 - createElternaccounts: Matches and generates parental accounts using form data and Schild CSV exports.
 
 Requirements:
 - pandas: For data manipulation.
 - openpyxl: For handling XLSX file operations.
-- Additional custom modules: file_operations, elternaccounts_credentials, mappings, utils.
+- Additional custom modules: backup_operations, elternaccounts_credentials, mappings, utils, matching.
 - Logging is configured to capture debug information.
 
 Note:
 Credentials and Nextcloud paths are managed through the elternaccounts_credentials module.
 """
 from datetime import datetime
+import math
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 import pandas as pd
 import openpyxl as px
-from file_operations import put_file
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from backup_operations import backup_file
 import elternaccounts_credentials
 import mappings
-from utils import similar, returnUsername
+from utils import returnUsername
+from matching import (
+    build_klassen_index,
+    build_phonetik_index,
+    FALLBACK_SCHWELLE,
+    klassen_fingerprint,
+    match_fallback,
+    match_klassen,
+    MatchCache,
+    MatchResult,
+    normalisiere_forms,
+    normalisiere_schild,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,103 +62,938 @@ webdav_backup = elternaccounts_credentials.url_elternaccounts_backup
 webdav_share = elternaccounts_credentials.url_elternaccounts_share
 
 
-def update_xlsx(csv_path: str, xlsx_path: str) -> None:
+# Spalten, deren Breite an den längsten Eintrag angepasst wird
+AUTOBREITE_SPALTEN = ["F", "P", "I", "L", "O"]
+
+# Feste Spaltenbreiten
+SPALTENBREITEN = {
+    "A": 2,
+    "B": 2,
+    "C": 2,
+    "D": 9,
+    "E": 15,
+    "G": 15,
+    "H": 9,
+    "J": 9,
+    "K": 9,
+    "M": 9,
+    "N": 9,
+    "Q": 11,
+}
+
+
+def _spaltenbreiten(df: pd.DataFrame) -> dict:
+    """
+    Compute the column widths of the workbook directly from the DataFrame.
+
+    The columns in AUTOBREITE_SPALTEN get the length of their longest entry (including the header)
+    plus 2, using vectorised string lengths; all other widths come from SPALTENBREITEN.
+    """
+    breiten = {}
+    for spalte in AUTOBREITE_SPALTEN:
+        nr = px.utils.column_index_from_string(spalte) - 1
+        if nr >= len(df.columns):
+            continue
+        werte = df.iloc[:, nr]
+        laengen = werte.astype(str).str.len().where(werte.notna() & (werte != ""), 0)
+        breiten[spalte] = max(len(str(df.columns[nr])), int(laengen.max() or 0)) + 2
+    breiten.update(SPALTENBREITEN)
+    return breiten
+
+
+def write_xlsx(df: pd.DataFrame, xlsx_path: str) -> None:
+    """
+    Write a DataFrame to an XLSX file in a single streaming pass.
+
+    Column widths are computed from the DataFrame before writing, so the workbook does not have to 
+    be reopened afterwards. Header, data rows, auto-filter and column dimensions are written in one 
+    openpyxl write-only save, which keeps run time and memory flat as the workbook grows.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        xlsx_path (str): The path to the target XLSX file.
+
+    Returns:
+        None
+
+    Side Effects:
+        - Overwrites the specified XLSX file.
+    """
+    wb = px.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+
+    for spalte, breite in _spaltenbreiten(df).items():
+        ws.column_dimensions[spalte].width = breite
+    letzte_spalte = px.utils.get_column_letter(max(len(df.columns), 1))
+    ws.auto_filter.ref = f"A1:{letzte_spalte}{len(df) + 1}"
+
+    header = []
+    for titel in df.columns:
+        cell = WriteOnlyCell(ws, value=str(titel))
+        cell.font = Font(bold=True)
+        cell.border = Border(
+            left=Side(style="thin"),
+            right=Side(style="thin"),
+            top=Side(style="thin"),
+            bottom=Side(style="thin"),
+        )
+        cell.alignment = Alignment(horizontal="center", vertical="top")
+        header.append(cell)
+    ws.append(header)
+
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(value) else value for value in row])
+
+    wb.save(xlsx_path)
+
+
+XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+TABLE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/table"
+
+# Zeichen, die in XML 1.0 nicht erlaubt sind
+_XML_UNGUELTIG = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Elemente des Arbeitsblatts auf Byte-Ebene, mit oder ohne Namensraum-Präfix
+_ZEILE_RE = re.compile(rb'<((?:\w+:)?)row\b[^>]*?\sr="(\d+)"')
+_ZEILENENDE_RE = re.compile(rb"</(?:\w+:)?row>")
+_ZELLE_RE = re.compile(rb"<(?:\w+:)?c\b([^>]*)>")
+_SHEETDATA_ENDE_RE = re.compile(rb"</(?:\w+:)?sheetData>")
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\b[^>]*?\sref="(?:[A-Z]+\d+:)?([A-Z]+)(\d+)"')
+_FILTERBEREICH_RE = re.compile(
+    rb'(<(?:\w+:)?definedName(?=[^>]*\bname="_xlnm\._FilterDatabase")(?=[^>]*\blocalSheetId="0")'
+    rb'[^>]*>[^<]*?:\$)([A-Z]+)\$(\d+)<'
+)
+
+# Kopf des Zeitstempel-Index: letzte Zeile der Arbeitsmappe, für die er geschrieben wurde.
+# Der Index enthält die Zeitstempel in UTC (siehe _zeitstempel_schluessel); ältere Indexdateien
+# mit den Zeitstempeln als Text haben einen anderen Kopf und werden neu erstellt.
+INDEX_KOPF = "# utc-zeilen="
+
+
+def _xlsx_erstes_blatt(zin: zipfile.ZipFile) -> str:
+    """Return the path of the first worksheet inside an XLSX archive."""
+    workbook = ET.fromstring(zin.read("xl/workbook.xml"))
+    rid = workbook.find(f"{XLSX_NS}sheets/{XLSX_NS}sheet").get(f"{REL_NS}id")
+    rels = ET.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{PKG_REL_NS}Relationship"):
+        if rel.get("Id") == rid:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise ValueError("Kein Arbeitsblatt in der XLSX-Datei gefunden")
+
+
+def _xlsx_tabellen(zin: zipfile.ZipFile, blatt: str) -> set:
+    """Return the paths of the tables (list objects) defined on a worksheet."""
+    ordner, name = posixpath.split(blatt)
+    rels_path = f"{ordner}/_rels/{name}.rels"
+    if rels_path not in zin.namelist():
+        return set()
+    rels = ET.fromstring(zin.read(rels_path))
+    return {
+        posixpath.normpath(posixpath.join(ordner, rel.get("Target")))
+        if not rel.get("Target").startswith("/")
+        else rel.get("Target").lstrip("/")
+        for rel in rels.iter(f"{PKG_REL_NS}Relationship")
+        if rel.get("Type") == TABLE_REL
+    }
+
+
+def _xlsx_kopfzeile(zin: zipfile.ZipFile, blatt: str) -> dict:
+    """
+    Read only the header row of a worksheet.
+
+    Returns a dict mapping the column titles to their column letters. The worksheet is parsed only
+    up to the end of the first row, and shared strings only up to the highest index used there.
+    """
+    kopf = {}
+    shared = {}
+    with zin.open(blatt) as datei:
+        for _, element in ET.iterparse(datei, events=("end",)):
+            if element.tag == f"{XLSX_NS}c":
+                spalte = re.match(r"[A-Z]+", element.get("r")).group()
+                typ = element.get("t")
+                if typ == "inlineStr":
+                    kopf[spalte] = "".join(element.find(f"{XLSX_NS}is").itertext())
+                elif element.find(f"{XLSX_NS}v") is not None:
+                    wert = element.find(f"{XLSX_NS}v").text
+                    if typ == "s":
+                        shared[spalte] = int(wert)
+                    else:
+                        kopf[spalte] = wert
+            elif element.tag == f"{XLSX_NS}row":
+                break
+
+    if shared:
+        benoetigt = max(shared.values())
+        texte = []
+        with zin.open("xl/sharedStrings.xml") as datei:
+            for _, element in ET.iterparse(datei, events=("end",)):
+                if element.tag == f"{XLSX_NS}si":
+                    texte.append(
+                        "".join(t.text or "" for t in element.iter(f"{XLSX_NS}t"))
+                    )
+                    element.clear()
+                    if len(texte) > benoetigt:
+                        break
+        for spalte, nr in shared.items():
+            kopf[spalte] = texte[nr]
+    return {titel: spalte for spalte, titel in kopf.items()}
+
+
+def _xlsx_dimension(zin: zipfile.ZipFile, blatt: str):
+    """
+    Return ``(letzte_spalte, letzte_zeile)`` of the used range of a worksheet, or None.
+
+    Only the ``dimension`` element at the start of the worksheet is read, so the cost does not
+    depend on the number of rows. None is returned if the worksheet has no such element.
+    """
+    kopf = b""
+    with zin.open(blatt) as datei:
+        for chunk in iter(lambda: datei.read(1 << 16), b""):
+            kopf += chunk
+            if b"sheetData" in kopf:
+                break
+    treffer = _DIMENSION_RE.search(kopf.split(b"sheetData")[0])
+    if treffer is None:
+        return None
+    return px.utils.column_index_from_string(treffer.group(1).decode()), int(treffer.group(2))
+
+
+def _xlsx_attribute(tag: bytes) -> dict:
+    """Return the attributes of an XML start tag as a dict of strings."""
+    return {
+        name.decode(): wert.decode()
+        for name, wert in re.findall(rb'([\w:]+)="([^"]*)"', tag)
+    }
+
+
+def _xlsx_letzte_zeile(zin: zipfile.ZipFile, blatt: str) -> tuple:
+    """
+    Scan a worksheet for its last row without parsing it.
+
+    Returns ``(letzte, stile, prefix)``: the number of the last row, the style ids of its cells
+    by column letter (empty if the last row is the header) and the namespace prefix of the
+    worksheet elements. Only the bytes from the start of the current row are kept in memory.
+    """
+    letzte = 0
+    prefix = b""
+    rest = b""
+    with zin.open(blatt) as datei:
+        for chunk in iter(lambda: datei.read(1 << 20), b""):
+            daten = rest + chunk
+            treffer = None
+            for treffer in _ZEILE_RE.finditer(daten):
+                letzte = max(letzte, int(treffer.group(2)))
+                prefix = treffer.group(1)
+            # Ab der letzten angefangenen Zeile aufheben, damit sie am Ende vollständig vorliegt
+            rest = daten[treffer.start():] if treffer else daten[-256:]
+
+    stile = {}
+    ende = _ZEILENENDE_RE.search(rest)
+    if letzte > 1 and ende is not None:
+        for zelle in _ZELLE_RE.finditer(rest[: ende.start()]):
+            attribute = _xlsx_attribute(zelle.group(1))
+            if "r" in attribute and "s" in attribute:
+                stile[re.match(r"[A-Z]+", attribute["r"]).group()] = attribute["s"]
+    return letzte, stile, prefix.decode()
+
+
+def _xlsx_bereiche(daten: bytes, tags: bytes, alt: tuple, neu: tuple, spalten: bool) -> bytes:
+    """
+    Extend the ``ref`` ranges of the elements ``tags`` (a regex alternative) in ``daten``.
+
+    ``alt`` and ``neu`` are ``(letzte_spalte, letzte_zeile)`` of the data before and after the
+    append. Ranges that end in or below the last row but above the new last row are extended to
+    the new last row; with ``spalten``, ranges that end in the last column are also extended to
+    the new last column.
+    """
+    muster = re.compile(
+        rb'(<(?:\w+:)?(?:' + tags + rb')\b[^>]*?\sref="[A-Z]+\d+)(?::([A-Z]+)(\d+))?"'
+    )
+
+    def erweitere(treffer):
+        if treffer.group(2) is None:
+            ende = re.search(rb"([A-Z]+)(\d+)$", treffer.group(1))
+            spalte, zeile = ende.group(1), ende.group(2)
+        else:
+            spalte, zeile = treffer.group(2), treffer.group(3)
+        spalte = px.utils.column_index_from_string(spalte.decode())
+        if not alt[1] <= int(zeile) < neu[1]:
+            return treffer.group(0)
+        if spalten and spalte == alt[0]:
+            spalte = neu[0]
+        return treffer.group(1) + f':{px.utils.get_column_letter(spalte)}{neu[1]}"'.encode()
+
+    return muster.sub(erweitere, daten)
+
+
+def _xlsx_filterbereich(daten: bytes, alt: tuple, neu: tuple) -> bytes:
+    """Extend the hidden ``_xlnm._FilterDatabase`` name of the first worksheet in workbook.xml."""
+
+    def erweitere(treffer):
+        spalte = px.utils.column_index_from_string(treffer.group(2).decode())
+        if not alt[1] <= int(treffer.group(3)) < neu[1]:
+            return treffer.group(0)
+        if spalte == alt[0]:
+            spalte = neu[0]
+        return treffer.group(1) + f"{px.utils.get_column_letter(spalte)}${neu[1]}<".encode()
+
+    return _FILTERBEREICH_RE.sub(erweitere, daten)
+
+
+def _xlsx_zelle(ref: str, wert, prefix: str, stil: str = None) -> str:
+    """
+    Serialise a single cell as XML, strings as inline strings.
+
+    Raises:
+        ValueError: If ``wert`` is an infinite number, which XLSX cannot store.
+    """
+    attribute = f' r="{ref}"' + (f' s="{stil}"' if stil is not None else "")
+    if wert is None:
+        return f"<{prefix}c{attribute}/>"
+    if isinstance(wert, bool):
+        return f'<{prefix}c{attribute} t="b"><{prefix}v>{int(wert)}</{prefix}v></{prefix}c>'
+    if isinstance(wert, (int, float)):
+        if not math.isfinite(wert):
+            raise ValueError(f"Ungültiger Zahlenwert {wert} für Zelle {ref}")
+        return f"<{prefix}c{attribute}><{prefix}v>{repr(wert)}</{prefix}v></{prefix}c>"
+    text = escape(_XML_UNGUELTIG.sub("", str(wert)))
+    return (
+        f'<{prefix}c{attribute} t="inlineStr"><{prefix}is>'
+        f'<{prefix}t xml:space="preserve">{text}</{prefix}t></{prefix}is></{prefix}c>'
+    )
+
+
+def _xlsx_zeilen(df: pd.DataFrame, spalten: dict, erste_zeile: int, prefix: str, stile: dict) -> str:
+    """
+    Serialise the rows of ``df`` as worksheet XML, starting at row ``erste_zeile``.
+
+    Every cell gets the style of the cell in the same column of the last existing row
+    (``stile``), so new rows look like the rows above them; styled columns without a value get
+    an empty cell. The cells of a row are written in column order.
+    """
+    belegung = {spalten[titel]: nr for nr, titel in enumerate(df.columns)}
+    for buchstabe in stile:
+        belegung.setdefault(buchstabe, None)
+    belegung = sorted(belegung.items(), key=lambda eintrag: px.utils.column_index_from_string(eintrag[0]))
+
+    zeilen = []
+    for nr, row in enumerate(df.itertuples(index=False, name=None), start=erste_zeile):
+        zellen = []
+        for buchstabe, spalte in belegung:
+            wert = None if spalte is None else row[spalte]
+            if wert is not None and pd.isna(wert):
+                wert = None
+            if wert is None and buchstabe not in stile:
+                continue
+            wert = wert.item() if hasattr(wert, "item") else wert
+            zellen.append(_xlsx_zelle(f"{buchstabe}{nr}", wert, prefix, stile.get(buchstabe)))
+        zeilen.append(f'<{prefix}row r="{nr}">{"".join(zellen)}</{prefix}row>')
+    return "".join(zeilen)
+
+
+def _xlsx_blatt_schreiben(datei, ziel, neue_zeilen: bytes, neue_titel: list, alt: tuple, neu: tuple) -> None:
+    """
+    Copy the worksheet XML from ``datei`` to ``ziel`` and insert the new rows.
+
+    ``neue_titel`` are ``(spalte, titel)`` pairs of header cells appended to the first row; they
+    get the style of the last header cell. The dimension and the auto-filter are extended.
+    """
+    chunks = iter(lambda: datei.read(1 << 20), b"")
+    puffer = b""
+    for chunk in chunks:
+        puffer += chunk
+        kopfende = _ZEILENENDE_RE.search(puffer)
+        if kopfende:
+            break
+    else:
+        raise ValueError("Kopfzeile nicht gefunden")
+
+    kopf, puffer = puffer[: kopfende.start()], puffer[kopfende.start():]
+    kopf = _xlsx_bereiche(kopf, b"dimension", alt, neu, spalten=True)
+    if neue_titel:
+        zeile = _ZEILE_RE.search(kopf)
+        prefix, zeile_nr = zeile.group(1).decode(), zeile.group(2).decode()
+        tag_ende = kopf.index(b">", zeile.start())
+        # spans ist nur ein Hinweis für Leseprogramme und würde die neuen Spalten nicht abdecken
+        tag = re.sub(rb'\sspans="[^"]*"', b"", kopf[zeile.start(): tag_ende])
+        kopf = kopf[: zeile.start()] + tag + kopf[tag_ende:]
+        stile = [
+            _xlsx_attribute(zelle.group(1)).get("s")
+            for zelle in _ZELLE_RE.finditer(kopf, zeile.start())
+        ]
+        stil = stile[-1] if stile else None
+        kopf += "".join(
+            _xlsx_zelle(f"{spalte}{zeile_nr}", titel, prefix, stil) for spalte, titel in neue_titel
+        ).encode("utf-8")
+    ziel.write(kopf)
+
+    while True:
+        treffer = _SHEETDATA_ENDE_RE.search(puffer)
+        if treffer:
+            break
+        chunk = next(chunks, b"")
+        if not chunk:
+            raise ValueError("sheetData nicht gefunden")
+        ziel.write(puffer[:-256])
+        puffer = puffer[-256:] + chunk
+
+    ziel.write(puffer[: treffer.start()])
+    ziel.write(neue_zeilen)
+    rest = puffer[treffer.start():] + datei.read()
+    ziel.write(_xlsx_bereiche(rest, b"autoFilter", alt, neu, spalten=True))
+
+
+def _xlsx_anhaengen(xlsx_path: str, df: pd.DataFrame, spalten: dict, letzte_spalte: int) -> None:
+    """
+    Append rows to the first worksheet of an XLSX file without loading the workbook.
+
+    The worksheet XML is copied as a byte stream and the new rows are inserted before the end of
+    ``sheetData``. Existing cells, styles and column widths are not touched. Columns of ``df``
+    that are not in ``spalten`` are added to the header after ``letzte_spalte``. The dimension,
+    the auto-filter (including its hidden name) and the tables on the worksheet are extended to
+    the new rows.
+
+    Raises:
+        ValueError: If ``df`` contains infinite numbers; the file is left unchanged.
+    """
+    tmp_path = f"{xlsx_path}.tmp"
+    neue_titel = [
+        (px.utils.get_column_letter(nr), titel)
+        for nr, titel in enumerate(
+            (titel for titel in df.columns if titel not in spalten), start=letzte_spalte + 1
+        )
+    ]
+    spalten = dict(spalten, **{titel: spalte for spalte, titel in neue_titel})
+
+    with zipfile.ZipFile(xlsx_path) as zin:
+        blatt = _xlsx_erstes_blatt(zin)
+        tabellen = _xlsx_tabellen(zin, blatt)
+        letzte, stile, prefix = _xlsx_letzte_zeile(zin, blatt)
+        # Vor dem Schreiben erzeugen, damit ungültige Werte die Datei unverändert lassen
+        neue_zeilen = _xlsx_zeilen(df, spalten, letzte + 1, prefix, stile).encode("utf-8")
+        alt = (letzte_spalte, letzte)
+        neu = (letzte_spalte + len(neue_titel), letzte + len(df))
+
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                if info.filename == blatt:
+                    with zin.open(blatt) as datei, zout.open(info.filename, "w", force_zip64=True) as ziel:
+                        _xlsx_blatt_schreiben(datei, ziel, neue_zeilen, neue_titel, alt, neu)
+                elif info.filename in tabellen:
+                    daten = _xlsx_bereiche(zin.read(info.filename), b"table|autoFilter", alt, neu, spalten=False)
+                    zout.writestr(info, daten)
+                elif info.filename == "xl/workbook.xml":
+                    zout.writestr(info, _xlsx_filterbereich(zin.read(info.filename), alt, neu))
+                else:
+                    zout.writestr(info, zin.read(info.filename))
+    os.replace(tmp_path, xlsx_path)
+
+
+def _xlsx_zeilenzahl(xlsx_path: str) -> int:
+    """Return the last row of the first worksheet, from its dimension or by scanning the rows."""
+    with zipfile.ZipFile(xlsx_path) as zin:
+        blatt = _xlsx_erstes_blatt(zin)
+        dimension = _xlsx_dimension(zin, blatt)
+        return dimension[1] if dimension is not None else _xlsx_letzte_zeile(zin, blatt)[0]
+
+
+def _zeitstempel_schluessel(zeitstempel: pd.Series) -> pd.Series:
+    """
+    Return the keys under which Zeitstempel values are compared.
+
+    Every timestamp is reduced to the UTC instant it denotes, so a submission is recognised no
+    matter in which timezone or offset notation its Zeitstempel was written (CSV export of another
+    user, JSON API, workbook edited by hand). Values that are not ISO 8601 timestamps are compared
+    as text.
+    """
+    text = zeitstempel.astype(str)
+    zeit = pd.to_datetime(zeitstempel, utc=True, errors="coerce", format="ISO8601")
+    return zeit.dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ").where(zeit.notna(), text)
+
+
+def _lade_zeitstempel_index(index_path: str, xlsx_path: str, zeilen: int) -> set:
+    """
+    Load the set of Zeitstempel keys (see _zeitstempel_schluessel) contained in the workbook.
+
+    The first line of the index file holds the last row of the workbook it was written for.
+    Edits of existing cells (the ``Kontrolliert`` marks, corrections) keep the index valid. If
+    the workbook has a different number of rows (e.g. because the last upload failed, the
+    workbook was restored from a backup or rows were added or deleted on the server), or the
+    index is missing, it is rebuilt from the Zeitstempel column of the workbook.
+    """
+    try:
+        with open(index_path, "r", encoding="utf-8") as datei:
+            if datei.readline().rstrip("\n") == f"{INDEX_KOPF}{zeilen}":
+                return {zeile.rstrip("\n") for zeile in datei if zeile.strip()}
+    except FileNotFoundError:
+        pass
+    if zeilen > 1:
+        zeitstempel = pd.read_excel(xlsx_path, usecols=["Zeitstempel"])["Zeitstempel"]
+        index = set(_zeitstempel_schluessel(zeitstempel.dropna()))
+    else:
+        index = set()
+    _speichere_zeitstempel_index(index_path, zeilen, index)
+    logger.info(f"Zeitstempel-Index mit {len(index)} Einträgen aus {xlsx_path} erstellt")
+    return index
+
+
+def _speichere_zeitstempel_index(index_path: str, zeilen: int, index: set) -> None:
+    """Write the Zeitstempel index for a workbook whose last row is ``zeilen`` atomically."""
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as datei:
+        datei.write(f"{INDEX_KOPF}{zeilen}\n")
+        datei.writelines(f"{wert}\n" for wert in sorted(index))
+    os.replace(tmp_path, index_path)
+
+
+def _lade_formulardaten(csv_path) -> pd.DataFrame:
+    """Return the form submissions from a CSV file, a DataFrame or an iterable of DataFrames."""
+    if isinstance(csv_path, pd.DataFrame):
+        return csv_path.reset_index(drop=True)
+    if isinstance(csv_path, (str, os.PathLike)):
+        return pd.read_csv(csv_path)
+    return pd.concat(list(csv_path), ignore_index=True)
+
+
+def _neue_formulareintraege(csv_path, index: set) -> pd.DataFrame:
+    """Return the submissions whose Zeitstempel key is not in ``index``, reading chunks one by one."""
+    if isinstance(csv_path, (str, os.PathLike, pd.DataFrame)):
+        chunks = [_lade_formulardaten(csv_path)]
+    else:
+        chunks = csv_path
+    neu = [chunk[~_zeitstempel_schluessel(chunk["Zeitstempel"]).isin(index)] for chunk in chunks]
+    if not neu:
+        return pd.DataFrame(columns=["Zeitstempel"])
+    return pd.concat(neu, ignore_index=True)
+
+
+def append_xlsx(csv_path, xlsx_path: str, index_path: str) -> int:
+    """
+    Append only the new submissions of a CSV file to an XLSX file.
+
+    The Zeitstempel values of the workbook are kept in an index file together with the last row
+    of the workbook, read from its ``dimension`` element; the index is only rebuilt from the
+    Zeitstempel column if it is missing or the workbook has a different number of rows (see
+    _lade_zeitstempel_index). Zeitstempel are compared by the instant they denote, not by their
+    text (see _zeitstempel_schluessel). Rows of the CSV file whose Zeitstempel is already in the
+    index are skipped, the remaining rows are appended to the first worksheet at XML level. Existing rows,
+    including the teachers' ``Kontrolliert`` marks and corrections, are neither parsed nor
+    rewritten; the worksheet is only copied as a byte stream, and every new cell takes the style
+    of the cell above it. Columns the workbook does not know yet are added after its last column.
+
+    The submissions can also be passed as an iterable of DataFrame chunks (e.g. from 
+    forms2.NextcloudFormsAPI.iterFormSubmissionsCSV); every chunk is filtered against the index 
+    on its own, so only the new submissions are kept in memory.
+
+    Args:
+        csv_path (str or pd.DataFrame or iterable): The path to the source CSV file, the 
+            submissions as a DataFrame with the same columns (see 
+            forms2.submissions_to_dataframe), or an iterable of such DataFrames.
+        xlsx_path (str): The path to the target XLSX file to be updated.
+        index_path (str): The path to the Zeitstempel index file. It is created from the workbook 
+            if it does not exist or belongs to a different version of the workbook.
+
+    Returns:
+        int: The number of appended rows.
+
+    Side Effects:
+        - Modifies the specified XLSX file.
+        - Rewrites the index file for the updated workbook.
+
+    Raises:
+        ValueError: If the new submissions contain infinite numbers; the workbook is left unchanged.
+    """
+    with zipfile.ZipFile(xlsx_path) as zin:
+        blatt = _xlsx_erstes_blatt(zin)
+        spalten = _xlsx_kopfzeile(zin, blatt)
+        dimension = _xlsx_dimension(zin, blatt)
+        zeilen = dimension[1] if dimension is not None else _xlsx_letzte_zeile(zin, blatt)[0]
+    index = _lade_zeitstempel_index(index_path, xlsx_path, zeilen)
+
+    neu = _neue_formulareintraege(csv_path, index)
+    neu = neu[~_zeitstempel_schluessel(neu["Zeitstempel"]).duplicated()]
+    if neu.empty:
+        logger.info("Keine neuen Formulareinträge")
+        return 0
+
+    if not spalten:
+        logger.warning(f"{xlsx_path} hat keine Kopfzeile und wird neu geschrieben")
+        write_xlsx(neu.assign(Kontrolliert=pd.NA), xlsx_path)
+    else:
+        unbekannt = [titel for titel in neu.columns if titel not in spalten]
+        if unbekannt:
+            logger.warning(f"Neue Spalten {unbekannt} werden an die Arbeitsmappe angefügt")
+        letzte_spalte = max(
+            [px.utils.column_index_from_string(spalte) for spalte in spalten.values()]
+            + [dimension[0] if dimension is not None else 0]
+        )
+        _xlsx_anhaengen(xlsx_path, neu, spalten, letzte_spalte)
+
+    index.update(_zeitstempel_schluessel(neu["Zeitstempel"]))
+    _speichere_zeitstempel_index(index_path, _xlsx_zeilenzahl(xlsx_path), index)
+    logger.info(f"{len(neu)} neue Formulareinträge angehängt")
+    return len(neu)
+
+
+def update_xlsx(csv_path, xlsx_path: str, index_path: str = None) -> None:
     """
     Update an XLSX file with data from a CSV file.
 
     This function reads data from a specified CSV file and updates an existing XLSX file by merging and 
     removing duplicate timestamp entries. It also adjusts the column widths of the XLSX file for better 
-    readability, and creates a backup of the original XLSX file in a Nextcloud directory.
+    readability, and creates a backup of the original XLSX file in a Nextcloud directory (skipped if the 
+    file is unchanged since the last backup, see backup_operations.backup_file). The merged 
+    data is written in a single pass with write_xlsx.
+
+    With ``index_path`` set, the update is incremental: only submissions whose Zeitstempel is not 
+    yet in the index are appended, see append_xlsx.
 
     Args:
-        csv_path (str): The path to the source CSV file.
+        csv_path (str or pd.DataFrame or iterable): The path to the source CSV file, the 
+            submissions as a DataFrame with the same columns (see 
+            forms2.submissions_to_dataframe), or an iterable of such DataFrames.
         xlsx_path (str): The path to the target XLSX file to be updated.
+        index_path (str, optional): The path to the Zeitstempel index file for incremental updates.
 
     Returns:
         None
 
     Side Effects:
         - Modifies the specified XLSX file.
-        - Saves a backup of the original XLSX file in a Nextcloud directory.
+        - Saves a backup of the original XLSX file in a Nextcloud directory unless it is unchanged.
 
     Raises:
         FileNotFoundError: If the specified CSV or XLSX files are not found.
         PermissionError: If the script does not have write permissions to the XLSX file.
+        RuntimeError: If the backup of the original XLSX file failed; the file is left unchanged.
     """
     now = datetime.now()
     date_string = now.strftime("%y%m%d%H%M%S")
-    csv_df = pd.read_csv(csv_path)
-    xlsx_df = pd.read_excel(xlsx_path)
 
     backup_url = f"{webdav_backup[:-5]}_backup{date_string}.xlsx"
-    put_file(
-        backup_url,
+    ergebnis = backup_file(
         xlsx_path,
+        backup_url,
         NEXTCLOUD_USERNAME,
         NEXTCLOUD_PASSWORD,
     )
+    if ergebnis == "fehlgeschlagen":
+        raise RuntimeError(f"Backup von {xlsx_path} fehlgeschlagen, Arbeitsmappe bleibt unverändert")
 
+    if index_path is not None:
+        append_xlsx(csv_path, xlsx_path, index_path)
+        return
+
+    csv_df = _lade_formulardaten(csv_path)
+    xlsx_df = pd.read_excel(xlsx_path)
     csv_df["Kontrolliert"] = pd.NA
     merged_df = pd.concat([xlsx_df, csv_df], ignore_index=True)
-    merged_df.drop_duplicates(subset="Zeitstempel", keep="first", inplace=True)
-    merged_df.to_excel(xlsx_path, index=False)
+    merged_df = merged_df[~_zeitstempel_schluessel(merged_df["Zeitstempel"]).duplicated()]
+    write_xlsx(merged_df, xlsx_path)
+
+
+def matchElternaccounts(
+    forms: pd.DataFrame,
+    schild: pd.DataFrame,
+    workers: int = None,
+    cache_path: str = None,
+    fallback: bool = True,
+) -> list:
+    """
+    Match the children of all checked form rows against the Schild export.
+
+    Only rows with ``Kontrolliert == 1`` are considered. Each child is only compared with the 
+    students of its own class, looked up in a prebuilt class index. Names are compared in a 
+    normalised form (transliterated umlauts and accents, case folding, no hyphens).
+
+    With ``workers`` set, the classes are matched on a process pool. The results are identical 
+    to those of a serial run.
 
-    wb = px.load_workbook(xlsx_path)
-    ws = wb.active
-    ws.auto_filter.ref = ws.dimensions
+    With ``cache_path`` set, match results are kept in a persistent cache. Children whose form data 
+    and Schild class are unchanged since an earlier run reuse the cached result, so only new or 
+    changed entries are matched again.
 
-    # Anpassung der Spaltenbreiten
-    for column in ["F", "P", "I", "L", "O"]:
-        max_length = (
-            max(len(str(cell.value)) if cell.value else 0 for cell in ws[column]) + 2
+    Children without a usable match in the class entered in the form (e.g. "5 b" or the class of the 
+    previous year) are searched across the whole school using a phonetic blocking index. Such matches 
+    are flagged with ``cross_class``.
+
+    Args:
+        forms (pd.DataFrame): The form data as read from the forms XLSX file.
+        schild (pd.DataFrame): The Schild CSV export.
+        workers (int, optional): Number of worker processes used for matching. Defaults to None,
+            which matches all classes in the current process.
+        cache_path (str, optional): Path to the JSON match cache. Defaults to None (no caching).
+        fallback (bool, optional): Whether to search children across all classes if their own class 
+            yields no usable match. Defaults to True.
+
+    Returns:
+        list: One MatchResult per child, in form order. Its indices refer to row positions of 
+        ``forms`` and ``schild``.
+
+    Side Effects:
+        - Adds normalised name columns to ``forms`` and ``schild``.
+        - Updates the match cache if ``cache_path`` is given.
+    """
+    normalisiere_forms(forms)
+    normalisiere_schild(schild)
+
+    klassen_index = build_klassen_index(schild)
+
+    kontrolliert = (forms["Kontrolliert"] == 1).to_numpy()
+    kinder = []
+    for i in range(1, 4):
+        if f"Vorname des {i}. Kindes" not in forms.columns:
+            continue
+        for form_index, fname, lname, klasse, full_name_forms in zip(
+            range(len(forms)),
+            forms[f"Vorname des {i}. Kindes"],
+            forms.get(f"Nachname des {i}. Kindes", pd.Series([None] * len(forms))),
+            forms.get(f"Klasse des {i}. Kindes", pd.Series([None] * len(forms))),
+            forms[f"Name des {i}. Kindes (norm)"],
+        ):
+            if kontrolliert[form_index] and pd.notna(fname):
+                kinder.append((form_index, i, fname, lname, klasse, full_name_forms))
+    kinder.sort(key=lambda kind: (kind[0], kind[1]))
+
+    kinder_pro_klasse = {}
+    for nr, (_, _, _, _, klasse, _) in enumerate(kinder):
+        kinder_pro_klasse.setdefault(klasse, []).append(nr)
+
+    cache = MatchCache(cache_path) if cache_path else None
+
+    treffer = {}
+    fingerprints = {}
+    jobs = []
+    job_nummern = []
+    for klasse, nummern in kinder_pro_klasse.items():
+        positions, full_names_schild = klassen_index.get(klasse, ([], []))
+        if cache is not None:
+            fingerprint = klassen_fingerprint(schild, positions)
+            fingerprints[len(jobs)] = fingerprint
+            offen = []
+            for nr in nummern:
+                _, _, fname, lname, _, _ = kinder[nr]
+                match = cache.get(fname, lname, klasse, fingerprint, positions)
+                if match is None:
+                    offen.append(nr)
+                else:
+                    treffer[nr] = match
+            nummern = offen
+            if not nummern:
+                continue
+        full_names_forms = [kinder[nr][5] for nr in nummern]
+        jobs.append((klasse, full_names_forms, full_names_schild, positions))
+        job_nummern.append(nummern)
+
+    for job_nr, nummern, (matches, _) in zip(
+        range(len(jobs)), job_nummern, match_klassen(jobs, workers)
+    ):
+        treffer.update(zip(nummern, matches))
+        if cache is not None:
+            klasse, _, _, positions = jobs[job_nr]
+            for nr, match in zip(nummern, matches):
+                _, _, fname, lname, _, _ = kinder[nr]
+                cache.put(
+                    fname, lname, klasse, fingerprints[job_nr], positions, match
+                )
+
+    if cache is not None:
+        cache.save()
+
+    klassenfremd = set()
+    if fallback:
+        phonetik_index = None
+        for nr, (_, _, fname, lname, _, full_name_forms) in enumerate(kinder):
+            if treffer[nr][1] > FALLBACK_SCHWELLE:
+                continue
+            if phonetik_index is None:
+                phonetik_index = build_phonetik_index(schild)
+            match = match_fallback(fname, lname, full_name_forms, phonetik_index)
+            if match is not None and match[1] > treffer[nr][1]:
+                treffer[nr] = match
+                klassenfremd.add(nr)
+        logger.info(
+            f"{len(klassenfremd)} Kinder klassenübergreifend zugeordnet "
+            f"(nur in der Kontrollausgabe, bitte manuell prüfen)"
         )
-        ws.column_dimensions[column].width = max_length
-
-    # Setzen spezifischer Spaltenbreiten
-    spaltenbreiten = {
-        "A": 2,
-        "B": 2,
-        "C": 2,
-        "D": 9,
-        "E": 15,
-        "G": 15,
-        "H": 9,
-        "J": 9,
-        "K": 9,
-        "M": 9,
-        "N": 9,
-        "Q": 11,
+
+    results = [
+        MatchResult(form_index, i, *treffer[nr], nr in klassenfremd)
+        for nr, (form_index, i, _, _, _, _) in enumerate(kinder)
+    ]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for result in results:
+            if (
+                result.schild_index is not None
+                and result.best_score <= 0.9
+                and result.second_index is not None
+            ):
+                form_row = forms.iloc[result.form_index]
+                matching_schild = schild.iloc[result.schild_index]
+                second_matching_schild = schild.iloc[result.second_index]
+                logger.debug(
+                    f"Elternteil: {form_row['Vorname des Elternteils']} {form_row['Nachname des Elternteils']}, "
+                    f"Kind (Forms): {form_row[f'Vorname des {result.kind}. Kindes']} {form_row.get(f'Nachname des {result.kind}. Kindes')}, "
+                    f"Matching Kind (Schild): {matching_schild['US_firstName']} {matching_schild['US_lastName']}, "
+                    f"Student-ID: {matching_schild['AT_webuntisUid']}, "
+                    f"Similarity Score: {result.best_score:.2f}, "
+                    f"Zweites Matching Kind (Schild): {second_matching_schild['US_firstName']} {second_matching_schild['US_lastName']}, "
+                    f"Student-ID: {second_matching_schild['AT_webuntisUid']}, "
+                    f"Second Highest Similarity: {result.second_score:.2f}"
+                )
+                logger.debug(
+                    f"{form_row['Vorname des Elternteils']};"
+                    f"{form_row['Nachname des Elternteils']};"
+                    f"{form_row['Emailadresse des Elternteils'].lower()};"
+                    f"{matching_schild['AT_webuntisUid']}"
+                )
+
+    return results
+
+
+def kontroll_dataframe(
+    results: list, forms: pd.DataFrame, schild: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Build the control output from match results.
+
+    The frame contains one row per matched child with both names, the scores and the class of the 
+    matched student, so the class teachers can verify every assignment.
+
+    Args:
+        results (list): MatchResult objects as returned by matchElternaccounts.
+        forms (pd.DataFrame): The form data the results refer to.
+        schild (pd.DataFrame): The Schild export the results refer to.
+
+    Returns:
+        pd.DataFrame: The control output.
+    """
+    results = [result for result in results if result.schild_index is not None]
+    form_idx = [result.form_index for result in results]
+    schild_idx = [result.schild_index for result in results]
+    uids = schild["AT_webuntisUid"].to_numpy()[schild_idx]
+    # Die Nachnamensspalten des 2. und 3. Kindes fehlen in manchen Exporten
+    nachnamen = {
+        i: forms.get(f"Nachname des {i}. Kindes", pd.Series([None] * len(forms))).to_numpy()
+        for i in range(1, 4)
     }
+    return pd.DataFrame(
+        {
+            "Eltern Vorname": forms["Vorname des Elternteils"].to_numpy()[form_idx],
+            "Eltern Nachname": forms["Nachname des Elternteils"].to_numpy()[form_idx],
+            "email": forms["Emailadresse des Elternteils"]
+            .iloc[form_idx]
+            .str.lower()
+            .to_numpy(),
+            "student-id": uids,
+            "Kind Vorname (forms)": [
+                forms[f"Vorname des {result.kind}. Kindes"].iat[result.form_index]
+                for result in results
+            ],
+            "Kind Nachname (forms)": [
+                nachnamen[result.kind][result.form_index] for result in results
+            ],
+            "Kind Vorname (schild)": schild["US_firstName"].to_numpy()[schild_idx],
+            "Kind Nachname (schild)": schild["US_lastName"].to_numpy()[schild_idx],
+            "AT_webuntisUid": uids,
+            "Best Similarity Score": [result.best_score for result in results],
+            "Second Best Similarity Score": [
+                result.second_score for result in results
+            ],
+            "Klasse (schild)": schild["webuntisKlasse"].to_numpy()[schild_idx],
+            "Cross-Class Match": [result.cross_class for result in results],
+        }
+    )
 
-    for spalte, breite in spaltenbreiten.items():
-        ws.column_dimensions[px.utils.get_column_letter(ws[spalte][0].column)].width = (
-            breite
-        )
 
-    wb.save(xlsx_path)
+def accounts_dataframe(
+    results: list, forms: pd.DataFrame, schild: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Build the parental accounts from match results.
+
+    Only children matched with a similarity above 0.5 in their own class result in an account. 
+    Cross-class matches are left out: a namesake in another class can score as high as the right 
+    child, so these rows are only listed in the control output (see kontroll_dataframe) for manual 
+    review. The username is generated with returnUsername in the "kurzform" format.
+
+    Args:
+        results (list): MatchResult objects as returned by matchElternaccounts.
+        forms (pd.DataFrame): The form data the results refer to.
+        schild (pd.DataFrame): The Schild export the results refer to.
+
+    Returns:
+        pd.DataFrame: The accounts with the columns "Eltern Vorname", "Eltern Nachname", "email", 
+        "student-id" and "username".
+    """
+    results = [
+        result
+        for result in results
+        if result.schild_index is not None
+        and result.best_score > 0.5
+        and not result.cross_class
+    ]
+    form_idx = [result.form_index for result in results]
+    schild_idx = [result.schild_index for result in results]
+    output_df = pd.DataFrame(
+        {
+            "Eltern Vorname": forms["Vorname des Elternteils"].to_numpy()[form_idx],
+            "Eltern Nachname": forms["Nachname des Elternteils"].to_numpy()[form_idx],
+            "email": forms["Emailadresse des Elternteils"]
+            .iloc[form_idx]
+            .str.lower()
+            .to_numpy(),
+            "student-id": schild["AT_webuntisUid"].to_numpy()[schild_idx],
+        }
+    )
+    output_df["username"] = [
+        returnUsername(vorname, nachname, "kurzform")
+        for vorname, nachname in zip(
+            output_df["Eltern Vorname"], output_df["Eltern Nachname"]
+        )
+    ]
+    return output_df
 
 
 def createElternaccounts(
-    formsdatei: str, schildexport: str, kontrolloutput: str, outputfile: str
+    formsdatei: str,
+    schildexport: str,
+    kontrolloutput: str,
+    outputfile: str,
+    workers: int = None,
+    cache_path: str = None,
+    fallback: bool = True,
 ) -> None:
     """
     Create parental accounts based on form data and Schild CSV export.
 
     This function processes data from a form XLSX file and a Schild CSV export to generate a CSV file of 
-    parental accounts. It uses a similarity score to match data from both files. The final results are 
-    stored in an output CSV, along with a separate control CSV for verification purposes.
+    parental accounts. It uses a similarity score to match data from both files, see 
+    matchElternaccounts. The final results are stored in an output CSV, along with a separate control 
+    CSV for verification purposes. Cross-class matches are flagged in the "Cross-Class Match" column of 
+    the control output and do not result in an account until they are checked manually.
 
     Args:
         formsdatei (str): Path to the forms XLSX file.
         schildexport (str): Path to the Schild CSV export file.
         kontrolloutput (str): Path to the control output CSV file.
         outputfile (str): Path to the final parental accounts CSV file.
+        workers (int, optional): Number of worker processes used for matching. Defaults to None,
+            which matches all classes in the current process.
+        cache_path (str, optional): Path to the JSON match cache. Defaults to None (no caching).
+        fallback (bool, optional): Whether to search children across all classes if their own class 
+            yields no usable match. Defaults to True.
 
     Returns:
         None
 
     Side Effects:
         - Writes the control output and final accounts to separate CSV files.
+        - Updates the match cache if ``cache_path`` is given.
 
     Raises:
         FileNotFoundError: If any of the specified input files are not found.
@@ -141,124 +1002,11 @@ def createElternaccounts(
     forms = pd.read_excel(formsdatei)
     schild = pd.read_csv(schildexport, delimiter=";", quotechar='"')
 
-    outputtest = []
-    output = []
-
-    forms_filtered = forms[forms["Kontrolliert"] == 1]
-
-    for idx, form_row in forms_filtered.iterrows():
-        for i in range(1, 4):
-            fname = form_row.get(f"Vorname des {i}. Kindes")
-            lname = form_row.get(f"Nachname des {i}. Kindes")
-            klasse = form_row.get(f"Klasse des {i}. Kindes")
-            if pd.notna(fname):
-                #   print(f"{fname} {lname} {klasse}")
-                matching_schild = None
-                second_matching_schild = None
-                highest_similarity = 0
-                second_highest_similarity = 0
-                for _, schild_row in schild.iterrows():
-                    if schild_row["webuntisKlasse"] == klasse:
-                        full_name_schild = (
-                            f"{schild_row['US_firstName']} {schild_row['US_lastName']}"
-                        )
-                        full_name_forms = f"{fname} {lname}"
-                        similarity = similar(full_name_schild, full_name_forms)
-                        if similarity > highest_similarity:
-                            second_highest_similarity = highest_similarity
-                            highest_similarity = similarity
-                            second_matching_schild = matching_schild
-                            matching_schild = schild_row
-                        elif similarity > second_highest_similarity:
-                            second_highest_similarity = similarity
-                            second_matching_schild = schild_row
-
-                if matching_schild is not None:
-                    if highest_similarity <= 0.9 and second_matching_schild is not None:
-                        logger.debug(
-                            f"Elternteil: {form_row['Vorname des Elternteils']} {form_row['Nachname des Elternteils']}, "
-                            f"Kind (Forms): {fname} {lname}, "
-                            f"Matching Kind (Schild): {matching_schild['US_firstName']} {matching_schild['US_lastName']}, "
-                            f"Student-ID: {matching_schild['AT_webuntisUid']}, "
-                            f"Similarity Score: {highest_similarity:.2f}, "
-                            f"Zweites Matching Kind (Schild): {second_matching_schild['US_firstName']} {second_matching_schild['US_lastName']}, "
-                            f"Student-ID: {second_matching_schild['AT_webuntisUid']}, "
-                            f"Second Highest Similarity: {second_highest_similarity:.2f}"
-                        )
-                        logger.debug(
-                            f"{form_row['Vorname des Elternteils']};"
-                            f"{form_row['Nachname des Elternteils']};"
-                            f"{form_row['Emailadresse des Elternteils'].lower()};"
-                            f"{matching_schild['AT_webuntisUid']}"
-                        )
-                    #   if highest_similarity <= 0.9 and second_matching_schild is not None:
-                    #   print(
-                    #       form_row["Vorname des Elternteils"],
-                    #       form_row["Nachname des Elternteils"],
-                    #       fname,
-                    #       lname,
-                    #       matching_schild["US_firstName"],
-                    #       matching_schild["US_lastName"],
-                    #       matching_schild["AT_webuntisUid"],
-                    #       highest_similarity,
-                    #       second_matching_schild["US_firstName"],
-                    #       second_matching_schild["US_lastName"],
-                    #       second_matching_schild["AT_webuntisUid"],
-                    #       second_highest_similarity,
-                    #   )
-                    #   print(
-                    #       f'{form_row["Vorname des Elternteils"]};{form_row["Nachname des Elternteils"]};{form_row["Emailadresse des Elternteils"].lower()};{matching_schild["AT_webuntisUid"]}'
-                    #   )
-
-                    outputtest.append(
-                        [
-                            form_row["Vorname des Elternteils"],
-                            form_row["Nachname des Elternteils"],
-                            form_row["Emailadresse des Elternteils"].lower(),
-                            matching_schild["AT_webuntisUid"],
-                            fname,
-                            lname,
-                            matching_schild["US_firstName"],
-                            matching_schild["US_lastName"],
-                            matching_schild["AT_webuntisUid"],
-                            highest_similarity,
-                            second_highest_similarity,
-                        ]
-                    )
-                    if highest_similarity > 0.5:
-                        output.append(
-                            [
-                                form_row["Vorname des Elternteils"],
-                                form_row["Nachname des Elternteils"],
-                                form_row["Emailadresse des Elternteils"].lower(),
-                                matching_schild["AT_webuntisUid"],
-                            ]
-                        )
+    results = matchElternaccounts(forms, schild, workers, cache_path, fallback)
 
-    output_df = pd.DataFrame(
-        outputtest,
-        columns=[
-            "Eltern Vorname",
-            "Eltern Nachname",
-            "email",
-            "student-id",
-            "Kind Vorname (forms)",
-            "Kind Nachname (forms)",
-            "Kind Vorname (schild)",
-            "Kind Nachname (schild)",
-            "AT_webuntisUid",
-            "Best Similarity Score",
-            "Second Best Similarity Score",
-        ],
-    )
-    output_df.to_csv(kontrolloutput, index=False, sep=";")
-    output_df2 = pd.DataFrame(
-        output, columns=["Eltern Vorname", "Eltern Nachname", "email", "student-id"]
+    kontroll_dataframe(results, forms, schild).to_csv(
+        kontrolloutput, index=False, sep=";"
     )
-    output_df2["username"] = output_df2.apply(
-        lambda row: returnUsername(
-            row["Eltern Vorname"], row["Eltern Nachname"], "kurzform"
-        ),
-        axis=1,
+    accounts_dataframe(results, forms, schild).to_csv(
+        outputfile, index=False, sep=";"
     )
-    output_df2.to_csv(outputfile, index=False, sep=";")
@@ -19,6 +19,9 @@ url_elterncsv = f'{server_url}/remote.php/dav/files/your_username/your_path/elte
 url_elterncsvcontrol = f'{server_url}/remote.php/dav/files/your_username/your_path/elternaccounts-control.csv'
 url_elternaccounts_share = f'{server_url}/remote.php/dav/files/your_username/your_share_path/elternzugaenge_webuntis.xlsx'
 
+# Zeitzone des Nextcloud-Benutzers, in der der CSV-Export von Forms die Zeitstempel angibt
+zeitzone = "Europe/Berlin"
+
 # Mail credentials
 smtp_server = 'your_smtp_server'
 smtp_port = 465  # Ensure this is the correct port
@@ -39,3 +42,18 @@ Sollten Sie bereits einen funktionierenden Account haben ignorieren Sie die Mail
 Freundliche Grüße
 Your Name
 """
+
+# Vorlage für den Serienbrief (Option 4), Platzhalter siehe mail_merge.py
+serienbrieftext = """Guten Tag $name,
+
+für Sie wurde ein WebUntis-Elternaccount für $kind erstellt.
+
+Ihr Benutzername lautet: $benutzername
+
+Bitte folgen Sie UNBEDINGT der Anleitung hier: 
+
+https://url_zur_anleitung/
+
+Freundliche Grüße
+Your Name
+"""
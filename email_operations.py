@@ -4,7 +4,7 @@ email_operations.py
 This module provides functions to perform operations related to sending and retrieving emails.
 It includes functionality to:
 - Extract email addresses from a given text.
-- Send emails to a specified list of recipients using SMTP.
+- Send emails to a specified list of recipients using SMTP, in batches over one connection.
 - Store sent emails in the 'Sent' folder using IMAP.
 - Retrieve the content of the 'Sent' folder from an IMAP account.
 
@@ -18,6 +18,10 @@ for example, in a separate credential module.
 
 Functions:
 - finde_email_adressen(text: str) -> list
+- erstelle_nachricht(betreff: str, nachricht: str, absender: str, an: str) -> MIMEMultipart
+- verbinde_smtp(smtp_server: str, smtp_port: int, benutzername: str, passwort: str) -> smtplib.SMTP_SSL
+- serialisiere_nachricht(msg) -> bytes
+- sende_batches(empfaenger_liste: list, msg, smtp_server: str, smtp_port: int, benutzername: str, passwort: str, batch_size: int) -> list
 - sende_email(empfaenger_liste: list, betreff: str, nachricht: str, smtp_server: str, smtp_port: int, benutzername: str, passwort: str) -> str
 - get_sent_folder_content(imap_server: str, imap_port: int, benutzername: str, passwort: str) -> list
 """
@@ -27,6 +31,9 @@ import email
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import decode_header
+from email.utils import getaddresses
+import io
+from email.generator import BytesGenerator
 import time
 import re
 import elternaccounts_credentials
@@ -34,6 +41,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Empfänger pro SMTP-Transaktion; viele Anbieter lehnen mehr als 50-100 Empfänger je Mail ab
+BATCH_SIZE = 50
+
 
 def finde_email_adressen(text: str) -> list:
     """
@@ -52,6 +62,186 @@ def finde_email_adressen(text: str) -> list:
     return email_adressen
 
 
+def erstelle_nachricht(betreff: str, nachricht: str, absender: str, an: str) -> MIMEMultipart:
+    """
+    Builds the MIME message for a mail to many recipients.
+
+    The recipients are not part of the message; they are only passed in the SMTP envelope (see
+    sende_batches), so the message carries no Bcc header.
+
+    Args:
+        betreff (str): Subject of the email.
+        nachricht (str): Body content of the email.
+        absender (str): The From address.
+        an (str): The visible To address, usually the sender itself.
+
+    Returns:
+        MIMEMultipart: The message.
+    """
+    msg = MIMEMultipart()
+    msg["From"] = absender
+    msg["To"] = an
+    msg["Subject"] = betreff
+    msg.attach(MIMEText(nachricht, "plain"))
+    return msg
+
+
+def _eindeutig(empfaenger_liste: list) -> list:
+    """Removes duplicate addresses (ignoring case) while keeping the order."""
+    gesehen = set()
+    ergebnis = []
+    for adresse in empfaenger_liste:
+        if adresse.lower() not in gesehen:
+            gesehen.add(adresse.lower())
+            ergebnis.append(adresse)
+    return ergebnis
+
+
+def verbinde_smtp(smtp_server: str, smtp_port: int, benutzername: str, passwort: str):
+    """
+    Opens an authenticated SMTP connection with SSL.
+
+    Args:
+        smtp_server (str): SMTP server address.
+        smtp_port (int): SMTP server port.
+        benutzername (str): SMTP username for authentication.
+        passwort (str): SMTP password for authentication.
+
+    Returns:
+        smtplib.SMTP_SSL: The logged-in connection.
+    """
+    server = smtplib.SMTP_SSL(smtp_server, smtp_port)
+    server.login(benutzername, passwort)
+    return server
+
+
+def serialisiere_nachricht(msg) -> bytes:
+    """
+    Serialises a message for sending, the same way smtplib.send_message does.
+
+    Args:
+        msg (email.message.Message): The message.
+
+    Returns:
+        bytes: The message with CRLF line endings, ready for smtplib.SMTP.sendmail.
+    """
+    puffer = io.BytesIO()
+    BytesGenerator(puffer, policy=msg.policy.clone(linesep="\r\n")).flatten(msg)
+    return puffer.getvalue()
+
+
+def sende_batches(
+    empfaenger_liste: list,
+    msg,
+    smtp_server: str,
+    smtp_port: int,
+    benutzername: str,
+    passwort: str,
+    batch_size: int = BATCH_SIZE,
+    verbinde=verbinde_smtp,
+) -> list:
+    """
+    Sends one message to many recipients in batches over a single SMTP connection.
+
+    The message is serialised once and the same bytes are sent for every batch. The recipients are 
+    only passed in the envelope (``to_addrs``), never in a header. The envelope sender is the 
+    address in the Sender or From header of the message, as with smtplib.send_message; the SMTP 
+    username is only used to log in. If the server closes the connection or the connection fails 
+    (refused, timeout), it is opened again and the batch is retried once; if sending fails again, 
+    the batch is marked as failed and the next batch is sent.
+
+    If the login is refused, or the connection cannot be opened again for the retry, the run is 
+    stopped: every further batch would fail the same way (and repeated failed logins can get the 
+    account locked). The remaining batches are returned as not attempted.
+
+    Args:
+        empfaenger_liste (list): List of recipient email addresses. Duplicates are sent only once.
+        msg (email.message.Message): The message, see erstelle_nachricht.
+        smtp_server (str): SMTP server address.
+        smtp_port (int): SMTP server port.
+        benutzername (str): SMTP username for authentication.
+        passwort (str): SMTP password for authentication.
+        batch_size (int): Maximum number of recipients per SMTP transaction.
+        verbinde (callable): Opens the connection as ``verbinde(smtp_server, smtp_port,
+            benutzername, passwort)``; e.g. to use plain SMTP against a local test server.
+
+    Returns:
+        list: One dict per batch with the keys ``batch`` (number), ``angenommen`` (list of
+        accepted addresses), ``abgelehnt`` (dict of refused addresses to the SMTP code and
+        message), ``fehler`` (error message of a failed batch, otherwise None) and ``versucht``
+        (False for the batches skipped after the run was stopped).
+    """
+    empfaenger_liste = _eindeutig(empfaenger_liste)
+    absender = getaddresses([msg["Sender"] or msg["From"]])[0][1]
+    daten = serialisiere_nachricht(msg)
+    ergebnisse = []
+    server = None
+    abbruch = None
+    try:
+        for nr, start in enumerate(range(0, len(empfaenger_liste), batch_size), start=1):
+            batch = empfaenger_liste[start : start + batch_size]
+            ergebnis = {
+                "batch": nr, "angenommen": [], "abgelehnt": {}, "fehler": None, "versucht": True
+            }
+            if abbruch is not None:
+                ergebnis.update(fehler=f"Nicht versucht: {abbruch}", versucht=False)
+                ergebnisse.append(ergebnis)
+                continue
+            abgelehnt = None
+            for versuch in range(2):
+                if server is None:
+                    try:
+                        server = verbinde(smtp_server, smtp_port, benutzername, passwort)
+                    except smtplib.SMTPAuthenticationError as e:
+                        abbruch = ergebnis["fehler"] = f"Anmeldung fehlgeschlagen: {e}"
+                        break
+                    except OSError as e:
+                        # Verbindung abgelehnt, Zeitüberschreitung o. Ä.: einmal neu verbinden
+                        if versuch == 1:
+                            abbruch = ergebnis["fehler"] = f"Verbindungsfehler: {e}"
+                        continue
+                try:
+                    abgelehnt = server.sendmail(absender, batch, daten)
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    server = None
+                    if versuch == 1:
+                        ergebnis["fehler"] = f"Verbindung getrennt: {e}"
+                except smtplib.SMTPRecipientsRefused as e:
+                    abgelehnt = e.recipients
+                    break
+                except smtplib.SMTPException as e:
+                    ergebnis["fehler"] = str(e)
+                    break
+                except OSError as e:
+                    # Zeitüberschreitung o. Ä. beim Senden: neu verbinden wie oben
+                    server.close()
+                    server = None
+                    if versuch == 1:
+                        ergebnis["fehler"] = f"Verbindungsfehler: {e}"
+            if abgelehnt is not None:
+                ergebnis["abgelehnt"] = {
+                    adresse: (code, text.decode(errors="replace"))
+                    for adresse, (code, text) in abgelehnt.items()
+                }
+                ergebnis["angenommen"] = [a for a in batch if a not in abgelehnt]
+            logger.info(
+                f"Batch {nr}: {len(ergebnis['angenommen'])} angenommen, "
+                f"{len(ergebnis['abgelehnt'])} abgelehnt"
+                + (f", Fehler: {ergebnis['fehler']}" if ergebnis["fehler"] else "")
+            )
+            ergebnisse.append(ergebnis)
+            if abbruch is not None:
+                logger.error(f"Versand nach Batch {nr} abgebrochen: {abbruch}")
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except OSError:
+                pass
+    return ergebnisse
+
+
 def sende_email(
     empfaenger_liste: list,
     betreff: str,
@@ -60,10 +250,14 @@ def sende_email(
     smtp_port: int,
     benutzername: str,
     passwort: str,
+    batch_size: int = BATCH_SIZE,
 ) -> str:
     """
     Sends an email to a list of recipients and stores the email in the 'Sent' folder.
 
+    The recipients are sent in batches over one SMTP connection (see sende_batches). The copy in 
+    the 'Sent' folder contains no recipient list.
+
     Args:
         empfaenger_liste (list): List of recipient email addresses.
         betreff (str): Subject of the email.
@@ -72,6 +266,7 @@ def sende_email(
         smtp_port (int): SMTP server port.
         benutzername (str): SMTP username for authentication.
         passwort (str): SMTP password for authentication.
+        batch_size (int): Maximum number of recipients per SMTP transaction.
 
     Returns:
         str: Result of the email sending operation.
@@ -79,25 +274,27 @@ def sende_email(
     if not empfaenger_liste:
         return "Keine Empfängeradresse vorhanden."
 
-    empfaenger = benutzername
-    bcc = empfaenger_liste
-
-    msg = MIMEMultipart()
-    msg["From"] = elternaccounts_credentials.mail_benutzername
-    msg["To"] = empfaenger
-    msg["Bcc"] = ", ".join(bcc)
-    msg["Subject"] = betreff
-
-    msg.attach(MIMEText(nachricht, "plain"))
+    msg = erstelle_nachricht(
+        betreff, nachricht, elternaccounts_credentials.mail_benutzername, benutzername
+    )
 
     try:
-        # Verbindung zum SMTP-Server mit SSL
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.login(benutzername, passwort)
-
-        # E-Mail senden
-        server.send_message(msg)
-        server.quit()
+        # E-Mail in Batches über eine SMTP-Verbindung senden
+        ergebnisse = sende_batches(
+            empfaenger_liste,
+            msg,
+            smtp_server,
+            smtp_port,
+            benutzername,
+            passwort,
+            batch_size,
+        )
+        angenommen = sum(len(ergebnis["angenommen"]) for ergebnis in ergebnisse)
+        if angenommen == 0:
+            return "Fehler beim Senden der E-Mail: kein Empfänger wurde angenommen."
+        nicht_angenommen = len(_eindeutig(empfaenger_liste)) - angenommen
+        if nicht_angenommen:
+            logger.warning(f"{nicht_angenommen} Empfänger wurden nicht angenommen")
 
         # Verbindung zum IMAP-Server herstellen
         mail = imaplib.IMAP4_SSL(
@@ -5,11 +5,17 @@ This module provides functions to perform file operations with a Nextcloud serve
 including downloading and uploading files using HTTP Basic Authentication.
 
 Functions:
-- get_file: Downloads a file from a specified URL.
-- put_file: Uploads a local file to a specified URL.
+- get_file: Downloads a file from a specified URL, streamed to disk, optionally with an ETag cache.
+- put_file: Uploads a local file to a specified URL, streamed from disk.
+- put_stream: Uploads a file object or a generator of byte chunks to a specified URL.
+- put_file_chunked: Uploads a large file in chunks with Nextcloud's WebDAV chunking, resumable.
+- copy_file: Copies a file on the server with WebDAV COPY, without transferring its content.
+- list_folder: Lists a folder with a single PROPFIND, cached by the folder's ETag.
+- find_latest_export: Finds the newest Schild export in a folder.
 
 This script requires the `requests` library and credentials defined in
-the `elternaccounts_credentials` module.
+the `elternaccounts_credentials` module. All requests use the pooled session
+from the `http_session` module, so the connection to the server is reused.
 
 Usage:
 import file_operations
@@ -18,8 +24,20 @@ file_operations.get_file('https://example.com/path/to/file', 'local_file.txt', '
 
 """
 
-import requests
+import hashlib
+import json
+import os
+import re
+import urllib.parse
+from email.utils import parsedate_to_datetime
+import shutil
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.auth import HTTPBasicAuth
+from http_session import get_session
 import logging
 import elternaccounts_credentials
 
@@ -30,52 +48,692 @@ NEXTCLOUD_USERNAME = elternaccounts_credentials.username
 NEXTCLOUD_PASSWORD = elternaccounts_credentials.password
 
 
-def get_file(url: str, filename: str, username: str, password: str) -> None:
+CHUNK_SIZE = 1 << 20
+
+# Standardverzeichnis für den Download-Cache (siehe get_file)
+CACHE_DIR = ".nextcloud-cache"
+
+_cache_lock = threading.Lock()
+
+# Chunked Uploads (siehe put_file_chunked). Nextcloud verlangt 5 MiB bis 5 GiB pro Chunk
+# (außer dem letzten) und höchstens 10000 Chunks.
+UPLOAD_CHUNK_SIZE = 10 << 20
+MIN_CHUNK_SIZE = 5 << 20
+MAX_CHUNK_SIZE = 5 << 30
+PARALLEL_CHUNKS = 3
+MAX_CHUNKS = 10000
+
+# Schild-Exporte heißen 00-ExportJJJJMMTT.csv (siehe find_latest_export)
+EXPORT_PATTERN = r"00-Export(\d{8})\.csv"
+LISTING_CACHE = "elternaccounts-listing.json"
+
+PROPFIND_BODY = (
+    '<?xml version="1.0"?><d:propfind xmlns:d="DAV:"><d:prop>'
+    "<d:getetag/><d:getlastmodified/><d:getcontentlength/><d:resourcetype/>"
+    "</d:prop></d:propfind>"
+)
+
+
+def _cache_pfad(cache_dir: str, url: str) -> str:
+    """Return the path of the cached copy of ``url``."""
+    return os.path.join(cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+
+def _lade_cache_index(cache_dir: str) -> dict:
+    """Load the ETag/Last-Modified index of a download cache."""
+    try:
+        with open(os.path.join(cache_dir, "index.json"), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cache-Index in {cache_dir} konnte nicht gelesen werden: {e}")
+        return {}
+
+
+def _cache_eintrag(cache_dir: str, url: str):
+    """Return the cache entry of ``url`` if its cached copy exists, otherwise None."""
+    with _cache_lock:
+        eintrag = _lade_cache_index(cache_dir).get(url)
+    if eintrag is not None and os.path.exists(_cache_pfad(cache_dir, url)):
+        return eintrag
+    return None
+
+
+def _cache_speichern(cache_dir: str, url: str, filename: str, etag, last_modified) -> None:
+    """Store a copy of ``filename`` as the cached version of ``url``."""
+    if not etag and not last_modified:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    ziel = _cache_pfad(cache_dir, url)
+    shutil.copyfile(filename, f"{ziel}.tmp")
+    os.replace(f"{ziel}.tmp", ziel)
+    with _cache_lock:
+        index = _lade_cache_index(cache_dir)
+        index[url] = {"etag": etag or None, "last_modified": last_modified}
+        tmp_path = os.path.join(cache_dir, "index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file, indent=1)
+        os.replace(tmp_path, os.path.join(cache_dir, "index.json"))
+
+
+class _Fortschritt:
+    """
+    Counts transferred bytes and reports them to an optional progress callback.
+
+    The callback is called as ``progress(uebertragen, gesamt, rate)`` with the number of bytes
+    transferred so far, the total size (None if unknown) and the throughput in bytes per second.
+    """
+
+    def __init__(self, gesamt=None, progress=None):
+        self.gesamt = gesamt
+        self.progress = progress
+        self.uebertragen = 0
+        self.start = time.monotonic()
+
+    def rate(self) -> float:
+        dauer = time.monotonic() - self.start
+        return self.uebertragen / dauer if dauer > 0 else 0.0
+
+    def __call__(self, anzahl: int) -> None:
+        self.uebertragen += anzahl
+        if self.progress is not None:
+            self.progress(self.uebertragen, self.gesamt, self.rate())
+
+
+class _ProgressReader:
+    """
+    File wrapper that reports every read to a _Fortschritt.
+
+    It exposes ``__len__`` so requests sends a Content-Length instead of a chunked body, and
+    ``tell``/``seek`` so the body can be rewound if the request is retried.
+    """
+
+    def __init__(self, file, fortschritt: _Fortschritt):
+        self.file = file
+        self.fortschritt = fortschritt
+        self.laenge = os.fstat(file.fileno()).st_size
+
+    def __len__(self):
+        return self.laenge - self.file.tell()
+
+    def read(self, size=-1):
+        daten = self.file.read(size)
+        self.fortschritt(len(daten))
+        return daten
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        position = self.file.seek(offset, whence)
+        self.fortschritt.uebertragen = position
+        return position
+
+
+def _zaehle(chunks, fortschritt: _Fortschritt):
+    """Passes chunks of a generator body through while counting them."""
+    for chunk in chunks:
+        fortschritt(len(chunk))
+        yield chunk
+
+
+def get_file(
+    url: str,
+    filename: str,
+    username: str,
+    password: str,
+    progress=None,
+    chunk_size: int = CHUNK_SIZE,
+    cache_dir: str = None,
+    etag: str = None,
+):
     """
     Downloads a file from a specified URL and saves it locally.
 
+    The response is streamed in chunks into a temporary file next to ``filename``, which is renamed
+    to ``filename`` once the download is complete. Memory usage is therefore independent of the
+    file size, and an interrupted download never leaves a partial file behind.
+
+    With ``cache_dir`` set, a copy of every downloaded file is kept in that directory together with 
+    its ETag and Last-Modified date. Later downloads of the same URL are sent as conditional requests 
+    (If-None-Match/If-Modified-Since); if the server answers 304 Not Modified, the file is served 
+    from the cache without transferring it again. If the current ``etag`` of the file is already 
+    known, e.g. from a directory listing (see find_latest_export), and matches the cached copy, no 
+    request is sent at all.
+
     Parameters:
     - url (str): The URL from which the file will be downloaded.
     - filename (str): The local filename where the downloaded content will be saved.
     - username (str): The username for HTTP Basic Authentication.
     - password (str): The password for HTTP Basic Authentication.
+    - progress (callable, optional): Called as ``progress(uebertragen, gesamt, rate)`` after every
+      chunk, with the bytes transferred so far, the total size (None if unknown) and the
+      throughput in bytes per second.
+    - chunk_size (int, optional): Size of the chunks read from the response.
+    - cache_dir (str, optional): Directory of the download cache, e.g. CACHE_DIR. Defaults to None
+      (no caching).
+    - etag (str, optional): The current ETag of the file on the server, if known.
+
+    Returns:
+    - str or None: The ETag of the downloaded file ("" if the server sent none), None if the
+      download failed.
 
     Logs:
-    - Info: If the file is downloaded successfully.
-    - Error: If the request fails with a status code other than 200.
+    - Info: If the file is downloaded successfully or served from the cache.
+    - Error: If the request fails with a status code other than 200 or 304.
     """
-    response = requests.get(url, auth=HTTPBasicAuth(username, password))
+    headers = {}
+    eintrag = _cache_eintrag(cache_dir, url) if cache_dir else None
+    if eintrag is not None and etag and eintrag.get("etag") == etag:
+        shutil.copyfile(_cache_pfad(cache_dir, url), filename)
+        logger.info(f"Datei ist lokal aktuell, Download übersprungen: {url}")
+        return etag
+    if eintrag is not None:
+        if eintrag.get("etag"):
+            headers["If-None-Match"] = eintrag["etag"]
+        if eintrag.get("last_modified"):
+            headers["If-Modified-Since"] = eintrag["last_modified"]
+
+    with get_session().get(
+        url, auth=HTTPBasicAuth(username, password), headers=headers, stream=True
+    ) as response:
+        if response.status_code == 304 and eintrag is not None:
+            shutil.copyfile(_cache_pfad(cache_dir, url), filename)
+            logger.info(f"Datei ist unverändert, aus dem Cache verwendet: {url}")
+            return response.headers.get("ETag", eintrag.get("etag") or "")
+        if response.status_code != 200:
+            logger.error(f"Fehler beim Zugriff auf die Datei: {response.status_code}")
+            return None
+
+        gesamt = response.headers.get("Content-Length")
+        fortschritt = _Fortschritt(int(gesamt) if gesamt else None, progress)
+        verzeichnis = os.path.dirname(os.path.abspath(filename))
+        with tempfile.NamedTemporaryFile(
+            dir=verzeichnis, prefix=".download-", delete=False
+        ) as file:
+            try:
+                for chunk in response.iter_content(chunk_size):
+                    file.write(chunk)
+                    fortschritt(len(chunk))
+            except BaseException:
+                file.close()
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, filename)
+        logger.info(
+            f"Datei wurde heruntergeladen von {url} "
+            f"({fortschritt.uebertragen} Bytes, {fortschritt.rate() / 1024:.0f} KiB/s)"
+        )
+        if cache_dir:
+            _cache_speichern(
+                cache_dir,
+                url,
+                filename,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+        return response.headers.get("ETag", "")
+
+
+def put_stream(url: str, data, username: str, password: str, progress=None):
+    """
+    Uploads a file object or a generator of byte chunks to a specified URL without buffering it.
+
+    File objects are sent with a Content-Length, generators with chunked transfer encoding. A 
+    generator cannot be sent a second time, so generator bodies (and file objects that cannot seek) 
+    are not retried after a connection error or a 429/5xx response; the upload fails instead.
+
+    Parameters:
+    - url (str): The URL to which the data will be uploaded.
+    - data: An open binary file object or an iterable of ``bytes`` chunks.
+    - username (str): The username for HTTP Basic Authentication.
+    - password (str): The password for HTTP Basic Authentication.
+    - progress (callable, optional): Called as ``progress(uebertragen, gesamt, rate)``, see get_file.
 
-    if response.status_code == 200:
-        file_content = response.content
-        with open(filename, "wb") as file:
-            file.write(file_content)
-        logger.info(f"Datei wurde heruntergeladen von {url}")
+    Returns:
+    - str or None: The ETag of the uploaded file ("" if the server sent none), None if the
+      upload failed.
+
+    Logs:
+    - Info: If the data is uploaded successfully.
+    - Error: If the request fails with a status code other than 200, 201, or 204.
+    """
+    fortschritt = _Fortschritt(None, progress)
+    if hasattr(data, "read"):
+        body = _ProgressReader(data, fortschritt)
+        fortschritt.gesamt = len(body)
+        wiederholbar = data.seekable()
     else:
-        logger.error(f"Fehler beim Zugriff auf die Datei: {response.status_code}")
+        body = _zaehle(data, fortschritt)
+        wiederholbar = False
+    response = get_session(retries=wiederholbar).put(
+        url, data=body, auth=HTTPBasicAuth(username, password)
+    )
+
+    if response.status_code in [200, 201, 204]:
+        logger.info(
+            f"Datei wurde hochgeladen zu {url} "
+            f"({fortschritt.uebertragen} Bytes, {fortschritt.rate() / 1024:.0f} KiB/s)"
+        )
+        return response.headers.get("ETag", "")
+    else:
+        logger.error(f"Fehler beim Hochladen der Datei: {response.status_code}")
 
 
-def put_file(url: str, filename: str, username: str, password: str) -> None:
+def put_file(
+    url: str,
+    filename: str,
+    username: str,
+    password: str,
+    progress=None,
+    cache_dir: str = None,
+    chunk_size: int = None,
+):
     """
     Uploads a local file to a specified URL.
 
+    The file is streamed from disk (see put_stream) instead of being read into memory first. With 
+    ``cache_dir`` set and an ETag in the response, the uploaded file is stored in the download cache, 
+    so the next get_file of the same URL is answered with 304. Files larger than ``chunk_size`` are 
+    uploaded with put_file_chunked.
+
     Parameters:
     - url (str): The URL to which the file will be uploaded.
     - filename (str): The local filename of the file to be uploaded.
     - username (str): The username for HTTP Basic Authentication.
     - password (str): The password for HTTP Basic Authentication.
+    - progress (callable, optional): Called as ``progress(uebertragen, gesamt, rate)``, see get_file.
+    - cache_dir (str, optional): Directory of the download cache, see get_file.
+    - chunk_size (int, optional): Enables chunked, resumable uploads for files larger than this
+      size, e.g. UPLOAD_CHUNK_SIZE. Must be between MIN_CHUNK_SIZE and MAX_CHUNK_SIZE. Defaults to
+      None (always a single PUT).
+
+    Returns:
+    - str or None: The ETag of the uploaded file ("" if the server sent none), None if the
+      upload failed.
+
+    Raises:
+    - ValueError: If ``chunk_size`` is outside the limits of Nextcloud's chunking.
 
     Logs:
     - Info: If the file is uploaded successfully.
     - Error: If the request fails with a status code other than 200, 201, or 204.
     """
+    if chunk_size:
+        _pruefe_chunk_size(chunk_size)
+    if chunk_size and os.path.getsize(filename) > chunk_size:
+        etag = put_file_chunked(
+            url, filename, username, password, chunk_size=chunk_size, progress=progress
+        )
+    else:
+        with open(filename, "rb") as file:
+            etag = put_stream(url, file, username, password, progress)
+    if cache_dir and etag:
+        _cache_speichern(cache_dir, url, filename, etag, None)
+    return etag
+
+
+def _pruefe_chunk_size(chunk_size: int) -> None:
+    """Raise ValueError if Nextcloud would reject chunks of this size when joining them."""
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(
+            f"Chunkgröße {chunk_size} liegt außerhalb von {MIN_CHUNK_SIZE} bis {MAX_CHUNK_SIZE} Bytes"
+        )
+
+
+def _upload_ordner(url: str, transfer_id: str) -> str:
+    """Derive the chunking upload folder for a target URL below remote.php/dav/files/<user>/."""
+    treffer = re.match(r"(.*/remote\.php/dav)/files/([^/]+)/", url)
+    if treffer is None:
+        raise ValueError(f"Keine WebDAV-Dateiadresse von Nextcloud: {url}")
+    return f"{treffer.group(1)}/uploads/{treffer.group(2)}/{transfer_id}"
+
+
+def _transfer_id(url: str, filename: str, chunk_size: int) -> str:
+    """Derive a transfer id that stays the same as long as target, file and chunk size do."""
+    stat = os.stat(filename)
+    schluessel = f"{url}\n{stat.st_size}\n{stat.st_mtime_ns}\n{chunk_size}"
+    return "upload-" + hashlib.sha256(schluessel.encode("utf-8")).hexdigest()[:32]
+
+
+def _vorhandene_chunks(ordner: str, auth: HTTPBasicAuth) -> dict:
+    """
+    List the chunks already stored in an upload folder.
+
+    Returns a dict of chunk number to size, or None if the folder does not exist.
+    """
+    response = get_session().request(
+        "PROPFIND",
+        ordner,
+        headers={"Depth": "1", "Content-Type": "application/xml"},
+        data=(
+            '<?xml version="1.0"?><d:propfind xmlns:d="DAV:">'
+            "<d:prop><d:getcontentlength/></d:prop></d:propfind>"
+        ),
+        auth=auth,
+    )
+    if response.status_code == 404:
+        return None
+    if response.status_code != 207:
+        raise IOError(f"Upload-Ordner konnte nicht gelesen werden: {response.status_code}")
+    chunks = {}
+    for eintrag in ET.fromstring(response.content).iter("{DAV:}response"):
+        name = eintrag.findtext("{DAV:}href", "").rstrip("/").rsplit("/", 1)[-1]
+        laenge = eintrag.findtext(".//{DAV:}getcontentlength")
+        if name.isdigit() and laenge is not None:
+            chunks[int(name)] = int(laenge)
+    return chunks
+
+
+def _put_chunk(
+    ordner: str, url: str, filename: str, nummer: int, offset: int, laenge: int, auth: HTTPBasicAuth
+) -> int:
+    """Upload one chunk of a file and return its length."""
     with open(filename, "rb") as file:
-        file_content = file.read()
-    response = requests.put(
-        url, data=file_content, auth=HTTPBasicAuth(username, password)
+        file.seek(offset)
+        daten = file.read(laenge)
+    response = get_session().put(
+        f"{ordner}/{nummer}", data=daten, headers={"Destination": url}, auth=auth
     )
+    if response.status_code not in [200, 201, 204]:
+        raise IOError(f"Chunk {nummer} konnte nicht hochgeladen werden: {response.status_code}")
+    return laenge
 
-    if response.status_code in [200, 201, 204]:
-        logger.info(f"Datei wurde hochgeladen zu {url}")
-    else:
-        logger.error(f"Fehler beim Hochladen der Datei: {response.status_code}")
+
+def put_file_chunked(
+    url: str,
+    filename: str,
+    username: str,
+    password: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    parallel: int = PARALLEL_CHUNKS,
+    progress=None,
+):
+    """
+    Uploads a large file in chunks using Nextcloud's WebDAV chunking (v2).
+
+    The chunks are stored in an upload folder below ``remote.php/dav/uploads/<user>/``, several of 
+    them at the same time, and joined on the server with a final MOVE. The name of the upload folder 
+    is derived from the target URL, the file's size and modification time and the chunk size, so 
+    after an interrupted upload a new call with the same arguments finds the folder again and only 
+    uploads the chunks that are missing.
+
+    Parameters:
+    - url (str): The target URL below ``remote.php/dav/files/<user>/``.
+    - filename (str): The local filename of the file to be uploaded.
+    - username (str): The username for HTTP Basic Authentication.
+    - password (str): The password for HTTP Basic Authentication.
+    - chunk_size (int, optional): Size of the chunks in bytes, between MIN_CHUNK_SIZE and
+      MAX_CHUNK_SIZE. Defaults to UPLOAD_CHUNK_SIZE.
+    - parallel (int, optional): Number of chunks uploaded at the same time. Defaults to
+      PARALLEL_CHUNKS.
+    - progress (callable, optional): Called as ``progress(uebertragen, gesamt, rate)`` after every
+      chunk, see get_file.
+
+    Returns:
+    - str or None: The ETag of the uploaded file ("" if the server sent none), None if the
+      upload failed. The upload folder of a failed upload is kept for resuming. The final MOVE
+      is never retried, because a repeated MOVE of an already joined file fails with 404; a new
+      call only repeats the MOVE if all chunks are still there.
+
+    Raises:
+    - ValueError: If the URL is not a Nextcloud WebDAV file URL, the chunk size is outside the
+      limits or the file needs more than MAX_CHUNKS chunks.
+
+    Logs:
+    - Info: If chunks are resumed and if the file is uploaded successfully.
+    - Error: If a chunk or the final MOVE fails.
+    """
+    _pruefe_chunk_size(chunk_size)
+    auth = HTTPBasicAuth(username, password)
+    groesse = os.path.getsize(filename)
+    anzahl = max(1, -(-groesse // chunk_size))
+    if anzahl > MAX_CHUNKS:
+        raise ValueError(f"{filename} benötigt {anzahl} Chunks, erlaubt sind {MAX_CHUNKS}")
+    ordner = _upload_ordner(url, _transfer_id(url, filename, chunk_size))
+
+    try:
+        vorhanden = _vorhandene_chunks(ordner, auth)
+    except IOError as e:
+        logger.error(str(e))
+        return None
+    if vorhanden is None:
+        vorhanden = {}
+        response = get_session().request(
+            "MKCOL", ordner, headers={"Destination": url}, auth=auth
+        )
+        if response.status_code != 201:
+            logger.error(f"Upload-Ordner konnte nicht angelegt werden: {response.status_code}")
+            return None
+
+    fortschritt = _Fortschritt(groesse, progress)
+    offen = []
+    for nummer in range(1, anzahl + 1):
+        offset = (nummer - 1) * chunk_size
+        laenge = min(chunk_size, groesse - offset)
+        if vorhanden.get(nummer) == laenge:
+            fortschritt.uebertragen += laenge
+        else:
+            offen.append((nummer, offset, laenge))
+    if fortschritt.uebertragen:
+        logger.info(
+            f"Upload von {filename} wird fortgesetzt, "
+            f"{anzahl - len(offen)} von {anzahl} Chunks sind bereits vorhanden"
+        )
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [
+            executor.submit(_put_chunk, ordner, url, filename, nummer, offset, laenge, auth)
+            for nummer, offset, laenge in offen
+        ]
+        try:
+            for future in as_completed(futures):
+                fortschritt(future.result())
+        except IOError as e:
+            for future in futures:
+                future.cancel()
+            logger.error(f"Fehler beim Hochladen von {filename}: {e}")
+            return None
+
+    try:
+        response = get_session().request(
+            "MOVE",
+            f"{ordner}/.file",
+            headers={"Destination": url, "Overwrite": "T", "OC-Total-Length": str(groesse)},
+            auth=auth,
+        )
+    except IOError as e:
+        logger.error(f"Fehler beim Zusammensetzen der Chunks: {e}")
+        return None
+    if response.status_code in [201, 204]:
+        logger.info(
+            f"Datei wurde in {anzahl} Chunks hochgeladen zu {url} "
+            f"({groesse} Bytes, {fortschritt.rate() / 1024:.0f} KiB/s)"
+        )
+        return response.headers.get("OC-ETag", response.headers.get("ETag", ""))
+    logger.error(f"Fehler beim Zusammensetzen der Chunks: {response.status_code}")
+    return None
+
+
+def copy_file(
+    source_url: str, target_url: str, username: str, password: str, etag: str = None
+) -> bool:
+    """
+    Copies a file on the server with WebDAV COPY, so its content is not transferred again.
+
+    Parameters:
+    - source_url (str): The URL of the existing file.
+    - target_url (str): The URL of the copy. An existing file is overwritten.
+    - username (str): The username for HTTP Basic Authentication.
+    - password (str): The password for HTTP Basic Authentication.
+    - etag (str, optional): Expected ETag of the source. If the source has changed in the meantime,
+      the server rejects the copy with 412.
+
+    Returns:
+    - bool: True if the copy was created.
+
+    Logs:
+    - Info: If the file is copied successfully.
+    - Error: If the request fails with a status code other than 201 or 204.
+    """
+    headers = {"Destination": target_url, "Overwrite": "T"}
+    if etag:
+        headers["If-Match"] = etag
+    response = get_session().request(
+        "COPY", source_url, headers=headers, auth=HTTPBasicAuth(username, password)
+    )
+
+    if response.status_code in [201, 204]:
+        logger.info(f"Datei wurde auf dem Server kopiert von {source_url} zu {target_url}")
+        return True
+    logger.error(f"Fehler beim Kopieren der Datei: {response.status_code}")
+    return False
+
+
+def _lies_multistatus(raw) -> list:
+    """
+    Parse a WebDAV multistatus response incrementally.
+
+    Every ``d:response`` element is turned into a dict and dropped from the tree right away, so the
+    memory usage does not grow with the number of entries.
+    """
+    eintraege = []
+    for _, element in ET.iterparse(raw, events=("end",)):
+        if element.tag != "{DAV:}response":
+            continue
+        href = urllib.parse.unquote(element.findtext("{DAV:}href", ""))
+        laenge = element.findtext(".//{DAV:}getcontentlength")
+        eintraege.append(
+            {
+                "href": href,
+                "name": href.rstrip("/").rsplit("/", 1)[-1],
+                "ordner": element.find(".//{DAV:}resourcetype/{DAV:}collection") is not None,
+                "etag": element.findtext(".//{DAV:}getetag"),
+                "last_modified": element.findtext(".//{DAV:}getlastmodified"),
+                "size": int(laenge) if laenge else None,
+            }
+        )
+        element.clear()
+    return eintraege
+
+
+def list_folder(url: str, username: str, password: str, cache_path: str = LISTING_CACHE):
+    """
+    Lists the content of a folder with a single PROPFIND (Depth: 1).
+
+    The response is parsed while it is streamed. The listing is cached together with the ETag of 
+    the folder, and the next PROPFIND is sent with If-None-Match. If the server answers 304 or 412 
+    (Precondition Failed, which is what WebDAV servers return for PROPFIND), the folder is 
+    unchanged and the cached listing is returned.
+
+    Parameters:
+    - url (str): The URL of the folder.
+    - username (str): The username for HTTP Basic Authentication.
+    - password (str): The password for HTTP Basic Authentication.
+    - cache_path (str, optional): Path to the JSON file of cached listings, None to disable the
+      cache.
+
+    Returns:
+    - list or None: The entries of the folder (without the folder itself) as dicts with the keys
+      name, href, ordner, etag, last_modified and size; None if the request failed.
+
+    Logs:
+    - Info: If the cached listing is used.
+    - Error: If the request fails with a status code other than 207.
+    """
+    url = url.rstrip("/") + "/"
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Listing-Cache {cache_path} konnte nicht gelesen werden: {e}")
+    gecacht = cache.get(url)
+
+    headers = {"Depth": "1", "Content-Type": "application/xml"}
+    if gecacht and gecacht.get("etag"):
+        headers["If-None-Match"] = gecacht["etag"]
+    with get_session().request(
+        "PROPFIND",
+        url,
+        headers=headers,
+        data=PROPFIND_BODY,
+        auth=HTTPBasicAuth(username, password),
+        stream=True,
+    ) as response:
+        if response.status_code in (304, 412) and gecacht:
+            logger.info(f"Ordner ist unverändert, Listing aus dem Cache verwendet: {url}")
+            return gecacht["eintraege"]
+        if response.status_code != 207:
+            logger.error(f"Fehler beim Auflisten des Ordners: {response.status_code}")
+            return None
+        response.raw.decode_content = True
+        eintraege = _lies_multistatus(response.raw)
+
+    pfad = urllib.parse.unquote(urllib.parse.urlparse(url).path)
+    ordner = [e for e in eintraege if e["href"].rstrip("/") + "/" == pfad]
+    eintraege = [e for e in eintraege if e["href"].rstrip("/") + "/" != pfad]
+    if cache_path and ordner and ordner[0]["etag"]:
+        cache[url] = {"etag": ordner[0]["etag"], "eintraege": eintraege}
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file, indent=1)
+        os.replace(tmp_path, cache_path)
+    return eintraege
+
+
+def find_latest_export(
+    url: str,
+    username: str,
+    password: str,
+    pattern: str = EXPORT_PATTERN,
+    cache_path: str = LISTING_CACHE,
+):
+    """
+    Finds the newest Schild export in a folder.
+
+    The folder is listed with list_folder. Of the files whose name matches ``pattern``, the one 
+    with the highest value of the pattern's first group (the date in the file name) is chosen; 
+    files with the same value, or a pattern without a group, are ordered by their modification 
+    time.
+
+    Parameters:
+    - url (str): The URL of the export folder.
+    - username (str): The username for HTTP Basic Authentication.
+    - password (str): The password for HTTP Basic Authentication.
+    - pattern (str, optional): Regular expression for the file names of the exports.
+    - cache_path (str, optional): Path to the JSON file of cached listings, see list_folder.
+
+    Returns:
+    - dict or None: The entry of the newest export (see list_folder), None if the folder could not
+      be listed or contains no export.
+
+    Logs:
+    - Info: The export that was found.
+    - Error: If no export was found.
+    """
+    eintraege = list_folder(url, username, password, cache_path)
+    if eintraege is None:
+        return None
+
+    def _schluessel(eintrag):
+        treffer = re.fullmatch(pattern, eintrag["name"])
+        zeit = eintrag["last_modified"]
+        return (
+            treffer.group(1) if treffer.groups() else "",
+            parsedate_to_datetime(zeit).timestamp() if zeit else 0.0,
+        )
+
+    exporte = [
+        e for e in eintraege if not e["ordner"] and re.fullmatch(pattern, e["name"])
+    ]
+    if not exporte:
+        logger.error(f"Kein Export in {url} gefunden")
+        return None
+    neuester = max(exporte, key=_schluessel)
+    logger.info(f"Neuester Export: {neuester['name']}")
+    return neuester
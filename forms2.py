@@ -5,6 +5,10 @@ This module provides a class to interact with the Nextcloud Forms API, allowing
 users to retrieve forms and their submissions. It supports authentication and 
 uses RESTful endpoints provided by Nextcloud. The functionality includes getting 
 all forms, shared forms, form submissions, and exporting form submissions in CSV format.
+Submissions can also be loaded straight into a pandas DataFrame with the same columns as
+the CSV export, without writing and parsing a CSV file, or synchronised incrementally into
+a local append-only store. Large CSV exports can be read as a stream, row by row or in
+DataFrame chunks.
 
 Usage:
     To use this module, instantiate the `NextcloudFormsAPI` class with valid 
@@ -17,11 +21,21 @@ Example:
 
 Dependencies:
     - requests: To make HTTP requests to the API.
+    - pandas: To build DataFrames from the submissions.
+    - http_session: Provides the shared pooled session with timeouts and retries.
+    - response_cache: Optional TTL cache for GET requests.
     - elternaccounts_credentials: To securely handle and retrieve user credentials.
     - logging: For logging purposes in the module.
 """
-import requests
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import csv
+import io
+import json
+import os
+import pandas as pd
 import elternaccounts_credentials
+from http_session import get_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,6 +44,117 @@ NEXTCLOUD_USERNAME = elternaccounts_credentials.username
 NEXTCLOUD_PASSWORD = elternaccounts_credentials.password
 NEXTCLOUD_URL = elternaccounts_credentials.server_url
 
+# Spaltentitel des CSV-Exports von Nextcloud Forms (deutsche Oberfläche)
+SPALTE_BENUTZER = "Benutzer-ID"
+SPALTE_ANZEIGENAME = "Anzeigename"
+SPALTE_ZEITSTEMPEL = "Zeitstempel"
+ANONYMER_BENUTZER = "Anonymer Benutzer"
+# Zeitzone, in der der CSV-Export die Zeitstempel angibt (die Zeitzone des exportierenden
+# Nextcloud-Benutzers), einstellbar in elternaccounts_credentials.zeitzone
+ZEITZONE = ZoneInfo(getattr(elternaccounts_credentials, "zeitzone", "Europe/Berlin"))
+
+# Lokaler Speicher der inkrementellen Synchronisation (siehe fetchNewFormSubmissions)
+SYNC_STORE = "elternaccounts-submissions.jsonl"
+SYNC_CURSOR = "elternaccounts-submissions-cursor.json"
+
+
+def submissions_to_dataframe(data: dict, zeitzone=ZEITZONE) -> pd.DataFrame:
+    """
+    Converts the OCS data of a submissions request into a DataFrame.
+
+    The columns are the same as in the CSV export: user ID, display name, the timestamp in ISO 8601
+    format (PHP's ``c``) and one column per question in the order of the form. Several answers to 
+    the same question are joined with "; ", unanswered questions are missing (``pd.NA``). All 
+    columns have the ``string`` dtype, like the text of the CSV export, so the frame has the same 
+    types whether it contains submissions or not. The rows are sorted by submission ID, i.e. in the 
+    order the submissions were made.
+
+    The timestamp is written in ``zeitzone``, which should be the timezone of the Nextcloud user 
+    the CSV export is made with (``elternaccounts_credentials.zeitzone``). Other timezones give a 
+    different text for the same instant; data_processing compares the Zeitstempel by the instant 
+    they denote, so such rows are still recognised as duplicates.
+
+    Parameters:
+        data (dict): The ``ocs.data`` object with the keys ``submissions`` and ``questions``.
+        zeitzone (tzinfo, optional): The timezone of the timestamps.
+
+    Returns:
+        pd.DataFrame: One row per submission, indexed by the submission ID (index name ``id``).
+    """
+    fragen = sorted(data["questions"], key=lambda frage: frage.get("order", 0))
+    titel = [frage["text"] for frage in fragen]
+    zeilen = []
+    ids = []
+    for submission in sorted(data["submissions"], key=lambda submission: int(submission["id"])):
+        antworten = {}
+        for antwort in submission["answers"]:
+            antworten.setdefault(antwort["questionId"], []).append(antwort["text"])
+        user_id = submission.get("userId") or ""
+        if user_id.startswith("anon-user-") or not user_id:
+            benutzer, anzeigename = "", ANONYMER_BENUTZER
+        else:
+            benutzer, anzeigename = user_id, submission.get("userDisplayName") or user_id
+        zeitstempel = datetime.fromtimestamp(int(submission["timestamp"]), tz=zeitzone).isoformat()
+        zeile = [benutzer, anzeigename, zeitstempel]
+        for frage in fragen:
+            texte = antworten.get(frage["id"])
+            zeile.append("; ".join(texte) if texte else None)
+        zeilen.append(zeile)
+        ids.append(int(submission["id"]))
+    return pd.DataFrame(
+        zeilen,
+        columns=[SPALTE_BENUTZER, SPALTE_ANZEIGENAME, SPALTE_ZEITSTEMPEL, *titel],
+        index=pd.Index(ids, name="id", dtype="int64"),
+        dtype="string",
+    )
+
+
+def _lade_cursor(cursor_path: str) -> dict:
+    """Loads the sync cursors of all forms, or returns an empty dict."""
+    try:
+        with open(cursor_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _speichere_cursor(cursor_path: str, formshash: str, cursor: dict) -> None:
+    """Replaces the cursor of one form in the cursor file atomically."""
+    cursors = _lade_cursor(cursor_path)
+    cursors[formshash] = cursor
+    tmp_path = f"{cursor_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(cursors, file, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, cursor_path)
+
+
+def load_submission_store(
+    formshash: str, store_path: str = SYNC_STORE, cursor_path: str = SYNC_CURSOR
+) -> pd.DataFrame:
+    """
+    Loads all submissions of a form from the local store written by fetchNewFormSubmissions.
+
+    Submissions that were stored twice (e.g. after an interrupted sync) are only returned once.
+
+    Parameters:
+        formshash (str): The unique identifier for the form.
+        store_path (str, optional): Path to the JSONL store.
+        cursor_path (str, optional): Path to the cursor file, which holds the questions of the form.
+
+    Returns:
+        pd.DataFrame: All stored submissions, see submissions_to_dataframe.
+    """
+    submissions = {}
+    with open(store_path, "r", encoding="utf-8") as file:
+        for zeile in file:
+            eintrag = json.loads(zeile)
+            if eintrag["form"] == formshash:
+                submissions[int(eintrag["submission"]["id"])] = eintrag["submission"]
+    fragen = _lade_cursor(cursor_path).get(formshash, {}).get("questions", [])
+    return submissions_to_dataframe(
+        {"submissions": list(submissions.values()), "questions": fragen}
+    )
+
 
 class NextcloudFormsAPI:
     """
@@ -42,8 +167,10 @@ class NextcloudFormsAPI:
         username (str): Username for authentication.
         password (str): Password for authentication.
         auth (tuple): Authentication tuple for requests library.
+        session (requests.Session): The session used for all requests.
+        cache (ResponseCache): Cache for GET requests, None if caching is disabled.
     """
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, session=None, cache=None):
         """
         Initializes a new instance of the NextcloudFormsAPI class.
 
@@ -51,20 +178,28 @@ class NextcloudFormsAPI:
             base_url (str): The base URL of the Nextcloud Forms API.
             username (str): The username for authenticating API requests.
             password (str): The password for authenticating API requests.
+            session (requests.Session, optional): The session to use. Defaults to the shared
+                pooled session from http_session.
+            cache (ResponseCache, optional): Cache for the metadata GET requests (get_forms,
+                get_shared_forms). Defaults to None (no caching).
         """
         self.base_url = base_url
         self.username = username
         self.password = password
         self.auth = (username, password)
+        self.session = session if session is not None else get_session()
+        self.cache = cache
 
-    def _request(self, method, endpoint, **kwargs):
+    def _request(self, method, endpoint, cacheable=False, **kwargs):
         """
         Internal method to send HTTP requests to the Nextcloud Forms API.
 
         Parameters:
             method (str): HTTP method (e.g., "GET", "POST").
             endpoint (str): API endpoint to be appended to the base URL.
-            **kwargs: Additional keyword arguments to pass to the requests.request() function.
+            cacheable (bool, optional): Whether a GET response may be answered from and stored
+                in the response cache.
+            **kwargs: Additional keyword arguments to pass to the session's request() method.
         
         Returns:
             response (requests.Response): The HTTP response from the API call.
@@ -74,10 +209,18 @@ class NextcloudFormsAPI:
         """
         url = f"{self.base_url}/ocs/v2.php/apps/forms/api/v2.4/{endpoint}"
         headers = {"OCS-APIRequest": "true", "Accept": "application/json"}
-        response = requests.request(
+        cache_key = None
+        if cacheable and self.cache is not None and method.upper() == "GET":
+            cache_key = self.cache.key(method, url, kwargs.get("params"), self.auth)
+            response = self.cache.get(cache_key)
+            if response is not None:
+                return response
+        response = self.session.request(
             method, url, auth=self.auth, headers=headers, **kwargs
         )
         response.raise_for_status()
+        if cache_key is not None:
+            self.cache.put(cache_key, response)
         return response
 
     def get_forms(self):
@@ -86,8 +229,9 @@ class NextcloudFormsAPI:
 
         Returns:
             response (requests.Response): The HTTP response containing the array of forms in JSON format.
+            The response is cached if the instance has a response cache.
         """
-        return self._request("GET", "forms")
+        return self._request("GET", "forms", cacheable=True)
 
     def get_shared_forms(self):
         """
@@ -95,8 +239,9 @@ class NextcloudFormsAPI:
 
         Returns:
             response (requests.Response): The HTTP response containing shared forms in JSON format.
+            The response is cached if the instance has a response cache.
         """
-        return self._request("GET", "shared_forms")
+        return self._request("GET", "shared_forms", cacheable=True)
 
     def getFormSubmissions(self, formshash: str):
         """
@@ -122,6 +267,135 @@ class NextcloudFormsAPI:
         """
         return self._request("GET", f"submissions/export/{formshash}")
 
+    def iterFormSubmissionsCSV(self, formshash: str, chunksize: int = None):
+        """
+        Reads the CSV export of a form as a stream.
+
+        The response body is decoded and parsed while it is received, so only the current row or
+        chunk is held in memory. Line breaks inside quoted answers are handled by the CSV parser.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+            chunksize (int, optional): Number of rows per DataFrame chunk. Defaults to None,
+                which yields single rows.
+
+        Yields:
+            dict or pd.DataFrame: Without ``chunksize`` one dict per submission with the column
+            titles as keys, otherwise DataFrames of up to ``chunksize`` rows as returned by
+            ``pd.read_csv``.
+        """
+        with self._request("GET", f"submissions/export/{formshash}", stream=True) as response:
+            response.raw.decode_content = True
+            # Sonst meldet urllib3 am Ende des Bodys eine geschlossene Datei, bevor der
+            # TextIOWrapper seinen Puffer geleert hat
+            response.raw.auto_close = False
+            text = io.TextIOWrapper(response.raw, encoding="utf-8-sig", newline="")
+            if chunksize is None:
+                yield from csv.DictReader(text)
+            else:
+                yield from pd.read_csv(text, chunksize=chunksize)
+
+    def getFormSubmissionsDataFrame(self, formshash: str) -> pd.DataFrame:
+        """
+        Retrieves submissions for a specific form as a DataFrame.
+
+        The JSON submissions are converted directly (see submissions_to_dataframe), so the
+        DataFrame has the same columns as the CSV export without writing and parsing a CSV file.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+
+        Returns:
+            pd.DataFrame: One row per submission, indexed by the submission ID.
+        """
+        data = self.getFormSubmissions(formshash).json()["ocs"]["data"]
+        df = submissions_to_dataframe(data)
+        logger.info(f"{len(df)} Formulareinträge geladen")
+        return df
+
+    def fetchNewFormSubmissions(
+        self, formshash: str, store_path: str = SYNC_STORE, cursor_path: str = SYNC_CURSOR
+    ) -> tuple:
+        """
+        Fetches the submissions of a form since the last commit, without moving the cursor yet.
+
+        The highest submission ID and timestamp seen so far are kept as a cursor per form. Only
+        submissions with a higher ID are appended to the local JSONL store and returned. The cursor
+        is moved by the returned commit function, which should only be called once the new
+        submissions have been processed completely (e.g. the workbook has been uploaded). Until
+        then, the next call returns the same submissions again.
+
+        The Forms API v2.4 has no parameter to filter submissions on the server, so the list of
+        submissions is still transferred completely; the filtering happens on the client.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+            store_path (str, optional): Path to the append-only JSONL store.
+            cursor_path (str, optional): Path to the cursor file.
+
+        Returns:
+            tuple: ``(df, commit)`` with the new submissions (see submissions_to_dataframe) and a
+            function without arguments that moves the cursor past them.
+        """
+        cursor = _lade_cursor(cursor_path).get(formshash, {"id": 0, "timestamp": 0})
+        data = self.getFormSubmissions(formshash).json()["ocs"]["data"]
+        neu = sorted(
+            (s for s in data["submissions"] if int(s["id"]) > cursor["id"]),
+            key=lambda submission: int(submission["id"]),
+        )
+
+        if neu:
+            # Erst den Speicher ergänzen, dann den Cursor verschieben: nach einem Abbruch
+            # werden höchstens Einträge doppelt gespeichert, aber keine verloren.
+            with open(store_path, "a", encoding="utf-8") as file:
+                for submission in neu:
+                    eintrag = {"form": formshash, "submission": submission}
+                    file.write(json.dumps(eintrag, ensure_ascii=False) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+        if cursor.get("questions") != data["questions"]:
+            # Die Fragen werden sofort gespeichert, damit load_submission_store den Speicher
+            # auch vor dem ersten commit lesen kann
+            _speichere_cursor(cursor_path, formshash, dict(cursor, questions=data["questions"]))
+        neuer_cursor = {
+            "id": max([cursor["id"]] + [int(s["id"]) for s in neu]),
+            "timestamp": max([cursor["timestamp"]] + [int(s["timestamp"]) for s in neu]),
+            "questions": data["questions"],
+        }
+        logger.info(
+            f"{len(neu)} neue von {len(data['submissions'])} Formulareinträgen "
+            f"(bis ID {neuer_cursor['id']})"
+        )
+
+        def commit():
+            _speichere_cursor(cursor_path, formshash, neuer_cursor)
+            logger.info(f"Sync-Cursor von {formshash} auf ID {neuer_cursor['id']} verschoben")
+
+        df = submissions_to_dataframe({"submissions": neu, "questions": data["questions"]})
+        return df, commit
+
+    def syncFormSubmissions(
+        self, formshash: str, store_path: str = SYNC_STORE, cursor_path: str = SYNC_CURSOR
+    ) -> pd.DataFrame:
+        """
+        Synchronises the submissions of a form incrementally and returns only the new ones.
+
+        Like fetchNewFormSubmissions, but the cursor is moved right away. Submissions that are lost 
+        in a later processing step are not returned again, so pipelines that write the submissions 
+        elsewhere should use fetchNewFormSubmissions and commit after the write. The complete data 
+        is available offline with load_submission_store.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+            store_path (str, optional): Path to the append-only JSONL store.
+            cursor_path (str, optional): Path to the cursor file.
+
+        Returns:
+            pd.DataFrame: The new submissions, see submissions_to_dataframe.
+        """
+        df, commit = self.fetchNewFormSubmissions(formshash, store_path, cursor_path)
+        commit()
+        return df
 
 if __name__ == "__main__":
     # Instantiate the API client with Nextcloud credentials
@@ -0,0 +1,160 @@
+"""
+forms_async.py
+
+This module provides an asyncio variant of the NextcloudFormsAPI client from forms2.py. It has the same
+methods as coroutines, so the submissions of many forms (e.g. one per school and school year) can be
+fetched at the same time instead of one after another.
+
+This is a thread-pool wrapper, not an asynchronous transport: every coroutine runs the blocking method of
+NextcloudFormsAPI with ``loop.run_in_executor``, using the pooled session from http_session (keep-alive,
+timeouts, retries). Every request in flight occupies one worker thread, so the concurrency is bounded by
+the thread pool and a semaphore, not by the event loop. No additional dependency such as aiohttp is needed.
+
+Classes:
+- AsyncNextcloudFormsAPI: Asynchronous client for the Nextcloud Forms API.
+
+Usage:
+    async with AsyncNextcloudFormsAPI(NEXTCLOUD_URL, NEXTCLOUD_USERNAME, NEXTCLOUD_PASSWORD) as api:
+        responses = await asyncio.gather(*(api.getFormSubmissions(h) for h in form_hashes))
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from forms2 import NextcloudFormsAPI
+from http_session import POOL_SIZE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Höchstens so viele Anfragen gleichzeitig, damit jede eine Verbindung aus dem Pool bekommt
+MAX_CONCURRENCY = POOL_SIZE
+
+
+class AsyncNextcloudFormsAPI:
+    """
+    Asynchronous client for the Nextcloud Forms API with the methods of NextcloudFormsAPI.
+
+    The methods run the synchronous client in a thread pool of ``max_concurrency`` workers.
+
+    Attributes:
+        api (NextcloudFormsAPI): The synchronous client that sends the requests.
+        max_concurrency (int): Maximum number of requests in flight.
+    """
+
+    def __init__(
+        self, base_url, username, password, session=None, cache=None, max_concurrency=MAX_CONCURRENCY
+    ):
+        """
+        Initializes a new instance of the AsyncNextcloudFormsAPI class.
+
+        Parameters:
+            base_url (str): The base URL of the Nextcloud server.
+            username (str): The username for authenticating API requests.
+            password (str): The password for authenticating API requests.
+            session (requests.Session, optional): The session to use, see NextcloudFormsAPI.
+            cache (ResponseCache, optional): Cache for metadata requests, see NextcloudFormsAPI.
+            max_concurrency (int, optional): Maximum number of requests in flight. Should not be
+                larger than the connection pool of the session.
+        """
+        self.api = NextcloudFormsAPI(base_url, username, password, session=session, cache=cache)
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="forms-async"
+        )
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Shuts down the thread pool. The shared session stays open."""
+        self._executor.shutdown(wait=False)
+
+    async def _call(self, func, *args, **kwargs):
+        """Runs a method of the synchronous client in the thread pool, limited by the semaphore."""
+        if self._semaphore is None:
+            # Erst hier anlegen, damit die Semaphore zur laufenden Event-Loop gehört
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def get_forms(self):
+        """
+        Retrieves all forms accessible to the user.
+
+        Returns:
+            response (requests.Response): The HTTP response containing the array of forms in JSON format.
+        """
+        return await self._call(self.api.get_forms)
+
+    async def get_shared_forms(self):
+        """
+        Retrieves all forms shared with other users.
+
+        Returns:
+            response (requests.Response): The HTTP response containing shared forms in JSON format.
+        """
+        return await self._call(self.api.get_shared_forms)
+
+    async def getFormSubmissions(self, formshash: str):
+        """
+        Retrieves submissions for a specific form.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+
+        Returns:
+            response (requests.Response): The HTTP response containing submissions in JSON format.
+        """
+        return await self._call(self.api.getFormSubmissions, formshash)
+
+    async def getFormSubmissionsCSV(self, formshash: str):
+        """
+        Retrieves submissions for a specific form in CSV format.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+
+        Returns:
+            response (requests.Response): The HTTP response containing submissions in CSV format.
+        """
+        return await self._call(self.api.getFormSubmissionsCSV, formshash)
+
+    async def getFormSubmissionsDataFrame(self, formshash: str):
+        """
+        Retrieves submissions for a specific form as a DataFrame, see
+        NextcloudFormsAPI.getFormSubmissionsDataFrame.
+
+        Parameters:
+            formshash (str): The unique identifier for the form.
+
+        Returns:
+            pd.DataFrame: One row per submission, indexed by the submission ID.
+        """
+        return await self._call(self.api.getFormSubmissionsDataFrame, formshash)
+
+    async def getManyFormSubmissions(self, formshashes) -> dict:
+        """
+        Retrieves the submissions of several forms at the same time.
+
+        Parameters:
+            formshashes (iterable): The unique identifiers of the forms.
+
+        Returns:
+            dict: The HTTP responses containing the submissions in JSON format by form hash.
+
+        Raises:
+            HTTPError: If one of the requests returned an unsuccessful status code.
+        """
+        formshashes = list(formshashes)
+        responses = await asyncio.gather(
+            *(self.getFormSubmissions(formshash) for formshash in formshashes)
+        )
+        logger.info(f"Formulareinträge von {len(formshashes)} Formularen geladen")
+        return dict(zip(formshashes, responses))
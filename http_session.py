@@ -0,0 +1,137 @@
+"""
+http_session.py
+
+This module provides the shared HTTP transport for all requests to the Nextcloud server. Instead of
+opening a new TCP and TLS connection for every call, file_operations and NextcloudFormsAPI use one
+pooled requests.Session with keep-alive.
+
+Features:
+- Connection pool with configurable size.
+- Default timeouts for every request (can still be overridden per request).
+- Retries with exponential backoff on connection errors and on 429/5xx responses, honouring the
+  Retry-After header. Only idempotent methods (including the WebDAV methods COPY and PROPFIND) are
+  retried. MOVE is not: once the server has moved the source, a retry fails with 404.
+- A second session without retries for requests whose body cannot be sent a second time, e.g. a
+  generator: a retry would send an empty body.
+
+Functions:
+- create_session: Creates a new configured session.
+- get_session: Returns the shared session (or the one without retries), creating it on first use.
+- configure_session: Replaces the shared session with one using different settings.
+
+Usage:
+    from http_session import get_session
+    response = get_session().get(url, auth=(username, password))
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import logging
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 10
+TIMEOUT = (10, 300)  # (Verbindungsaufbau, Lesen) in Sekunden
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset(
+    ["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "COPY", "PROPFIND"]
+)
+
+_session = None
+_session_ohne_retry = None
+_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """
+    A requests.Session that applies a default timeout to every request.
+
+    Attributes:
+        timeout: Default timeout, either seconds or a (connect, read) tuple.
+    """
+
+    def __init__(self, timeout=TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(
+    pool_size: int = POOL_SIZE,
+    timeout=TIMEOUT,
+    retries: int = RETRIES,
+    backoff_factor: float = BACKOFF_FACTOR,
+) -> requests.Session:
+    """
+    Creates a new pooled session with timeouts and retries.
+
+    Args:
+        pool_size (int): Maximum number of kept-alive connections per host.
+        timeout: Default timeout, either seconds or a (connect, read) tuple.
+        retries (int): Maximum number of retries per request.
+        backoff_factor (float): Factor of the exponential backoff between retries.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = TimeoutSession(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(retries: bool = True) -> requests.Session:
+    """
+    Returns the shared session, creating it with the default settings on first use.
+
+    Args:
+        retries (bool): Whether failed requests are retried. Requests with a body that cannot be
+            rewound (e.g. a generator) have to use ``retries=False``.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session, _session_ohne_retry
+    with _lock:
+        if not retries:
+            if _session_ohne_retry is None:
+                _session_ohne_retry = create_session(retries=0)
+            return _session_ohne_retry
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def configure_session(**kwargs) -> requests.Session:
+    """
+    Replaces the shared sessions with new ones. Accepts the arguments of create_session.
+
+    Returns:
+        requests.Session: The new shared session.
+    """
+    global _session, _session_ohne_retry
+    with _lock:
+        for session in (_session, _session_ohne_retry):
+            if session is not None:
+                session.close()
+        _session = create_session(**kwargs)
+        _session_ohne_retry = create_session(**dict(kwargs, retries=0))
+        logger.debug(f"HTTP-Session neu konfiguriert: {kwargs}")
+        return _session
@@ -0,0 +1,451 @@
+"""
+mail_dispatcher.py
+
+This module sends large numbers of emails in parallel. Instead of one SMTP connection that waits for the
+server's reply to every command, a small pool of worker threads with one connection each takes the mails
+from a queue. A token bucket keeps the total rate below the limit of the mail provider.
+
+The queue is stored in an SQLite file. Every mail is marked as sent as soon as the server has accepted
+it, so an interrupted run can simply be started again and continues with the mails that are still open.
+
+Classes:
+- TokenBucket: Thread-safe token bucket rate limiter.
+- MailQueue: Persistent queue of mails in an SQLite file.
+- MailDispatcher: Sends the mails of a queue with several SMTP connections.
+
+Functions:
+- enqueue_batches: Adds one message for many recipients to a queue, split into batches.
+
+Usage:
+    queue = MailQueue("mailqueue.sqlite")
+    enqueue_batches(queue, "anleitung-2024", empfaenger_liste, msg)
+    MailDispatcher(queue, smtp_server, smtp_port, benutzername, passwort).run()
+
+Requirements:
+- Only the standard library is used; the connections are opened with email_operations.verbinde_smtp
+  unless another connection factory is passed (e.g. plain SMTP for the local test server in
+  smtp_sink.py).
+"""
+from collections import deque
+import sqlite3
+import smtplib
+import threading
+import time
+from email_operations import BATCH_SIZE, serialisiere_nachricht, verbinde_smtp
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PATH = "elternaccounts-mailqueue.sqlite"
+WORKERS = 3
+# Empfänger pro Sekunde und Größe eines Schubs; an das Limit des Anbieters anpassen
+RATE = 5.0
+BURST = 50
+MAX_VERSUCHE = 3
+
+# Zustände eines Eintrags der Warteschlange
+OFFEN = "offen"
+GESENDET = "gesendet"
+ABGELEHNT = "abgelehnt"
+FEHLER = "fehler"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    The bucket holds at most ``burst`` tokens and is refilled with ``rate`` tokens per second.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        burst (float): Capacity of the bucket.
+    """
+
+    def __init__(self, rate: float = RATE, burst: float = BURST):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (float): Capacity of the bucket.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._zeit = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, anzahl: float = 1) -> None:
+        """
+        Takes tokens from the bucket and waits until enough are available.
+
+        Requests for more tokens than the capacity wait for a full bucket and then take all of it.
+
+        Args:
+            anzahl (float): Number of tokens.
+        """
+        anzahl = min(anzahl, self.burst)
+        while True:
+            with self._lock:
+                jetzt = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (jetzt - self._zeit) * self.rate)
+                self._zeit = jetzt
+                if self._tokens >= anzahl:
+                    self._tokens -= anzahl
+                    return
+                warten = (anzahl - self._tokens) / self.rate
+            time.sleep(warten)
+
+
+class MailQueue:
+    """
+    Persistent queue of mails in an SQLite file.
+
+    Each entry is one SMTP transaction: the serialised message with its sender and recipients.
+    Entries are grouped into jobs; empfaenger tells which recipients of a job have already been
+    added, so a repeated run does not add them a second time.
+
+    Only the results are written to the file (in WAL mode, without waiting for the disk on every
+    commit); which entries are being sent at the moment is kept in memory. After an interruption,
+    every entry that has not been confirmed as sent is open again. A mail whose confirmation was
+    lost in the interruption can therefore be sent twice, but none is lost.
+
+    Attributes:
+        path (str): Path to the SQLite file.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        """
+        Opens the queue; open entries of an earlier run are sent again.
+
+        Args:
+            path (str): Path to the SQLite file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS mails (
+                id INTEGER PRIMARY KEY,
+                job TEXT NOT NULL,
+                absender TEXT NOT NULL,
+                empfaenger TEXT NOT NULL,
+                nachricht BLOB NOT NULL,
+                status TEXT NOT NULL,
+                versuche INTEGER NOT NULL DEFAULT 0,
+                fehler TEXT
+            );
+            CREATE INDEX IF NOT EXISTS mails_status ON mails (status, id);
+            """
+        )
+        self._offen = deque(self._offene_ids())
+        if self._offen:
+            logger.info(f"{len(self._offen)} offene Mails in der Warteschlange {path}")
+
+    def _offene_ids(self, job: str = None) -> list:
+        """Returns the ids of the open entries, optionally of one job only."""
+        if job is None:
+            zeilen = self._db.execute("SELECT id FROM mails WHERE status = ? ORDER BY id", (OFFEN,))
+        else:
+            zeilen = self._db.execute(
+                "SELECT id FROM mails WHERE status = ? AND job = ? ORDER BY id", (OFFEN, job)
+            )
+        return [zeile[0] for zeile in zeilen]
+
+    def has_job(self, job: str) -> bool:
+        """
+        Checks whether a job has already been added.
+
+        Args:
+            job (str): Name of the job.
+
+        Returns:
+            bool: True if the queue contains entries of the job.
+        """
+        with self._lock:
+            return (
+                self._db.execute("SELECT 1 FROM mails WHERE job = ? LIMIT 1", (job,)).fetchone()
+                is not None
+            )
+
+    def empfaenger(self, job: str, status=(OFFEN, GESENDET, ABGELEHNT)) -> set:
+        """
+        Returns the recipients of a job whose entries have one of the given states.
+
+        Args:
+            job (str): Name of the job.
+            status (iterable): The states to consider. By default all states except FEHLER, i.e.
+                the recipients that are sent to, were sent to or were refused by the server.
+
+        Returns:
+            set: The addresses in lower case.
+        """
+        status = tuple(status)
+        with self._lock:
+            zeilen = self._db.execute(
+                f"SELECT empfaenger FROM mails WHERE job = ? AND status IN ({', '.join('?' * len(status))})",
+                (job, *status),
+            ).fetchall()
+        return {adresse.lower() for (liste,) in zeilen for adresse in liste.split("\n")}
+
+    def add(self, job: str, eintraege) -> int:
+        """
+        Adds entries to the queue in one transaction.
+
+        Args:
+            job (str): Name of the job.
+            eintraege (iterable): ``(absender, empfaenger_liste, nachricht_bytes)`` tuples.
+
+        Returns:
+            int: The number of added entries.
+        """
+        with self._lock:
+            vorher = set(self._offene_ids(job))
+            cursor = self._db.executemany(
+                "INSERT INTO mails (job, absender, empfaenger, nachricht, status) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (job, absender, "\n".join(empfaenger), nachricht, OFFEN)
+                    for absender, empfaenger, nachricht in eintraege
+                ),
+            )
+            self._db.commit()
+            self._offen.extend(i for i in self._offene_ids(job) if i not in vorher)
+            return cursor.rowcount
+
+    def claim(self):
+        """
+        Takes the next open entry.
+
+        Returns:
+            tuple or None: ``(id, absender, empfaenger_liste, nachricht_bytes)``, None if the
+            queue has no open entries.
+        """
+        with self._lock:
+            if not self._offen:
+                return None
+            eintrag_id = self._offen.popleft()
+            zeile = self._db.execute(
+                "SELECT id, absender, empfaenger, nachricht FROM mails WHERE id = ?", (eintrag_id,)
+            ).fetchone()
+        return zeile[0], zeile[1], zeile[2].split("\n"), zeile[3]
+
+    def finish(self, eintrag_id: int, status: str, fehler: str = None) -> None:
+        """
+        Records the result of an entry.
+
+        Entries with status FEHLER are released again until they have failed MAX_VERSUCHE times.
+
+        Args:
+            eintrag_id (int): The id returned by claim.
+            status (str): GESENDET, ABGELEHNT or FEHLER.
+            fehler (str, optional): Error message or refused recipients.
+        """
+        with self._lock:
+            if status == FEHLER:
+                self._db.execute(
+                    "UPDATE mails SET versuche = versuche + 1, fehler = ?, "
+                    "status = CASE WHEN versuche + 1 < ? THEN ? ELSE ? END WHERE id = ?",
+                    (fehler, MAX_VERSUCHE, OFFEN, FEHLER, eintrag_id),
+                )
+                if self._db.execute(
+                    "SELECT status FROM mails WHERE id = ?", (eintrag_id,)
+                ).fetchone()[0] == OFFEN:
+                    self._offen.append(eintrag_id)
+            else:
+                self._db.execute(
+                    "UPDATE mails SET status = ?, fehler = ? WHERE id = ?",
+                    (status, fehler, eintrag_id),
+                )
+            self._db.commit()
+
+    def counts(self, job: str = None) -> dict:
+        """
+        Counts the entries per status.
+
+        Args:
+            job (str, optional): Only count the entries of this job.
+
+        Returns:
+            dict: Number of entries by status.
+        """
+        with self._lock:
+            if job is None:
+                zeilen = self._db.execute("SELECT status, COUNT(*) FROM mails GROUP BY status")
+            else:
+                zeilen = self._db.execute(
+                    "SELECT status, COUNT(*) FROM mails WHERE job = ? GROUP BY status", (job,)
+                )
+            return dict(zeilen.fetchall())
+
+    def close(self) -> None:
+        """Closes the SQLite file."""
+        with self._lock:
+            self._db.close()
+
+
+def enqueue_batches(
+    queue: MailQueue, job: str, empfaenger_liste: list, msg, batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Adds one message for many recipients to a queue, split into batches.
+
+    The message is serialised once; the recipients are only passed in the SMTP envelope. If the
+    job is already in the queue (e.g. when an interrupted run is repeated), nothing is added.
+
+    Args:
+        queue (MailQueue): The queue.
+        job (str): Name of the job, e.g. the subject and the date.
+        empfaenger_liste (list): List of recipient email addresses. Duplicates are removed.
+        msg (email.message.Message): The message, see email_operations.erstelle_nachricht.
+        batch_size (int): Maximum number of recipients per SMTP transaction.
+
+    Returns:
+        int: The number of added entries.
+    """
+    if queue.has_job(job):
+        logger.info(f"Auftrag {job} ist bereits in der Warteschlange")
+        return 0
+    gesehen = set()
+    empfaenger_liste = [
+        a for a in empfaenger_liste if not (a.lower() in gesehen or gesehen.add(a.lower()))
+    ]
+    daten = serialisiere_nachricht(msg)
+    return queue.add(
+        job,
+        (
+            (msg["From"], empfaenger_liste[start : start + batch_size], daten)
+            for start in range(0, len(empfaenger_liste), batch_size)
+        ),
+    )
+
+
+class MailDispatcher:
+    """
+    Sends the mails of a queue with several SMTP connections in worker threads.
+
+    Every worker opens its own connection and keeps it for all its mails. Before each transaction,
+    one token per recipient is taken from the shared token bucket.
+
+    Attributes:
+        queue (MailQueue): The queue.
+        workers (int): Number of worker threads and SMTP connections.
+        bucket (TokenBucket): The rate limiter.
+    """
+
+    def __init__(
+        self,
+        queue: MailQueue,
+        smtp_server: str,
+        smtp_port: int,
+        benutzername: str,
+        passwort: str,
+        workers: int = WORKERS,
+        rate: float = RATE,
+        burst: float = BURST,
+        verbinde=verbinde_smtp,
+    ):
+        """
+        Initializes the dispatcher.
+
+        Args:
+            queue (MailQueue): The queue.
+            smtp_server (str): SMTP server address.
+            smtp_port (int): SMTP server port.
+            benutzername (str): SMTP username for authentication.
+            passwort (str): SMTP password for authentication.
+            workers (int): Number of worker threads and SMTP connections.
+            rate (float): Recipients per second.
+            burst (float): Maximum number of recipients sent at once after a pause.
+            verbinde (callable): Opens a connection as ``verbinde(smtp_server, smtp_port,
+                benutzername, passwort)``.
+        """
+        self.queue = queue
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self._verbindung = (smtp_server, smtp_port, benutzername, passwort)
+        self._verbinde = verbinde
+        self._zaehler = {GESENDET: 0, ABGELEHNT: 0, FEHLER: 0, "empfaenger": 0}
+        self._zaehler_lock = threading.Lock()
+
+    def _zaehle(self, status: str, empfaenger: int = 0) -> None:
+        with self._zaehler_lock:
+            self._zaehler[status] += 1
+            self._zaehler["empfaenger"] += empfaenger
+
+    def _sende(self, server, eintrag_id: int, absender: str, empfaenger: list, nachricht: bytes):
+        """Sends one entry and records the result; returns the connection or None if it broke."""
+        try:
+            abgelehnt = server.sendmail(absender, empfaenger, nachricht)
+        except smtplib.SMTPRecipientsRefused as e:
+            self.queue.finish(eintrag_id, ABGELEHNT, ", ".join(e.recipients))
+            self._zaehle(ABGELEHNT)
+            return server
+        except smtplib.SMTPServerDisconnected as e:
+            self.queue.finish(eintrag_id, FEHLER, f"Verbindung getrennt: {e}")
+            self._zaehle(FEHLER)
+            return None
+        except (smtplib.SMTPException, OSError) as e:
+            self.queue.finish(eintrag_id, FEHLER, str(e))
+            self._zaehle(FEHLER)
+            return server
+        if abgelehnt:
+            logger.warning(f"Abgelehnte Empfänger: {', '.join(abgelehnt)}")
+        self.queue.finish(eintrag_id, GESENDET, ", ".join(abgelehnt) or None)
+        self._zaehle(GESENDET, len(empfaenger) - len(abgelehnt))
+        return server
+
+    def _worker(self) -> None:
+        """Takes entries from the queue until it is empty."""
+        server = None
+        try:
+            while True:
+                eintrag = self.queue.claim()
+                if eintrag is None:
+                    return
+                eintrag_id, absender, empfaenger, nachricht = eintrag
+                self.bucket.acquire(len(empfaenger))
+                if server is None:
+                    try:
+                        server = self._verbinde(*self._verbindung)
+                    except (smtplib.SMTPException, OSError) as e:
+                        logger.error(f"Verbindung zum SMTP-Server fehlgeschlagen: {e}")
+                        self.queue.finish(eintrag_id, FEHLER, str(e))
+                        self._zaehle(FEHLER)
+                        return
+                server = self._sende(server, eintrag_id, absender, empfaenger, nachricht)
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+
+    def run(self) -> dict:
+        """
+        Sends all open entries of the queue.
+
+        Returns:
+            dict: The number of entries sent, refused and failed in this run, the number of
+            accepted recipients, the duration in seconds and the recipients per second.
+        """
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._worker, name=f"mail-{nr}", daemon=True)
+            for nr in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        dauer = time.perf_counter() - start
+        ergebnis = dict(self._zaehler)
+        ergebnis["sekunden"] = dauer
+        ergebnis["empfaenger_pro_sekunde"] = ergebnis["empfaenger"] / dauer if dauer > 0 else 0.0
+        logger.info(
+            f"Mailversand: {ergebnis[GESENDET]} gesendet, {ergebnis[ABGELEHNT]} abgelehnt, "
+            f"{ergebnis[FEHLER]} fehlgeschlagen, {ergebnis['empfaenger_pro_sekunde']:.1f} Empfänger/s"
+        )
+        return ergebnis
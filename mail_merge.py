@@ -0,0 +1,278 @@
+"""
+mail_merge.py
+
+This module sends personalised emails (mail merge) to the parents listed in the elternaccounts.csv
+written by data_processing.createElternaccounts. Every parent gets their own username and the names of
+their children instead of the same static text for everyone.
+
+The template is a string.Template that is compiled and checked once. The messages are built lazily by a
+generator, one per recipient, so even thousands of personalised mails are never all held in memory at the
+same time; they are sent over one SMTP connection or written to a MailQueue for the MailDispatcher.
+
+Placeholders:
+- $name: First and last name of the parent.
+- $vorname, $nachname: First and last name of the parent.
+- $benutzername: The generated username (column "username", otherwise utils.returnUsername).
+- $kind: The names of the children, e.g. "Anna Wolf und Ben Wolf".
+- $email: The address of the parent.
+
+Functions:
+- kompiliere_vorlage: Compiles a template and checks its placeholders.
+- lade_empfaenger: Reads the recipients from elternaccounts.csv and the control CSV.
+- erstelle_serienbriefe: Generator of the personalised messages.
+- sende_serienbriefe: Sends the messages over one SMTP connection.
+- enqueue_serienbriefe: Adds the messages for recipients not mailed yet to a MailQueue.
+
+Usage:
+    vorlage = kompiliere_vorlage(elternaccounts_credentials.serienbrieftext)
+    empfaenger = lade_empfaenger("elternaccounts.csv", "elternaccounts-control.csv")
+    nachrichten = erstelle_serienbriefe(empfaenger, vorlage, betreff, absender)
+    sende_serienbriefe(nachrichten, smtp_server, smtp_port, benutzername, passwort)
+
+Requirements:
+- Only the standard library and the modules of this project are used.
+"""
+import csv
+import smtplib
+from string import Template
+from email_operations import erstelle_nachricht, serialisiere_nachricht, verbinde_smtp
+from mail_dispatcher import MailQueue
+from utils import returnUsername
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLATZHALTER = ("name", "vorname", "nachname", "benutzername", "kind", "email")
+
+# Auftrag in der Warteschlange; jeder Empfänger bekommt den Serienbrief nur einmal
+SERIENBRIEF_JOB = "serienbrief-elternaccounts"
+
+
+def kompiliere_vorlage(text: str) -> Template:
+    """
+    Compiles a template for the mail merge.
+
+    Unknown or malformed placeholders are reported here, before the first mail is sent.
+
+    Args:
+        text (str): The template text with placeholders such as $name, see PLATZHALTER.
+
+    Returns:
+        Template: The compiled template.
+
+    Raises:
+        ValueError: If the template contains an unknown or malformed placeholder.
+    """
+    vorlage = Template(text)
+    for treffer in vorlage.pattern.finditer(text):
+        if treffer.group("invalid") is not None:
+            raise ValueError(f"Ungültiger Platzhalter an Position {treffer.start('invalid')}")
+        name = treffer.group("named") or treffer.group("braced")
+        if name is not None and name not in PLATZHALTER:
+            raise ValueError(f"Unbekannter Platzhalter: ${name}")
+    return vorlage
+
+
+def _lies_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f, delimiter=";")
+
+
+def lade_empfaenger(accounts_csv: str, kontroll_csv: str = None) -> list:
+    """
+    Reads the recipients of the mail merge.
+
+    Parents with several children appear several times in elternaccounts.csv; they are merged into
+    one recipient, so every parent gets a single mail that names all of their children.
+
+    Args:
+        accounts_csv (str): Path to the elternaccounts.csv.
+        kontroll_csv (str, optional): Path to the control CSV, used for the names of the children
+            (matched by "student-id"). Without it, $kind stays empty.
+
+    Returns:
+        list: One dict per address with the keys of PLATZHALTER, in the order of the CSV.
+    """
+    kinder = {}
+    if kontroll_csv is not None:
+        for zeile in _lies_csv(kontroll_csv):
+            kinder[zeile["student-id"]] = (
+                f"{zeile['Kind Vorname (schild)']} {zeile['Kind Nachname (schild)']}"
+            )
+
+    empfaenger = {}
+    for zeile in _lies_csv(accounts_csv):
+        email = zeile["email"].strip().lower()
+        if not email:
+            continue
+        eintrag = empfaenger.get(email)
+        if eintrag is None:
+            vorname = zeile["Eltern Vorname"].strip()
+            nachname = zeile["Eltern Nachname"].strip()
+            eintrag = empfaenger[email] = {
+                "name": f"{vorname} {nachname}",
+                "vorname": vorname,
+                "nachname": nachname,
+                "benutzername": zeile.get("username")
+                or returnUsername(vorname, nachname, "kurzform"),
+                "kinder": [],
+                "email": email,
+            }
+        kind = kinder.get(zeile["student-id"])
+        if kind and kind not in eintrag["kinder"]:
+            eintrag["kinder"].append(kind)
+
+    for eintrag in empfaenger.values():
+        kinder_liste = eintrag.pop("kinder")
+        eintrag["kind"] = (
+            " und ".join([", ".join(kinder_liste[:-1]), kinder_liste[-1]])
+            if len(kinder_liste) > 1
+            else "".join(kinder_liste)
+        )
+    logger.info(f"{len(empfaenger)} Empfänger für den Serienbrief geladen")
+    return list(empfaenger.values())
+
+
+def erstelle_serienbriefe(empfaenger, vorlage: Template, betreff, absender: str):
+    """
+    Builds the personalised messages one after another.
+
+    Args:
+        empfaenger (iterable): Recipients as returned by lade_empfaenger.
+        vorlage (Template): The body, see kompiliere_vorlage.
+        betreff (str or Template): The subject; a Template is personalised as well.
+        absender (str): The From address.
+
+    Yields:
+        tuple: ``(adresse, msg)`` with the address of the recipient and the MIME message.
+    """
+    for eintrag in empfaenger:
+        titel = betreff.substitute(eintrag) if isinstance(betreff, Template) else betreff
+        yield eintrag["email"], erstelle_nachricht(
+            titel, vorlage.substitute(eintrag), absender, eintrag["email"]
+        )
+
+
+def sende_serienbriefe(
+    nachrichten,
+    smtp_server: str,
+    smtp_port: int,
+    benutzername: str,
+    passwort: str,
+    verbinde=verbinde_smtp,
+) -> dict:
+    """
+    Sends personalised messages over a single SMTP connection.
+
+    If the server closes the connection or the connection fails (refused, timeout), it is opened
+    again and the message is retried once. If the login is refused, or the connection cannot be
+    opened again for the retry, the run is stopped instead of logging in again for every parent;
+    the message being sent and all further messages are returned as not attempted.
+
+    Args:
+        nachrichten (iterable): ``(adresse, msg)`` pairs, see erstelle_serienbriefe.
+        smtp_server (str): SMTP server address.
+        smtp_port (int): SMTP server port.
+        benutzername (str): SMTP username for authentication.
+        passwort (str): SMTP password for authentication.
+        verbinde (callable): Opens the connection, see email_operations.sende_batches.
+
+    Returns:
+        dict: ``angenommen`` (list of accepted addresses), ``abgelehnt`` (dict of refused or
+        failed addresses to the error message), ``nicht_versucht`` (list of addresses not sent
+        to because the run was stopped) and ``fehler`` (the reason the run was stopped,
+        otherwise None).
+    """
+    ergebnis = {"angenommen": [], "abgelehnt": {}, "nicht_versucht": [], "fehler": None}
+    server = None
+    try:
+        for adresse, msg in nachrichten:
+            if ergebnis["fehler"] is not None:
+                ergebnis["nicht_versucht"].append(adresse)
+                continue
+            daten = serialisiere_nachricht(msg)
+            for versuch in range(2):
+                if server is None:
+                    try:
+                        server = verbinde(smtp_server, smtp_port, benutzername, passwort)
+                    except smtplib.SMTPAuthenticationError as e:
+                        ergebnis["fehler"] = f"Anmeldung fehlgeschlagen: {e}"
+                        break
+                    except OSError as e:
+                        # Verbindung abgelehnt, Zeitüberschreitung o. Ä.: einmal neu verbinden
+                        if versuch == 1:
+                            ergebnis["fehler"] = f"Verbindungsfehler: {e}"
+                        continue
+                try:
+                    server.sendmail(msg["From"], [adresse], daten)
+                    ergebnis["angenommen"].append(adresse)
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    server = None
+                    if versuch == 1:
+                        ergebnis["abgelehnt"][adresse] = f"Verbindung getrennt: {e}"
+                except smtplib.SMTPRecipientsRefused as e:
+                    code, text = e.recipients[adresse]
+                    ergebnis["abgelehnt"][adresse] = f"{code} {text.decode(errors='replace')}"
+                    break
+                except smtplib.SMTPException as e:
+                    ergebnis["abgelehnt"][adresse] = str(e)
+                    break
+                except OSError as e:
+                    # Zeitüberschreitung o. Ä. beim Senden: neu verbinden wie oben
+                    server.close()
+                    server = None
+                    if versuch == 1:
+                        ergebnis["abgelehnt"][adresse] = f"Verbindungsfehler: {e}"
+            if ergebnis["fehler"] is not None:
+                logger.error(f"Serienbrief abgebrochen: {ergebnis['fehler']}")
+                ergebnis["nicht_versucht"].append(adresse)
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except OSError:
+                pass
+    logger.info(
+        f"Serienbrief: {len(ergebnis['angenommen'])} angenommen, "
+        f"{len(ergebnis['abgelehnt'])} abgelehnt, {len(ergebnis['nicht_versucht'])} nicht versucht"
+    )
+    return ergebnis
+
+
+def enqueue_serienbriefe(queue: MailQueue, nachrichten, job: str = SERIENBRIEF_JOB) -> int:
+    """
+    Adds personalised messages to a queue for the MailDispatcher, one entry per recipient.
+
+    elternaccounts.csv grows with every run, so recipients are deduplicated per address:
+    addresses that already have an entry of the job which is open, sent or refused by the server
+    are skipped, and only parents that were added since the last run get the mail. Addresses whose
+    entry failed (see MailQueue.finish) are added again. The messages are serialised one at a time
+    while they are written.
+
+    Args:
+        queue (MailQueue): The queue.
+        nachrichten (iterable): ``(adresse, msg)`` pairs, see erstelle_serienbriefe.
+        job (str, optional): Name of the job. Defaults to SERIENBRIEF_JOB.
+
+    Returns:
+        int: The number of added entries.
+    """
+    bekannt = queue.empfaenger(job)
+    uebersprungen = 0
+
+    def _neue():
+        nonlocal uebersprungen
+        for adresse, msg in nachrichten:
+            if adresse.lower() in bekannt:
+                uebersprungen += 1
+                continue
+            bekannt.add(adresse.lower())
+            yield msg["From"], [adresse], serialisiere_nachricht(msg)
+
+    anzahl = queue.add(job, _neue())
+    logger.info(
+        f"Serienbrief: {anzahl} Empfänger in die Warteschlange gestellt, "
+        f"{uebersprungen} bereits angeschrieben"
+    )
+    return anzahl
@@ -2,22 +2,30 @@
 main.py
 
 This script performs various operations related to updating files, scraping emails, and processing email communication
-for a system managing Elternaccounts (parent accounts). It offers three main options:
+for a system managing Elternaccounts (parent accounts). It offers four main options:
 
-1. Update files with new data by downloading, processing, and uploading the necessary files.
+1. Update files with new data by downloading, processing, and uploading the necessary files. Independent
+   transfers run concurrently (see transfer_scheduler.py).
 2. Scrape email addresses from provided data and output them.
 3. Scrape email addresses and send emails to the extracted addresses.
+4. Send every parent in elternaccounts.csv a personalised mail with their username and children (see
+   mail_merge.py), in parallel over the persistent queue of mail_dispatcher.py.
 
 The script requires credentials and configuration details, which are imported from the elternaccounts_credentials
 module. The operations involve interaction with Nextcloud for file handling, and the use of specified email
 operations for handling email tasks.
 """
 import logging
-from file_operations import get_file, put_file
+import sys
+from file_operations import CACHE_DIR, find_latest_export, get_file, put_file
 from data_processing import update_xlsx, createElternaccounts
+from backup_operations import remember_remote, upload_file
 from email_operations import finde_email_adressen, sende_email
+from mail_dispatcher import MailDispatcher, MailQueue
+from mail_merge import enqueue_serienbriefe, erstelle_serienbriefe, kompiliere_vorlage, lade_empfaenger
 import elternaccounts_credentials
 from forms2 import NextcloudFormsAPI
+from transfer_scheduler import Ergebnis, TransferScheduler
 
 # Logging konfigurieren
 logging.basicConfig(
@@ -29,80 +37,171 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def lade_datei(
+    url: str, path: str, username: str, password: str, cache_dir: str = None, etag: str = None
+) -> str:
+    """Lädt eine Datei herunter; schlägt der Download fehl, werden die abhängigen Schritte übersprungen."""
+    etag = get_file(url, path, username, password, cache_dir=cache_dir, etag=etag)
+    if etag is None:
+        raise RuntimeError(f"Datei konnte nicht heruntergeladen werden: {url}")
+    return etag
+
+
+def lade_arbeitsmappe(url: str, path: str, username: str, password: str, cache_dir: str = None) -> str:
+    """Lädt die Arbeitsmappe herunter und merkt sich ihren Inhalt für die Uploads und Backups."""
+    etag = lade_datei(url, path, username, password, cache_dir=cache_dir)
+    remember_remote(url, path, etag)
+    return etag
+
+
+def aktualisiere_arbeitsmappe(formulardaten: tuple, xlsx_path: str, index_path: str = None) -> None:
+    """Hängt die neuen Formularantworten aus fetchNewFormSubmissions an die Arbeitsmappe an."""
+    df, _ = formulardaten
+    update_xlsx(df, xlsx_path, index_path=index_path)
+
+
+def bestaetige_formulardaten(formulardaten: tuple) -> None:
+    """Verschiebt den Sync-Cursor hinter die neuen Formularantworten aus fetchNewFormSubmissions."""
+    _, commit = formulardaten
+    commit()
+
+
+def lade_arbeitsmappe_hoch(path: str, url: str, username: str, password: str, **kwargs) -> str:
+    """Lädt die Arbeitsmappe hoch (siehe upload_file); schlägt der Upload fehl, werden die abhängigen Schritte übersprungen."""
+    ergebnis = upload_file(path, url, username, password, **kwargs)
+    if ergebnis == "fehlgeschlagen":
+        raise RuntimeError(f"Datei konnte nicht hochgeladen werden: {url}")
+    return ergebnis
+
+
+def lade_csv_hoch(url: str, path: str, username: str, password: str) -> str:
+    """Lädt eine CSV-Datei hoch; ein fehlgeschlagener Upload wird als Fehler des Schritts gemeldet."""
+    etag = put_file(url, path, username, password)
+    if etag is None:
+        raise RuntimeError(f"Datei konnte nicht hochgeladen werden: {url}")
+    return etag
+
+
 def main():
     while True:
         # Benutzer wird aufgefordert, eine Option zu wählen
         user_choice = input(
-            """Wählen Sie eine Option (1, 2, 3):
+            """Wählen Sie eine Option (1, 2, 3, 4):
 1: Nur files aktualisieren.
 2: Nur mails scrapen und Adressen ausgeben.
 3: Mails scrapen und Mails verschicken.
+4: Serienbrief mit Benutzernamen an alle Eltern aus elternaccounts.csv verschicken, die ihn noch nicht bekommen haben.
 """
         )
         if user_choice == "1":
-            exportfile = "00-Export20240929.csv"
+            # Neuesten Schild-Export im Exportordner suchen
+            export = find_latest_export(
+                elternaccounts_credentials.url_export,
+                elternaccounts_credentials.username,
+                elternaccounts_credentials.password,
+            )
+            if export is None:
+                break
+            exportfile = export["name"]
             # API initialisieren
             ncapi = NextcloudFormsAPI(
                 elternaccounts_credentials.server_url,
                 elternaccounts_credentials.username,
                 elternaccounts_credentials.password,
             )
-            # forms.csv herunterladen
-            file_content = ncapi.getFormSubmissionsCSV(
-                elternaccounts_credentials.elternaccounts
-            ).content
-            with open("testforms.csv", "wb") as file:
-                file.write(file_content)
-            logger.info("Forms CSV-Datei wurde gespeichert")
+            user = elternaccounts_credentials.username
+            pw = elternaccounts_credentials.password
+            share = elternaccounts_credentials.url_elternaccounts_share
+            # Unabhängige Übertragungen laufen parallel, die Schritte warten nur auf ihre Eingaben
+            scheduler = TransferScheduler()
+            # Nur die seit dem letzten Lauf neuen Formularantworten als DataFrame laden
+            scheduler.add(
+                "forms", ncapi.fetchNewFormSubmissions, elternaccounts_credentials.elternaccounts
+            )
             # xlsx herunterladen
-            get_file(
-                elternaccounts_credentials.url_elternaccounts_share,
-                "testxlsx.xlsx",
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+            scheduler.add(
+                "xlsx", lade_arbeitsmappe, share, "testxlsx.xlsx", user, pw, cache_dir=CACHE_DIR
+            )
+            # Aktuellste Schülertaten herunterladen
+            scheduler.add(
+                "schild",
+                lade_datei,
+                f"{elternaccounts_credentials.url_export}{exportfile}",
+                exportfile,
+                user,
+                pw,
+                cache_dir=CACHE_DIR,
+                etag=export["etag"],
             )
             # xlsx mit den neuen csv-Daten aktualisieren
-            update_xlsx("testforms.csv", "testxlsx.xlsx")
-            # xlsx wieder hochladen
-            put_file(
-                elternaccounts_credentials.url_elternaccounts_backup,
+            scheduler.add(
+                "update",
+                aktualisiere_arbeitsmappe,
+                Ergebnis("forms"),
                 "testxlsx.xlsx",
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+                index_path="elternaccounts-zeitstempel.txt",
+                after=["xlsx"],
             )
-            put_file(
-                elternaccounts_credentials.url_elternaccounts_share,
+            # xlsx wieder hochladen (nur bei Änderungen, das Backup per COPY auf dem Server)
+            scheduler.add(
+                "upload_xlsx",
+                lade_arbeitsmappe_hoch,
                 "testxlsx.xlsx",
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+                share,
+                user,
+                pw,
+                allow_copy=False,
+                after=["update"],
             )
-            # Aktuellste Schülertaten herunterladen
-            get_file(
-                f"{elternaccounts_credentials.url_export}{exportfile}",
-                exportfile,
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+            scheduler.add(
+                "backup_xlsx",
+                lade_arbeitsmappe_hoch,
+                "testxlsx.xlsx",
+                elternaccounts_credentials.url_elternaccounts_backup,
+                user,
+                pw,
+                after=["update"],
+            )
+            # Sync-Cursor erst verschieben, wenn die neuen Antworten in der Arbeitsmappe auf dem Server sind
+            scheduler.add(
+                "forms_commit", bestaetige_formulardaten, Ergebnis("forms"), after=["upload_xlsx"]
             )
             # CSV zum Erstellen der Elternaccounts in WebUntis erstellen
-            createElternaccounts(
+            scheduler.add(
+                "elternaccounts",
+                createElternaccounts,
                 "testxlsx.xlsx",
                 exportfile,
                 "elternaccounts-control.csv",
                 "elternaccounts.csv",
+                cache_path="elternaccounts-matchcache.json",
+                after=["update", "schild"],
             )
             # CSV hochladen
-            put_file(
+            scheduler.add(
+                "upload_csv",
+                lade_csv_hoch,
                 elternaccounts_credentials.url_elterncsv,
                 "elternaccounts.csv",
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+                user,
+                pw,
+                after=["elternaccounts"],
             )
-            put_file(
+            scheduler.add(
+                "upload_control",
+                lade_csv_hoch,
                 elternaccounts_credentials.url_elterncsvcontrol,
                 "elternaccounts-control.csv",
-                elternaccounts_credentials.username,
-                elternaccounts_credentials.password,
+                user,
+                pw,
+                after=["elternaccounts"],
             )
+            scheduler.run()
+            if scheduler.fehlgeschlagen:
+                # Nicht alle Schritte sind gelaufen, der Lauf darf nicht als erfolgreich gelten
+                logger.error("Aktualisierung der Elternaccounts ist fehlgeschlagen")
+                sys.exit(1)
+            logger.info("Aktualisierung der Elternaccounts abgeschlossen")
             break
 
         elif user_choice == "2":
@@ -151,8 +250,32 @@ Wiebke Windorf wiebke@windorf.club Windorf Hugo weilwind
             logger.info(ergebnis)
             break
 
+        elif user_choice == "4":
+            # Vorlage einmal übersetzen, die Mails entstehen erst beim Schreiben in die Warteschlange
+            vorlage = kompiliere_vorlage(elternaccounts_credentials.serienbrieftext)
+            empfaenger = lade_empfaenger("elternaccounts.csv", "elternaccounts-control.csv")
+            nachrichten = erstelle_serienbriefe(
+                empfaenger,
+                vorlage,
+                "Ihr WebUntis-Elternaccount wurde erstellt",
+                elternaccounts_credentials.mail_benutzername,
+            )
+            queue = MailQueue()
+            # Nur Eltern, die den Serienbrief noch nicht bekommen haben
+            enqueue_serienbriefe(queue, nachrichten)
+            ergebnis = MailDispatcher(
+                queue,
+                elternaccounts_credentials.smtp_server,
+                elternaccounts_credentials.smtp_port,
+                elternaccounts_credentials.mail_benutzername,
+                elternaccounts_credentials.mail_passwort,
+            ).run()
+            queue.close()
+            logger.info(ergebnis)
+            break
+
         else:
-            logger.warning("Ungültige Eingabe. Bitte wählen Sie 1, 2 oder 3.")
+            logger.warning("Ungültige Eingabe. Bitte wählen Sie 1, 2, 3 oder 4.")
 
 
 if __name__ == "__main__":
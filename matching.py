@@ -0,0 +1,501 @@
+"""
+matching.py
+
+This module provides the building blocks used by data_processing.createElternaccounts to match the
+children entered in the parent form against the students of a Schild CSV export.
+
+Functions:
+- normalisiere_schild: Adds normalised name columns to a Schild export.
+- normalisiere_forms: Adds normalised name columns for every child to the form data.
+- build_klassen_index: Groups the Schild export by class and precomputes the full names per class.
+- top2: Extracts the best and second best match per row of a similarity matrix.
+- match_klasse: Scores all children of a class against all students of that class in one batch.
+- match_klassen: Runs match_klasse for many classes, optionally on a process pool.
+- klassen_fingerprint: Hashes the Schild data of one class.
+- build_phonetik_index: Blocks the whole Schild export by the Kölner Phonetik code of the last name.
+- match_fallback: Searches a child across all classes using the phonetic blocking index.
+
+Classes:
+- MatchResult: Compact record of the match of one child.
+- MatchCache: Persistent on-disk cache of earlier match results.
+
+Requirements:
+- pandas: For data manipulation.
+- numpy: For the similarity score matrices.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from utils import koelner_phonetik, normalisiere_name, similar_matrix
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+FALLBACK_SCHWELLE = 0.5
+
+
+def _normalisiere_spalte(spalte: pd.Series) -> list:
+    """Normalise a column, computing every distinct value only once."""
+    cache = {}
+    ergebnis = []
+    for wert in spalte:
+        key = wert if wert == wert else None
+        if key not in cache:
+            cache[key] = normalisiere_name(wert)
+        ergebnis.append(cache[key])
+    return ergebnis
+
+
+def _verbinde(vornamen: list, nachnamen: list) -> list:
+    """Join normalised first and last names to normalised full names."""
+    return [
+        f"{vorname} {nachname}" if vorname and nachname else vorname or nachname
+        for vorname, nachname in zip(vornamen, nachnamen)
+    ]
+
+
+def normalisiere_schild(schild: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add normalised name columns to a Schild export.
+
+    The columns ``US_firstName_norm``, ``US_lastName_norm`` and ``fullName_norm`` are computed once
+    per load with utils.normalisiere_name, so the matcher only compares these cached keys.
+
+    Args:
+        schild (pd.DataFrame): The Schild CSV export. It is modified in place.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the added columns.
+    """
+    schild["US_firstName_norm"] = _normalisiere_spalte(schild["US_firstName"])
+    schild["US_lastName_norm"] = _normalisiere_spalte(schild["US_lastName"])
+    schild["fullName_norm"] = _verbinde(
+        schild["US_firstName_norm"], schild["US_lastName_norm"]
+    )
+    return schild
+
+
+def normalisiere_forms(forms: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add normalised name columns for every child to the form data.
+
+    For each child ``i`` (1 to 3) the column ``Name des {i}. Kindes (norm)`` holds the normalised
+    full name built from ``Vorname des {i}. Kindes`` and ``Nachname des {i}. Kindes``.
+
+    Args:
+        forms (pd.DataFrame): The form data. It is modified in place.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the added columns.
+    """
+    for i in range(1, 4):
+        vorname = f"Vorname des {i}. Kindes"
+        nachname = f"Nachname des {i}. Kindes"
+        if vorname not in forms.columns:
+            continue
+        nachnamen = (
+            _normalisiere_spalte(forms[nachname])
+            if nachname in forms.columns
+            else [""] * len(forms)
+        )
+        forms[f"Name des {i}. Kindes (norm)"] = _verbinde(
+            _normalisiere_spalte(forms[vorname]), nachnamen
+        )
+    return forms
+
+
+def _phonetik_codes(name) -> set:
+    """Return the Kölner Phonetik codes of a name and of each of its parts."""
+    name = str(name)
+    teile = [name] + re.split(r"[\s\-]+", name)
+    return {code for code in (koelner_phonetik(teil) for teil in teile) if code}
+
+
+def build_klassen_index(schild: pd.DataFrame) -> dict:
+    """
+    Build an index from webuntisKlasse to the students of that class.
+
+    Matching a child only has to look at the students of its own class instead of scanning the
+    whole Schild export.
+
+    Args:
+        schild (pd.DataFrame): The Schild CSV export, prepared with normalisiere_schild.
+
+    Returns:
+        dict: Maps every webuntisKlasse to a tuple ``(positions, full_names)``, where ``positions``
+        is the list of row positions in ``schild`` (in export order) and ``full_names`` the
+        matching list of normalised full names.
+    """
+    full_names = schild["fullName_norm"].tolist()
+    index = {}
+    for klasse, positions in schild.groupby("webuntisKlasse", sort=False).indices.items():
+        positions = positions.tolist()
+        index[klasse] = (positions, [full_names[pos] for pos in positions])
+    logger.debug(f"Klassenindex mit {len(index)} Klassen aufgebaut")
+    return index
+
+
+FINGERPRINT_SPALTEN = ["AT_webuntisUid", "US_firstName", "US_lastName", "webuntisKlasse"]
+
+
+def klassen_fingerprint(schild: pd.DataFrame, positions: list) -> str:
+    """
+    Compute a fingerprint of the Schild data of one class.
+
+    Only the columns that influence the matching and the generated outputs are hashed, in export
+    order. The fingerprint changes as soon as a student of the class is added, removed, renamed or
+    gets a new webuntis ID.
+
+    Args:
+        schild (pd.DataFrame): The Schild CSV export.
+        positions (list): Row positions of the students of the class.
+
+    Returns:
+        str: Hex digest of the class slice.
+    """
+    digest = hashlib.sha256()
+    for row in schild[FINGERPRINT_SPALTEN].iloc[positions].itertuples(index=False):
+        digest.update("\x1f".join(str(value) for value in row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def build_phonetik_index(schild: pd.DataFrame) -> tuple:
+    """
+    Build a blocking index over the whole Schild export.
+
+    Every student is filed under the Kölner Phonetik codes of the last name and, for double
+    names, of each of its parts. Looking up a child then yields a few dozen candidates instead
+    of the whole school.
+
+    Args:
+        schild (pd.DataFrame): The Schild CSV export, prepared with normalisiere_schild.
+
+    Returns:
+        tuple: ``(index, full_names)``, where ``index`` maps every code to the list of row
+        positions in ``schild`` and ``full_names`` holds the normalised full name of every row.
+    """
+    index = {}
+    for pos, last in enumerate(schild["US_lastName"]):
+        for code in _phonetik_codes(last):
+            index.setdefault(code, []).append(pos)
+    logger.debug(f"Phonetik-Index mit {len(index)} Codes aufgebaut")
+    return index, schild["fullName_norm"].tolist()
+
+
+def match_fallback(fname, lname, full_name_forms: str, phonetik_index: tuple):
+    """
+    Search a child in all classes of the school.
+
+    Used when the class entered in the form does not yield a usable match, e.g. because it is
+    misspelled ("5 b", "05b") or the class of the previous year. Only the students whose last
+    name shares a phonetic code with the last name (or, for swapped names, the first name) of
+    the child are scored.
+
+    Args:
+        fname: First name of the child as entered in the form.
+        lname: Last name of the child as entered in the form.
+        full_name_forms (str): Normalised full name of the child.
+        phonetik_index (tuple): The return value of build_phonetik_index.
+
+    Returns:
+        tuple or None: ``(best_pos, best_score, second_pos, second_score)`` like match_klasse,
+        or None if there are no candidates.
+    """
+    index, full_names = phonetik_index
+    kandidaten = set()
+    for code in _phonetik_codes(lname) | _phonetik_codes(fname):
+        kandidaten.update(index.get(code, ()))
+    if not kandidaten:
+        return None
+    positions = sorted(kandidaten)
+    return match_klasse(
+        [full_name_forms], [full_names[pos] for pos in positions], positions
+    )[0]
+
+
+def top2(scores: np.ndarray) -> tuple:
+    """
+    Extract the best and second best match for every row of a similarity matrix.
+
+    The semantics are those of a sequential scan over the columns that only accepts strictly
+    higher scores: the best match is the first column with the highest score, the second best
+    match is the first column with the highest score among the remaining columns. A score of 0
+    never counts as a match.
+
+    Args:
+        scores (np.ndarray): Similarity matrix of shape (children, students).
+
+    Returns:
+        tuple: Four arrays ``(best, best_score, second, second_score)`` with one entry per row.
+        ``best`` and ``second`` hold column indices, or -1 if there is no such match; the
+        corresponding scores are 0 in that case.
+    """
+    rows = np.arange(scores.shape[0])
+    if scores.shape[1] == 0:
+        none = np.full(scores.shape[0], -1)
+        zero = np.zeros(scores.shape[0])
+        return none, zero, none.copy(), zero.copy()
+
+    best = scores.argmax(axis=1)
+    best_score = scores[rows, best]
+    best = np.where(best_score > 0, best, -1)
+    best_score = np.where(best_score > 0, best_score, 0.0)
+
+    rest = scores.copy()
+    rest[rows, np.maximum(best, 0)] = -1.0
+    second = rest.argmax(axis=1)
+    second_score = rest[rows, second]
+    valid = (best >= 0) & (second_score > 0)
+    second = np.where(valid, second, -1)
+    second_score = np.where(valid, second_score, 0.0)
+    return best, best_score, second, second_score
+
+
+def match_klasse(
+    full_names_forms: list, full_names_schild: list, positions: list
+) -> list:
+    """
+    Match all children of one class against the students of that class.
+
+    The whole class is scored with a single similarity matrix call, followed by a vectorised
+    top-2 extraction.
+
+    Args:
+        full_names_forms (list): Normalised full names of the children.
+        full_names_schild (list): Normalised full names of the students of the class.
+        positions (list): Row positions in the Schild export belonging to ``full_names_schild``.
+
+    Returns:
+        list: One tuple ``(best_pos, best_score, second_pos, second_score)`` per child, where the
+        positions refer to rows of the Schild export or are None if there is no match.
+        A missing second match has the score 0, just like an unset running maximum.
+    """
+    scores = similar_matrix(full_names_forms, full_names_schild, lower=False)
+    best, best_score, second, second_score = top2(scores)
+    return [
+        (
+            positions[b] if b >= 0 else None,
+            float(bs),
+            positions[s] if s >= 0 else None,
+            float(ss) if s >= 0 else 0,
+        )
+        for b, bs, s, ss in zip(best, best_score, second, second_score)
+    ]
+
+
+def _match_klasse_timed(job: tuple) -> tuple:
+    """Run match_klasse for one ``(klasse, full_names_forms, full_names_schild, positions)`` job."""
+    start = time.perf_counter()
+    _, full_names_forms, full_names_schild, positions = job
+    ergebnis = match_klasse(full_names_forms, full_names_schild, positions)
+    return ergebnis, time.perf_counter() - start
+
+
+def match_klassen(jobs: list, workers: int = None) -> list:
+    """
+    Match the children of several classes, optionally in parallel.
+
+    Every job only needs the names of one class, so the jobs are independent of each other. With
+    ``workers`` greater than 1 they are distributed over a process pool; the results are always
+    returned in the order of ``jobs``, so a parallel run produces exactly the same output as a
+    serial one. The duration of every class is logged.
+
+    Args:
+        jobs (list): Tuples ``(klasse, full_names_forms, full_names_schild, positions)`` with the
+            arguments for match_klasse.
+        workers (int, optional): Number of worker processes. None or 1 matches in this process.
+
+    Returns:
+        list: One tuple ``(matches, seconds)`` per job, where ``matches`` is the return value of
+        match_klasse.
+    """
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ergebnisse = list(executor.map(_match_klasse_timed, jobs))
+    else:
+        ergebnisse = [_match_klasse_timed(job) for job in jobs]
+
+    for (klasse, full_names_forms, full_names_schild, _), (_, dauer) in zip(
+        jobs, ergebnisse
+    ):
+        logger.info(
+            f"Klasse {klasse}: {len(full_names_forms)} Kinder gegen "
+            f"{len(full_names_schild)} Schüler in {dauer:.3f}s abgeglichen"
+        )
+    return ergebnisse
+
+
+class MatchResult:
+    """
+    Compact record of the match of one child.
+
+    Only indices into the form and Schild tables and the two scores are stored, so large runs do
+    not copy whole table rows. The control and account outputs are built from these records.
+
+    Attributes:
+        form_index (int): Row position of the form entry in the form table.
+        kind (int): Number of the child within the form entry (1 to 3).
+        schild_index (int or None): Row position of the best matching student, None if no match.
+        best_score (float): Similarity of the best match, 0 if there is none.
+        second_index (int or None): Row position of the second best student, None if there is none.
+        second_score (float): Similarity of the second best match, 0 if there is none.
+        cross_class (bool): Whether the match was found outside the class entered in the form.
+    """
+
+    __slots__ = (
+        "form_index",
+        "kind",
+        "schild_index",
+        "best_score",
+        "second_index",
+        "second_score",
+        "cross_class",
+    )
+
+    def __init__(
+        self,
+        form_index: int,
+        kind: int,
+        schild_index,
+        best_score: float,
+        second_index,
+        second_score: float,
+        cross_class: bool = False,
+    ):
+        self.form_index = form_index
+        self.kind = kind
+        self.schild_index = schild_index
+        self.best_score = best_score
+        self.second_index = second_index
+        self.second_score = second_score
+        self.cross_class = cross_class
+
+    def __repr__(self):
+        return (
+            f"MatchResult(form_index={self.form_index}, kind={self.kind}, "
+            f"schild_index={self.schild_index}, best_score={self.best_score}, "
+            f"second_index={self.second_index}, second_score={self.second_score}, "
+            f"cross_class={self.cross_class})"
+        )
+
+
+# Must be increased whenever the scoring changes, so that old cache files are discarded
+CACHE_VERSION = 2
+
+
+class MatchCache:
+    """
+    Persistent on-disk cache of match results.
+
+    An entry is keyed by a hash of the child fields of a form row (first name, last name, class)
+    together with the fingerprint of the Schild class slice the child was matched against. If any
+    student of that class changes, the fingerprint and therefore the key changes, so stale results
+    are never reused. Positions are stored relative to the class slice, which stays valid as long
+    as the fingerprint is unchanged, even if other classes of the export change.
+
+    Only entries that were used or created during the current run are written back by save(), so
+    the cache file does not grow with outdated entries.
+
+    Attributes:
+        path (str): Path to the JSON cache file.
+        hits (int): Number of children answered from the cache.
+        misses (int): Number of children that had to be matched.
+    """
+
+    def __init__(self, path: str):
+        """
+        Loads the cache from ``path``. A missing, unreadable or outdated file results in an empty
+        cache.
+
+        Parameters:
+            path (str): Path to the JSON cache file.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._used = {}
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                daten = json.load(file)
+            if daten.get("version") == CACHE_VERSION:
+                self._entries = daten.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Match-Cache {path} konnte nicht gelesen werden: {e}")
+
+    @staticmethod
+    def _key(fname, lname, klasse, fingerprint: str) -> str:
+        felder = json.dumps([str(fname), str(lname), str(klasse)], ensure_ascii=False)
+        return hashlib.sha256(f"{felder}\x1d{fingerprint}".encode("utf-8")).hexdigest()
+
+    def get(self, fname, lname, klasse, fingerprint: str, positions: list):
+        """
+        Looks up the cached match of a child.
+
+        Parameters:
+            fname, lname, klasse: The child fields of the form row.
+            fingerprint (str): Fingerprint of the Schild class slice.
+            positions (list): Current row positions of the class slice in the Schild export.
+
+        Returns:
+            tuple or None: ``(best_pos, best_score, second_pos, second_score)`` as returned by
+            match_klasse, or None if the child is not cached.
+        """
+        key = self._key(fname, lname, klasse, fingerprint)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[key] = entry
+        best, best_score, second, second_score = entry
+        return (
+            positions[best] if best is not None else None,
+            best_score,
+            positions[second] if second is not None else None,
+            second_score,
+        )
+
+    def put(self, fname, lname, klasse, fingerprint: str, positions: list, match: tuple):
+        """
+        Stores the match of a child.
+
+        Parameters:
+            fname, lname, klasse: The child fields of the form row.
+            fingerprint (str): Fingerprint of the Schild class slice.
+            positions (list): Current row positions of the class slice in the Schild export.
+            match (tuple): The result of match_klasse for this child.
+        """
+        lokal = {pos: nr for nr, pos in enumerate(positions)}
+        best, best_score, second, second_score = match
+        entry = [
+            lokal[best] if best is not None else None,
+            best_score,
+            lokal[second] if second is not None else None,
+            second_score,
+        ]
+        key = self._key(fname, lname, klasse, fingerprint)
+        self._entries[key] = entry
+        self._used[key] = entry
+
+    def save(self) -> None:
+        """
+        Writes all entries used in this run atomically to the cache file.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": CACHE_VERSION, "entries": self._used}, file)
+        os.replace(tmp_path, self.path)
+        logger.info(
+            f"Match-Cache: {self.hits} Treffer, {self.misses} neu abgeglichen, "
+            f"{len(self._used)} Einträge gespeichert"
+        )
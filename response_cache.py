@@ -0,0 +1,206 @@
+"""
+response_cache.py
+
+This module provides a cache for HTTP responses of idempotent GET requests, used by NextcloudFormsAPI
+for metadata calls such as the list of forms. Scripts that run over many forms then fetch the same
+metadata only once within the configured time to live.
+
+Features:
+- Time to live (TTL) per entry.
+- In-memory LRU with size-based eviction: the least recently used entries are dropped as soon as the
+  cached bodies exceed the configured number of bytes.
+- Optional persistence in an SQLite file, so the cache survives the end of the script.
+- Hit and miss counters.
+
+Classes:
+- ResponseCache: The cache, safe to use from several threads.
+
+Usage:
+    from response_cache import ResponseCache
+    api = NextcloudFormsAPI(url, user, pw, cache=ResponseCache(ttl=600, path="forms-cache.sqlite"))
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+TTL = 300  # Sekunden
+MAX_BYTES = 16 << 20
+
+
+def _zu_response(url: str, status_code: int, headers: dict, content: bytes) -> requests.Response:
+    """Rebuilds a requests.Response from its cached parts."""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+class ResponseCache:
+    """
+    Caches HTTP responses in memory (LRU) and optionally on disk.
+
+    Attributes:
+        ttl (float): Time to live of an entry in seconds.
+        max_bytes (int): Maximum total size of the cached bodies in memory.
+        path (str): Path to the SQLite file, None if the cache is not persisted.
+        hits (int): Number of requests answered from the cache.
+        misses (int): Number of requests not found in the cache.
+    """
+
+    def __init__(self, ttl: float = TTL, max_bytes: int = MAX_BYTES, path: str = None):
+        """
+        Initializes the cache.
+
+        Args:
+            ttl (float): Time to live of an entry in seconds.
+            max_bytes (int): Maximum total size of the cached bodies in memory.
+            path (str, optional): Path to an SQLite file for persistence.
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._eintraege = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, ablauf REAL, "
+                "url TEXT, status INTEGER, headers TEXT, content BLOB)"
+            )
+            self._db.execute("DELETE FROM responses WHERE ablauf < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def key(method: str, url: str, params=None, auth=None) -> str:
+        """
+        Builds the cache key of a request.
+
+        The responses of the Forms API depend on the user, so the credentials are part of the key.
+        They are only included as a hash, since the keys are also stored in the SQLite file.
+
+        Args:
+            method (str): HTTP method.
+            url (str): The URL without query string.
+            params (dict, optional): Query parameters.
+            auth (tuple, optional): The credentials ``(username, password)`` of the request.
+
+        Returns:
+            str: The key.
+        """
+        benutzer = None
+        if auth is not None:
+            benutzer = hashlib.sha256(json.dumps(list(auth)).encode("utf-8")).hexdigest()
+        return json.dumps(
+            [method.upper(), url, sorted((params or {}).items()), benutzer], default=str
+        )
+
+    def _speichern(self, key: str, eintrag: tuple) -> None:
+        """Stores an entry in memory and evicts the least recently used entries if needed."""
+        alt = self._eintraege.pop(key, None)
+        if alt is not None:
+            self._bytes -= len(alt[4])
+        groesse = len(eintrag[4])
+        if groesse > self.max_bytes:
+            return
+        self._eintraege[key] = eintrag
+        self._bytes += groesse
+        while self._bytes > self.max_bytes:
+            _, verdraengt = self._eintraege.popitem(last=False)
+            self._bytes -= len(verdraengt[4])
+
+    def get(self, key: str):
+        """
+        Returns the cached response of a key.
+
+        Args:
+            key (str): The cache key, see key().
+
+        Returns:
+            requests.Response or None: The cached response, None if there is no valid entry.
+        """
+        jetzt = time.time()
+        with self._lock:
+            eintrag = self._eintraege.get(key)
+            if eintrag is not None and eintrag[0] < jetzt:
+                self._bytes -= len(eintrag[4])
+                del self._eintraege[key]
+                eintrag = None
+            if eintrag is None and self._db is not None:
+                zeile = self._db.execute(
+                    "SELECT ablauf, url, status, headers, content FROM responses "
+                    "WHERE key = ? AND ablauf >= ?",
+                    (key, jetzt),
+                ).fetchone()
+                if zeile is not None:
+                    eintrag = (zeile[0], zeile[1], zeile[2], json.loads(zeile[3]), zeile[4])
+                    self._speichern(key, eintrag)
+            if eintrag is None:
+                self.misses += 1
+                return None
+            if key in self._eintraege:
+                self._eintraege.move_to_end(key)
+            self.hits += 1
+        return _zu_response(*eintrag[1:])
+
+    def put(self, key: str, response: requests.Response) -> None:
+        """
+        Stores a response.
+
+        Args:
+            key (str): The cache key, see key().
+            response (requests.Response): The response; its body is read completely.
+        """
+        eintrag = (
+            time.time() + self.ttl,
+            response.url,
+            response.status_code,
+            dict(response.headers),
+            response.content,
+        )
+        with self._lock:
+            self._speichern(key, eintrag)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, eintrag[0], eintrag[1], eintrag[2], json.dumps(eintrag[3]), eintrag[4]),
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Removes all entries from memory and disk."""
+        with self._lock:
+            self._eintraege.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            dict: hits, misses, the number of entries and bytes in memory.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "eintraege": len(self._eintraege),
+                "bytes": self._bytes,
+            }
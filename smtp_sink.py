@@ -0,0 +1,174 @@
+"""
+smtp_sink.py
+
+This module provides a local stand-in SMTP server for tests and benchmarks of the mail sending
+(email_operations.py, mail_dispatcher.py). It accepts plain SMTP without TLS, accepts any login, stores
+nothing but the received transactions in memory and can simulate the round-trip latency of a real
+provider.
+
+Recipients whose address contains "reject" are refused with 550, so refused recipients can be tested as
+well.
+
+Classes:
+- SmtpSink: The server, running in a background thread.
+
+Functions:
+- verbinde_plain: Connection factory for plain SMTP, usable as ``verbinde`` argument.
+
+Usage:
+    with SmtpSink(latenz=0.02) as sink:
+        sende_batches(empfaenger, msg, sink.host, sink.port, "u", "p", verbinde=verbinde_plain)
+        print(sink.empfaenger_pro_sekunde())
+"""
+import smtplib
+import socketserver
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def verbinde_plain(smtp_server: str, smtp_port: int, benutzername: str, passwort: str):
+    """
+    Opens an authenticated SMTP connection without TLS, e.g. to a SmtpSink.
+
+    Args:
+        smtp_server (str): SMTP server address.
+        smtp_port (int): SMTP server port.
+        benutzername (str): SMTP username for authentication.
+        passwort (str): SMTP password for authentication.
+
+    Returns:
+        smtplib.SMTP: The logged-in connection.
+    """
+    server = smtplib.SMTP(smtp_server, smtp_port)
+    server.login(benutzername, passwort)
+    return server
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handles one SMTP connection."""
+
+    def _antwort(self, text: str) -> None:
+        self.wfile.write(f"{text}\r\n".encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        sink = self.server.sink
+        with sink._lock:
+            sink.verbindungen += 1
+        self._antwort("220 smtp-sink ESMTP")
+        absender = None
+        empfaenger = []
+        while True:
+            zeile = self.rfile.readline()
+            if not zeile:
+                return
+            befehl = zeile.decode("utf-8", errors="replace").strip()
+            gross = befehl.upper()
+            if sink.latenz:
+                time.sleep(sink.latenz)
+            if gross.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                self.wfile.flush()
+            elif gross.startswith("AUTH"):
+                self._antwort("235 2.7.0 Authentication successful")
+            elif gross.startswith("MAIL FROM:"):
+                absender = befehl[10:].strip().strip("<>").split(">")[0]
+                empfaenger = []
+                self._antwort("250 OK")
+            elif gross.startswith("RCPT TO:"):
+                adresse = befehl[8:].strip().strip("<>")
+                if "reject" in adresse.lower():
+                    self._antwort("550 5.1.1 No such user")
+                else:
+                    empfaenger.append(adresse)
+                    self._antwort("250 OK")
+            elif gross == "DATA":
+                self._antwort("354 End data with <CR><LF>.<CR><LF>")
+                daten = []
+                while True:
+                    zeile = self.rfile.readline()
+                    if zeile in (b".\r\n", b""):
+                        break
+                    daten.append(zeile)
+                with sink._lock:
+                    sink.nachrichten.append((absender, empfaenger, b"".join(daten), time.monotonic()))
+                self._antwort("250 OK queued")
+            elif gross in ("RSET", "NOOP"):
+                empfaenger = []
+                self._antwort("250 OK")
+            elif gross == "QUIT":
+                self._antwort("221 Bye")
+                return
+            else:
+                self._antwort("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpSink:
+    """
+    Local stand-in SMTP server that records the received mails and the throughput.
+
+    Attributes:
+        host (str): Address the server listens on.
+        port (int): Port the server listens on.
+        latenz (float): Delay in seconds before every reply, to simulate a remote server.
+        nachrichten (list): Received transactions as ``(absender, empfaenger, daten, zeit)``.
+        verbindungen (int): Number of connections opened so far.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latenz: float = 0.0):
+        """
+        Initializes the server; it is started with start() or as a context manager.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for a free port.
+            latenz (float): Delay in seconds before every reply.
+        """
+        self.latenz = latenz
+        self.nachrichten = []
+        self.verbindungen = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        self._start = None
+
+    def start(self) -> "SmtpSink":
+        """Starts the server in a background thread."""
+        self._start = time.monotonic()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"SMTP-Sink läuft auf {self.host}:{self.port}")
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def empfaenger(self) -> int:
+        """Returns the number of accepted recipients over all received mails."""
+        with self._lock:
+            return sum(len(eintrag[1]) for eintrag in self.nachrichten)
+
+    def empfaenger_pro_sekunde(self) -> float:
+        """Returns the accepted recipients per second between the start and the last mail."""
+        with self._lock:
+            if not self.nachrichten:
+                return 0.0
+            dauer = self.nachrichten[-1][3] - self._start
+            anzahl = sum(len(eintrag[1]) for eintrag in self.nachrichten)
+        return anzahl / dauer if dauer > 0 else 0.0
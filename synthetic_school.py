@@ -0,0 +1,225 @@
+"""
+synthetic_school.py
+
+This module generates synthetic test data for the matching of parental accounts. It creates a Schild
+export with the columns from mappings.mappingSpaltentitelCSV and the classes from mappings.mappingklassen,
+and a matching forms workbook in which parents register their children, including the mistakes real
+parents make.
+
+Functions:
+- generate_schild: Creates a synthetic Schild export.
+- generate_forms: Creates form submissions for students of a Schild export, with injected errors.
+- write_school: Writes a Schild CSV and a forms XLSX file and returns the ground truth.
+
+The generated data is completely random and does not require any network access, so it can be used
+for offline benchmarks (see benchmark_matching.py).
+
+Usage:
+    from synthetic_school import write_school
+    truth = write_school("schild.csv", "forms.xlsx", students=1000, seed=1)
+"""
+from datetime import datetime, timedelta
+import random
+import pandas as pd
+import mappings
+import logging
+
+logger = logging.getLogger(__name__)
+
+VORNAMEN = [
+    "Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannah", "Ida", "Jonas",
+    "Karl", "Lea", "Lena", "Leon", "Lina", "Luca", "Luis", "Marie", "Mia", "Milan",
+    "Noah", "Ole", "Paul", "Paula", "Emil", "Sophie", "Theo", "Tim", "Zoë", "Jürgen",
+    "Jörg", "Ömer", "Özge", "Anaïs", "Chloé", "Joël", "Rafaël", "Noël", "Léa", "Mélanie",
+    "Ahmet", "Aylin", "Elif", "Emre", "Mehmet", "Yusuf", "Zeynep", "Ali", "Fatma", "Can",
+    "Anna-Lena", "Marie-Sophie", "Jan-Ole", "Karl-Heinz", "Lars", "Jana", "Julia", "Moritz", "Nele", "Finn",
+    "Hugo", "Rosa", "Valentina", "Matteo", "Giulia", "Lorenzo", "Sofia", "Mateusz", "Zofia", "Katarzyna",
+    "Björn", "Søren", "Åsa", "Malte", "Frieda", "Ella", "Mats", "Henri", "Pia", "Jakob",
+]
+
+NACHNAMEN = [
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann",
+    "Schäfer", "Koch", "Bauer", "Richter", "Klein", "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann",
+    "Braun", "Krüger", "Hofmann", "Hartmann", "Lange", "Schmitt", "Werner", "Schmitz", "Krause", "Meier",
+    "Lehmann", "Schmid", "Schulze", "Maier", "Köhler", "Herrmann", "König", "Walter", "Mayer", "Huber",
+    "Kaiser", "Fuchs", "Peters", "Lang", "Scholz", "Möller", "Weiß", "Jung", "Hahn", "Schubert",
+    "Vogel", "Friedrich", "Keller", "Günther", "Frank", "Berger", "Winkler", "Roth", "Beck", "Lorenz",
+    "Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Özdemir", "Arslan",
+    "Rossi", "Russo", "Ferrari", "Esposito", "Nowak", "Kowalski", "Wiśniewski", "Zarauz", "Medina", "García",
+    "Müller-Lüdenscheidt", "Schulte-Bäuminghaus", "von der Heide", "de Jong", "van Dijk", "Lefèvre", "Dupré", "Núñez", "Peña", "Ibáñez",
+    "Windorf", "Brückner", "Jäger", "Böhm", "Dörr", "Förster", "Gärtner", "Häusler", "Kühn", "Lübke",
+]
+
+START = datetime(2024, 9, 1, 8, 0, 0)
+
+TRANSLITERATION = {
+    "ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue",
+    "é": "e", "è": "e", "ë": "e", "ï": "i", "ç": "c", "ñ": "n", "á": "a", "ú": "u",
+}
+
+
+def generate_schild(students: int, rng: random.Random) -> pd.DataFrame:
+    """
+    Creates a synthetic Schild export.
+
+    Args:
+        students (int): Number of students.
+        rng (random.Random): Random number generator.
+
+    Returns:
+        pd.DataFrame: The export with the columns from mappings.mappingSpaltentitelCSV.
+    """
+    klassen = list(mappings.mappingklassen.values())
+    rows = []
+    for nr in range(students):
+        vorname = rng.choice(VORNAMEN)
+        nachname = rng.choice(NACHNAMEN)
+        klasse = klassen[nr % len(klassen)]
+        username = f"{vorname}.{nachname}".translate(mappings.mappingusername).lower()
+        werte = [
+            "schule",
+            f"{nachname[:4]}{vorname[:4]}{nr}",
+            100000 + nr,
+            nachname,
+            vorname,
+            klasse,
+            f"{username}@schule.example",
+            username,
+            f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2005, 2015)}",
+            "1 GB",
+            f"pw{rng.randrange(10**8):08d}",
+            f"Klasse {klasse}",
+            f"c{nr}",
+            "Schueler",
+        ]
+        rows.append(werte)
+    return pd.DataFrame(
+        rows,
+        columns=[mappings.mappingSpaltentitelCSV[i] for i in sorted(mappings.mappingSpaltentitelCSV)],
+    )
+
+
+def _tippfehler(name: str, rng: random.Random) -> str:
+    """Deletes, duplicates or swaps a single character."""
+    if len(name) < 4:
+        return name
+    pos = rng.randrange(1, len(name) - 1)
+    art = rng.randrange(3)
+    if art == 0:
+        return name[:pos] + name[pos + 1 :]
+    if art == 1:
+        return name[:pos] + name[pos] + name[pos:]
+    return name[: pos - 1] + name[pos] + name[pos - 1] + name[pos + 1 :]
+
+
+def _transliteriere(name: str) -> str:
+    """Writes umlauts and accents the way they are typed on a keyboard without them."""
+    return "".join(TRANSLITERATION.get(zeichen, zeichen) for zeichen in name)
+
+
+def _falsche_klasse(klasse: str, rng: random.Random) -> str:
+    """Returns a badly formatted class or the class of the previous year."""
+    if klasse[:-1].isdigit() and rng.random() < 0.5:
+        return rng.choice([f"{klasse[:-1]} {klasse[-1]}", f"0{klasse}", klasse.upper()])
+    klassen = list(mappings.mappingklassen.values())
+    return klassen[(klassen.index(klasse) - 5) % len(klassen)]
+
+
+def generate_forms(
+    schild: pd.DataFrame,
+    rng: random.Random,
+    anteil: float = 0.6,
+    typos: float = 0.1,
+    swapped: float = 0.03,
+    umlaute: float = 0.3,
+    wrong_class: float = 0.05,
+    unknown: float = 0.02,
+) -> tuple:
+    """
+    Creates form submissions for students of a Schild export.
+
+    Every submission registers one to three children of one parent. Errors are injected with the
+    given probabilities per child.
+
+    Args:
+        schild (pd.DataFrame): The Schild export the children are taken from.
+        rng (random.Random): Random number generator.
+        anteil (float): Share of the students that get registered.
+        typos (float): Probability of a typo in the first and in the last name.
+        swapped (float): Probability that first and last name are swapped.
+        umlaute (float): Probability that umlauts and accents are transliterated.
+        wrong_class (float): Probability of a badly formatted or outdated class.
+        unknown (float): Probability of a child that does not exist in the Schild export.
+
+    Returns:
+        tuple: ``(forms, truth)`` with the forms DataFrame and the ground truth as a set of
+        ``(email, AT_webuntisUid)`` pairs of all children that exist in the Schild export.
+    """
+    positions = rng.sample(range(len(schild)), int(len(schild) * anteil))
+    rows = []
+    truth = set()
+    nr = 0
+    while positions:
+        anzahl = min(len(positions), rng.choice([1, 1, 1, 2, 2, 3]))
+        eltern_vorname = rng.choice(VORNAMEN)
+        eltern_nachname = rng.choice(NACHNAMEN)
+        email = f"eltern{nr}@example.org"
+        row = {
+            "Benutzer-ID": "",
+            "Anzeigename": "",
+            "Zeitstempel": (START + timedelta(minutes=nr)).isoformat(),
+            "Vorname des Elternteils": eltern_vorname,
+            "Nachname des Elternteils": eltern_nachname,
+            "Emailadresse des Elternteils": email if rng.random() < 0.8 else email.capitalize(),
+        }
+        for kind in range(1, 4):
+            vorname = nachname = klasse = None
+            if kind <= anzahl:
+                student = schild.iloc[positions.pop()]
+                vorname, nachname = student["US_firstName"], student["US_lastName"]
+                klasse = student["webuntisKlasse"]
+                if rng.random() < unknown:
+                    vorname, nachname = rng.choice(VORNAMEN), "Unbekannt"
+                else:
+                    truth.add((email, int(student["AT_webuntisUid"])))
+                if rng.random() < umlaute:
+                    vorname, nachname = _transliteriere(vorname), _transliteriere(nachname)
+                if rng.random() < typos:
+                    vorname = _tippfehler(vorname, rng)
+                if rng.random() < typos:
+                    nachname = _tippfehler(nachname, rng)
+                if rng.random() < swapped:
+                    vorname, nachname = nachname, vorname
+                if rng.random() < wrong_class:
+                    klasse = _falsche_klasse(klasse, rng)
+            row[f"Vorname des {kind}. Kindes"] = vorname
+            row[f"Nachname des {kind}. Kindes"] = nachname
+            row[f"Klasse des {kind}. Kindes"] = klasse
+        row["Kontrolliert"] = 1
+        rows.append(row)
+        nr += 1
+    return pd.DataFrame(rows), truth
+
+
+def write_school(schildexport: str, formsdatei: str, students: int, seed: int = 1) -> set:
+    """
+    Writes a synthetic Schild CSV export and a matching forms XLSX file.
+
+    Args:
+        schildexport (str): Path of the Schild CSV file to create.
+        formsdatei (str): Path of the forms XLSX file to create.
+        students (int): Number of students in the Schild export.
+        seed (int): Seed for the random number generator.
+
+    Returns:
+        set: The ground truth as ``(email, AT_webuntisUid)`` pairs.
+    """
+    rng = random.Random(seed)
+    schild = generate_schild(students, rng)
+    forms, truth = generate_forms(schild, rng)
+    schild.to_csv(schildexport, sep=";", quotechar='"', index=False)
+    forms.to_excel(formsdatei, index=False)
+    logger.info(
+        f"Synthetische Schule mit {students} Schülern und {len(forms)} Formulareinträgen erstellt"
+    )
+    return truth
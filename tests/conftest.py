@@ -0,0 +1,26 @@
+"""
+Shared fixtures of the test suite.
+
+The modules of this project import the elternaccounts_credentials and datenschutz modules, which only
+exist on the production machine. If they are missing, the templates elternaccounts_credentials_copy.py
+and datenschutz_copy.py are used instead; the tests never contact the servers configured there.
+"""
+import importlib
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for modul in ("elternaccounts_credentials", "datenschutz"):
+    try:
+        importlib.import_module(modul)
+    except ImportError:
+        sys.modules[modul] = importlib.import_module(f"{modul}_copy")
+
+
+@pytest.fixture
+def arbeitsordner(tmp_path, monkeypatch):
+    """Runs the test in an empty directory, so state files are not written to the repository."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
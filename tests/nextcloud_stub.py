@@ -0,0 +1,297 @@
+"""
+Local stand-in Nextcloud server for the tests, in the style of smtp_sink.py.
+
+It keeps the WebDAV files in memory and records every request. Status codes can be injected per request
+to simulate failures of the real server. Downloads answer conditional requests (If-None-Match) with 304.
+PROPFIND lists the files directly inside a folder with their ETags and modification times and, like
+Nextcloud, answers 412 if the If-None-Match header matches the ETag of the folder.
+Chunked uploads (chunking v2) are joined like Nextcloud does, including its minimum chunk size. The
+submissions endpoint of the Forms API (OCS) answers with the forms in ``formulare`` after an optional
+latency and records how many requests were in flight at the same time. The CSV export endpoint sends
+the bodies in ``exporte`` in small chunks (Transfer-Encoding: chunked).
+
+Classes:
+- NextcloudStub: The server, running in a background thread.
+
+Usage:
+    with NextcloudStub() as stub:
+        stub.fehler[("PUT", "/remote.php/dav/files/u/a.txt")] = [503]
+        put_stream(stub.url("/remote.php/dav/files/u/a.txt"), daten, "u", "p")
+        print(stub.anfragen)
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+
+UPLOADS = "/remote.php/dav/uploads/"
+FORMS_API = "/ocs/v2.php/apps/forms/api/v2.4/"
+
+# Größe der Stücke, in denen der CSV-Export gesendet wird
+EXPORT_CHUNK = 7
+# Nextcloud lehnt beim Zusammensetzen Chunks unter 5 MiB ab (außer dem letzten)
+MIN_CHUNK_SIZE = 5 << 20
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles one HTTP request."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        with self.server.stub._lock:
+            self.server.stub.verbindungen += 1
+        super().handle()
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            teile = []
+            while True:
+                laenge = int(self.rfile.readline().split(b";")[0], 16)
+                if laenge == 0:
+                    while self.rfile.readline() not in (b"\r\n", b""):
+                        pass
+                    return b"".join(teile)
+                teile.append(self.rfile.read(laenge))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _antwort(self, status: int, body: bytes = b"", headers: dict = None) -> None:
+        with self.server.stub._lock:
+            self.server.stub.antworten.append(status)
+        self.send_response(status)
+        for name, wert in (headers or {}).items():
+            self.send_header(name, wert)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _bearbeite(self):
+        stub = self.server.stub
+        pfad = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        body = self._body()
+        with stub._lock:
+            stub.anfragen.append((self.command, pfad, len(body)))
+            fehler = stub.fehler.get((self.command, pfad))
+            status = fehler.pop(0) if fehler else None
+        if status is not None:
+            return self._antwort(status)
+        methode = getattr(self, f"_{self.command.lower()}", None)
+        if methode is None:
+            return self._antwort(405)
+        methode(stub, pfad, body)
+
+    do_GET = do_PUT = do_MKCOL = do_PROPFIND = do_MOVE = _bearbeite
+
+    def _get(self, stub, pfad, body):
+        if pfad.startswith(f"{FORMS_API}submissions/export/"):
+            return self._export(stub, pfad[len(f"{FORMS_API}submissions/export/"):])
+        if pfad.startswith(f"{FORMS_API}submissions/"):
+            return self._submissions(stub, pfad[len(f"{FORMS_API}submissions/"):])
+        with stub._lock:
+            daten = stub.dateien.get(pfad)
+        if daten is None:
+            return self._antwort(404)
+        if self.headers.get("If-None-Match") == stub.etag(pfad):
+            return self._antwort(304, headers={"ETag": stub.etag(pfad)})
+        self._antwort(200, daten, {"ETag": stub.etag(pfad)})
+
+    def _submissions(self, stub, formshash):
+        with stub._lock:
+            stub.gleichzeitig += 1
+            stub.max_gleichzeitig = max(stub.max_gleichzeitig, stub.gleichzeitig)
+        try:
+            if stub.latenz:
+                time.sleep(stub.latenz)
+            with stub._lock:
+                formular = stub.formulare.get(formshash)
+                if formular is not None:
+                    daten = json.dumps(
+                        {"ocs": {"meta": {"status": "ok", "statuscode": 200}, "data": formular}}
+                    ).encode("utf-8")
+        finally:
+            with stub._lock:
+                stub.gleichzeitig -= 1
+        if formular is None:
+            return self._antwort(404)
+        self._antwort(200, daten, {"Content-Type": "application/json"})
+
+    def _export(self, stub, formshash):
+        with stub._lock:
+            daten = stub.exporte.get(formshash)
+        if daten is None:
+            return self._antwort(404)
+        with stub._lock:
+            stub.antworten.append(200)
+        # In kleinen Stücken senden, damit Zeilen über die Grenzen der Stücke reichen
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for start in range(0, len(daten), EXPORT_CHUNK):
+            teil = daten[start:start + EXPORT_CHUNK]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(teil), teil))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _put(self, stub, pfad, body):
+        with stub._lock:
+            ordner = pfad.rsplit("/", 1)[0]
+            if ordner.startswith(UPLOADS) and ordner not in stub.ordner:
+                return self._antwort(409)
+            neu = pfad not in stub.dateien
+            stub.dateien[pfad] = body
+            stub.versionen[pfad] = stub.versionen.get(pfad, 0) + 1
+        self._antwort(201 if neu else 204, headers={"ETag": stub.etag(pfad)})
+
+    def _mkcol(self, stub, pfad, body):
+        with stub._lock:
+            if pfad in stub.ordner:
+                return self._antwort(405)
+            stub.ordner.add(pfad)
+        self._antwort(201)
+
+    def _propfind(self, stub, pfad, body):
+        pfad = pfad.rstrip("/")
+        with stub._lock:
+            dateien = sorted(name for name in stub.dateien if name.rsplit("/", 1)[0] == pfad)
+            if pfad not in stub.ordner and not dateien:
+                return self._antwort(404)
+            ordner_etag = stub.ordner_etag(pfad)
+            if self.headers.get("If-None-Match") == ordner_etag:
+                return self._antwort(412)
+            eintraege = []
+            for name in dateien:
+                geaendert = stub.geaendert.get(name)
+                eintraege.append(
+                    f"<d:response><d:href>{escape(name)}</d:href><d:propstat><d:prop>"
+                    f"<d:getetag>{escape(stub.etag(name))}</d:getetag>"
+                    + (
+                        f"<d:getlastmodified>{formatdate(geaendert, usegmt=True)}</d:getlastmodified>"
+                        if geaendert is not None
+                        else ""
+                    )
+                    + f"<d:getcontentlength>{len(stub.dateien[name])}</d:getcontentlength>"
+                    f"</d:prop></d:propstat></d:response>"
+                )
+        antwort = (
+            '<?xml version="1.0"?><d:multistatus xmlns:d="DAV:">'
+            f"<d:response><d:href>{escape(pfad)}/</d:href><d:propstat><d:prop>"
+            f"<d:getetag>{escape(ordner_etag)}</d:getetag>"
+            "<d:resourcetype><d:collection/></d:resourcetype>"
+            "</d:prop></d:propstat></d:response>"
+            + "".join(eintraege)
+            + "</d:multistatus>"
+        ).encode("utf-8")
+        self._antwort(207, antwort, {"Content-Type": "application/xml"})
+
+    def _move(self, stub, pfad, body):
+        ziel = urllib.parse.unquote(urllib.parse.urlsplit(self.headers["Destination"]).path)
+        ordner = pfad[: -len("/.file")]
+        with stub._lock:
+            if not pfad.endswith("/.file") or ordner not in stub.ordner:
+                return self._antwort(404)
+            chunks = sorted(
+                (int(name.rsplit("/", 1)[1]), name)
+                for name in stub.dateien
+                if name.rsplit("/", 1)[0] == ordner
+            )
+            teile = [stub.dateien[name] for _, name in chunks]
+            if any(len(teil) < MIN_CHUNK_SIZE for teil in teile[:-1]):
+                return self._antwort(400)
+            daten = b"".join(teile)
+            if int(self.headers.get("OC-Total-Length", len(daten))) != len(daten):
+                return self._antwort(400)
+            for _, name in chunks:
+                del stub.dateien[name]
+            stub.ordner.discard(ordner)
+            neu = ziel not in stub.dateien
+            stub.dateien[ziel] = daten
+            stub.versionen[ziel] = stub.versionen.get(ziel, 0) + 1
+        self._antwort(201 if neu else 204, headers={"OC-ETag": stub.etag(ziel)})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class NextcloudStub:
+    """
+    Local stand-in Nextcloud server.
+
+    Attributes:
+        dateien (dict): The stored files by path, including the chunks of running uploads.
+        ordner (set): The upload folders of running chunked uploads.
+        geaendert (dict): Modification times (Unix timestamps) of files by path, listed as
+            getlastmodified by PROPFIND.
+        anfragen (list): Received requests as ``(methode, pfad, body_laenge)``.
+        verbindungen (int): Number of connections opened so far.
+        antworten (list): Status codes of all answers, in order.
+        formulare (dict): The ``ocs.data`` of the submissions request (``submissions`` and
+            ``questions``) by form hash.
+        exporte (dict): The body of the CSV export by form hash, sent in small chunks.
+        latenz (float): Delay in seconds before every answer of the Forms API.
+        max_gleichzeitig (int): Highest number of Forms API requests in flight at the same time.
+        fehler (dict): Status codes to answer instead of processing, as lists by
+            ``(methode, pfad)``; every request takes the first one.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latenz: float = 0.0):
+        self.latenz = latenz
+        self.gleichzeitig = 0
+        self.max_gleichzeitig = 0
+        self.dateien = {}
+        self.ordner = set()
+        self.versionen = {}
+        self.geaendert = {}
+        self.formulare = {}
+        self.exporte = {}
+        self.anfragen = []
+        self.verbindungen = 0
+        self.antworten = []
+        self.fehler = {}
+        self._lock = threading.RLock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self.host, self.port = self._server.server_address[:2]
+
+    def url(self, pfad: str) -> str:
+        """Returns the URL of a path on the server."""
+        return f"http://{self.host}:{self.port}{pfad}"
+
+    def etag(self, pfad: str) -> str:
+        """Returns the ETag of a stored file."""
+        return f'"{pfad}-{self.versionen.get(pfad, 0)}"'
+
+    def ordner_etag(self, pfad: str) -> str:
+        """Returns the ETag of a folder, which changes with every file directly inside it."""
+        with self._lock:
+            inhalt = sorted(
+                (name, self.etag(name), self.geaendert.get(name))
+                for name in self.dateien
+                if name.rsplit("/", 1)[0] == pfad
+            )
+        return f'"{hashlib.sha256(repr(inhalt).encode("utf-8")).hexdigest()[:16]}"'
+
+    def start(self) -> "NextcloudStub":
+        """Starts the server in a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
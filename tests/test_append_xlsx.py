@@ -0,0 +1,211 @@
+"""Round-trip tests for append_xlsx on workbooks saved by openpyxl."""
+import zipfile
+from zoneinfo import ZoneInfo
+import openpyxl as px
+from openpyxl.worksheet.table import Table
+import pandas as pd
+import pytest
+import data_processing
+from data_processing import append_xlsx
+from forms2 import submissions_to_dataframe
+
+SPALTEN = [
+    "Zeitstempel",
+    "Vorname des Elternteils",
+    "Nachname des Elternteils",
+    "Emailadresse des Elternteils",
+    "Vorname des 1. Kindes",
+    "Kontrolliert",
+]
+
+
+def _zeile(nr: int) -> dict:
+    return {
+        "Zeitstempel": f"2024-09-01T10:{nr:02d}:00+02:00",
+        "Vorname des Elternteils": f"Jörg {nr}",
+        "Nachname des Elternteils": "Müller & Söhne <GmbH>",
+        "Emailadresse des Elternteils": f"eltern{nr}@example.org",
+        "Vorname des 1. Kindes": "Anaïs",
+    }
+
+
+def _nicht_lesen(*args, **kwargs):
+    raise AssertionError("Die Arbeitsmappe darf nicht vollständig gelesen werden")
+
+
+def _dimension(xlsx_path: str) -> str:
+    with zipfile.ZipFile(xlsx_path) as zin:
+        daten = zin.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    return daten.split('<dimension ref="')[1].split('"')[0]
+
+
+@pytest.fixture
+def arbeitsmappe(arbeitsordner):
+    """A workbook as saved by openpyxl (shared strings, styles) with two checked rows."""
+    wb = px.Workbook()
+    ws = wb.active
+    ws.append(SPALTEN)
+    for nr in range(2):
+        ws.append([*_zeile(nr).values(), 1])
+    ws["A1"].font = px.styles.Font(bold=True)
+    ws.auto_filter.ref = "A1:F3"
+    wb.save("mappe.xlsx")
+    return "mappe.xlsx"
+
+
+def test_neue_zeilen_werden_angehaengt(arbeitsmappe):
+    neu = pd.DataFrame([_zeile(nr) for nr in range(4)])
+
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 2
+
+    ws = px.load_workbook(arbeitsmappe).active
+    zeilen = list(ws.iter_rows(values_only=True))
+    assert list(zeilen[0]) == SPALTEN
+    assert [zeile[0] for zeile in zeilen[1:]] == [_zeile(nr)["Zeitstempel"] for nr in range(4)]
+    assert [zeile[5] for zeile in zeilen[1:]] == [1, 1, None, None]
+    assert zeilen[3][2] == "Müller & Söhne <GmbH>"
+    assert ws.auto_filter.ref == "A1:F5"
+    assert ws["A1"].font.bold
+
+
+def test_doppelte_zeitstempel_werden_uebersprungen(arbeitsmappe):
+    neu = pd.DataFrame([_zeile(nr) for nr in (2, 2, 3)])
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 2
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 0
+
+    df = pd.read_excel(arbeitsmappe)
+    assert len(df) == 4
+    assert df["Zeitstempel"].is_unique
+
+
+def test_chunks_werden_einzeln_gefiltert(arbeitsmappe):
+    chunks = iter([pd.DataFrame([_zeile(nr) for nr in range(3)]), pd.DataFrame([_zeile(3)])])
+    assert append_xlsx(chunks, arbeitsmappe, "index.txt") == 2
+    assert pd.read_excel(arbeitsmappe)["Zeitstempel"].tolist() == [
+        _zeile(nr)["Zeitstempel"] for nr in range(4)
+    ]
+
+
+def test_unbekannte_spalte_wird_angefuegt(arbeitsmappe, monkeypatch):
+    append_xlsx(pd.DataFrame([_zeile(2)]), arbeitsmappe, "index.txt")
+    monkeypatch.setattr(data_processing.pd, "read_excel", _nicht_lesen)
+    neu = pd.DataFrame([dict(_zeile(5), **{"Klasse des 1. Kindes": "5a"})])
+
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 1
+
+    ws = px.load_workbook(arbeitsmappe).active
+    assert ws["G1"].value == "Klasse des 1. Kindes"
+    assert ws["G1"].font.bold == ws["F1"].font.bold
+    assert [ws.cell(zeile, 7).value for zeile in range(2, 6)] == [None, None, None, "5a"]
+    assert [ws.cell(zeile, 6).value for zeile in range(2, 6)] == [1, 1, None, None]
+    assert ws.auto_filter.ref == "A1:G5"
+
+
+def test_index_folgt_der_heruntergeladenen_mappe(arbeitsmappe):
+    """A workbook that was not uploaded (or restored on the server) gets the rows again."""
+    with open(arbeitsmappe, "rb") as datei:
+        alt = datei.read()
+    neu = pd.DataFrame([_zeile(nr) for nr in range(4)])
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 2
+
+    with open(arbeitsmappe, "wb") as datei:
+        datei.write(alt)
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 2
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 0
+    assert len(pd.read_excel(arbeitsmappe)) == 4
+
+
+def test_bearbeitete_zellen_behalten_den_index(arbeitsmappe, monkeypatch):
+    """Teachers mark rows as checked on the server; the index stays valid without reading the sheet."""
+    assert append_xlsx(pd.DataFrame([_zeile(nr) for nr in range(3)]), arbeitsmappe, "index.txt") == 1
+    wb = px.load_workbook(arbeitsmappe)
+    wb.active["F4"] = 1
+    wb.active["C2"] = "Müller (korrigiert)"
+    wb.save(arbeitsmappe)
+    monkeypatch.setattr(data_processing.pd, "read_excel", _nicht_lesen)
+
+    assert append_xlsx(pd.DataFrame([_zeile(nr) for nr in range(5)]), arbeitsmappe, "index.txt") == 2
+
+    ws = px.load_workbook(arbeitsmappe).active
+    assert [ws.cell(zeile, 6).value for zeile in range(2, 7)] == [1, 1, 1, None, None]
+    assert ws["C2"].value == "Müller (korrigiert)"
+
+
+def test_formatierung_und_bereiche_bleiben_erhalten(arbeitsordner):
+    wb = px.Workbook()
+    ws = wb.active
+    ws.append(SPALTEN)
+    for nr in range(2):
+        ws.append([*_zeile(nr).values(), 1])
+    for zelle in ws[1]:
+        zelle.font = px.styles.Font(bold=True)
+    gelb = px.styles.PatternFill("solid", fgColor="FFFF00")
+    for zelle in ws[3]:
+        zelle.fill = gelb
+    ws["B3"].number_format = "@"
+    ws.column_dimensions["C"].width = 40
+    ws.add_table(Table(displayName="Anmeldungen", ref="A1:F3"))
+    wb.save("mappe.xlsx")
+
+    assert append_xlsx(pd.DataFrame([_zeile(nr) for nr in range(4)]), "mappe.xlsx", "index.txt") == 2
+
+    wb = px.load_workbook("mappe.xlsx")
+    ws = wb.active
+    assert all(zelle.font.bold for zelle in ws[1])
+    assert ws.column_dimensions["C"].width == 40
+    for zeile in (4, 5):
+        assert all(zelle.fill.fgColor.rgb == "00FFFF00" for zelle in ws[zeile])
+        assert ws.cell(zeile, 2).number_format == "@"
+    # Auch leere Zellen mit Formatierung werden fortgesetzt
+    assert ws["F5"].value is None and ws["F5"].fill.fgColor.rgb == "00FFFF00"
+    assert ws.tables["Anmeldungen"].ref == "A1:F5"
+    assert _dimension("mappe.xlsx") == "A1:F5"
+
+
+def test_unendliche_zahlen_werden_abgelehnt(arbeitsmappe):
+    with open(arbeitsmappe, "rb") as datei:
+        vorher = datei.read()
+    neu = pd.DataFrame([dict(_zeile(5), **{"Vorname des 1. Kindes": float("inf")})])
+
+    with pytest.raises(ValueError):
+        append_xlsx(neu, arbeitsmappe, "index.txt")
+    with open(arbeitsmappe, "rb") as datei:
+        assert datei.read() == vorher
+
+
+def test_zeitstempel_werden_als_zeitpunkt_verglichen(arbeitsmappe, monkeypatch):
+    # Die Arbeitsmappe enthält die Zeilen 0 und 1 mit den Zeitstempeln aus dem CSV-Export;
+    # dieselben Einträge aus der JSON-API in einer anderen Zeitzone sind keine neuen Einträge
+    data = {
+        "questions": [{"id": 1, "order": 1, "text": "Vorname des Elternteils"}],
+        "submissions": [
+            {
+                "id": nr,
+                "userId": "",
+                "timestamp": 1725177600 + nr * 60,
+                "answers": [{"questionId": 1, "text": f"Jörg {nr}"}],
+            }
+            for nr in (0, 1, 2)
+        ],
+    }
+    df = submissions_to_dataframe(data, zeitzone=ZoneInfo("UTC"))
+    assert df["Zeitstempel"].tolist()[0] == "2024-09-01T08:00:00+00:00"
+
+    assert append_xlsx(df, arbeitsmappe, "index.txt") == 1
+    monkeypatch.setattr(data_processing.pd, "read_excel", _nicht_lesen)
+    assert append_xlsx(df, arbeitsmappe, "index.txt") == 0
+
+    ws = px.load_workbook(arbeitsmappe).active
+    assert [zeile[0] for zeile in ws.iter_rows(min_row=2, values_only=True)] == [
+        _zeile(0)["Zeitstempel"],
+        _zeile(1)["Zeitstempel"],
+        "2024-09-01T08:02:00+00:00",
+    ]
+
+
+def test_alter_index_mit_text_wird_neu_erstellt(arbeitsmappe):
+    with open("index.txt", "w", encoding="utf-8") as datei:
+        datei.write(f"# zeilen=3\n{_zeile(0)['Zeitstempel']}\n{_zeile(1)['Zeitstempel']}\n")
+
+    neu = pd.DataFrame([dict(_zeile(1), Zeitstempel="2024-09-01T08:01:00Z"), _zeile(2)])
+    assert append_xlsx(neu, arbeitsmappe, "index.txt") == 1
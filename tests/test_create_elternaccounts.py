@@ -0,0 +1,86 @@
+"""Regression tests for createElternaccounts: the output must not depend on workers or the match cache."""
+import pandas as pd
+import pytest
+import data_processing
+from data_processing import accounts_dataframe, createElternaccounts, matchElternaccounts
+from synthetic_school import write_school
+
+
+@pytest.fixture(scope="module")
+def schule(tmp_path_factory):
+    ordner = tmp_path_factory.mktemp("schule")
+    write_school(str(ordner / "schild.csv"), str(ordner / "forms.xlsx"), students=400, seed=7)
+    return ordner
+
+
+def _erstelle(schule, ausgabe, **kwargs) -> tuple:
+    kontrolle = ausgabe / "elternaccounts-control.csv"
+    accounts = ausgabe / "elternaccounts.csv"
+    createElternaccounts(
+        str(schule / "forms.xlsx"), str(schule / "schild.csv"), str(kontrolle), str(accounts), **kwargs
+    )
+    return kontrolle.read_bytes(), accounts.read_bytes()
+
+
+def test_seriell_erzeugt_accounts(schule, tmp_path):
+    kontrolle, accounts = _erstelle(schule, tmp_path)
+    assert kontrolle.count(b"\n") > 100
+    assert accounts.startswith(b"Eltern Vorname;Eltern Nachname;email;student-id;username")
+
+
+def test_worker_identisch_zu_seriell(schule, tmp_path):
+    (tmp_path / "seriell").mkdir()
+    (tmp_path / "parallel").mkdir()
+    seriell = _erstelle(schule, tmp_path / "seriell")
+    parallel = _erstelle(schule, tmp_path / "parallel", workers=2)
+    assert parallel == seriell
+
+
+def test_cache_identisch_zu_seriell(schule, tmp_path, monkeypatch):
+    (tmp_path / "seriell").mkdir()
+    (tmp_path / "kalt").mkdir()
+    (tmp_path / "warm").mkdir()
+    cache_path = str(tmp_path / "matchcache.json")
+    seriell = _erstelle(schule, tmp_path / "seriell")
+    kalt = _erstelle(schule, tmp_path / "kalt", cache_path=cache_path)
+
+    gematcht = []
+    match_klassen = data_processing.match_klassen
+
+    def _zaehle(jobs, workers):
+        gematcht.extend(jobs)
+        return match_klassen(jobs, workers)
+
+    monkeypatch.setattr(data_processing, "match_klassen", _zaehle)
+    warm = _erstelle(schule, tmp_path / "warm", cache_path=cache_path)
+    assert gematcht == []
+    assert kalt == seriell
+    assert warm == seriell
+
+
+def test_klassenfremde_treffer_nur_in_der_kontrollausgabe():
+    schild = pd.DataFrame(
+        {
+            "AT_webuntisUid": [1, 2],
+            "US_firstName": ["Anna", "Ben"],
+            "US_lastName": ["Müller", "Weber"],
+            "webuntisKlasse": ["6a", "5a"],
+        }
+    )
+    forms = pd.DataFrame(
+        {
+            "Vorname des Elternteils": ["Jörg", "Eva"],
+            "Nachname des Elternteils": ["Müller", "Weber"],
+            "Emailadresse des Elternteils": ["Mueller@example.org", "weber@example.org"],
+            "Vorname des 1. Kindes": ["Anna", "Ben"],
+            "Nachname des 1. Kindes": ["Müller", "Weber"],
+            # Klasse des Vorjahres
+            "Klasse des 1. Kindes": ["5a", "5a"],
+            "Kontrolliert": [1, 1],
+        }
+    )
+    results = matchElternaccounts(forms, schild)
+
+    assert [(r.schild_index, r.cross_class) for r in results] == [(0, True), (1, False)]
+    assert matchElternaccounts(forms, schild, fallback=False)[0].schild_index == 1
+    assert accounts_dataframe(results, forms, schild)["student-id"].tolist() == [2]
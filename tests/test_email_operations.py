@@ -0,0 +1,110 @@
+"""Tests of the batched mail sending against the local SMTP server from smtp_sink.py."""
+import smtplib
+import pytest
+from email_operations import erstelle_nachricht, sende_batches
+from smtp_sink import SmtpSink, verbinde_plain
+
+
+@pytest.fixture
+def sink():
+    with SmtpSink() as sink:
+        yield sink
+
+
+@pytest.fixture
+def msg():
+    return erstelle_nachricht("Betreff mit Ümlaut", "Text", "schule@example.org", "schule@example.org")
+
+
+def _empfaenger(anzahl: int) -> list:
+    return [f"eltern{nr}@example.org" for nr in range(anzahl)]
+
+
+class _Verbindungen:
+    """Connection factory that fails with an OSError on the given calls and sendmails."""
+
+    def __init__(self, verbinden_fehler=(), senden_fehler=()):
+        self.verbinden_fehler = set(verbinden_fehler)
+        self.senden_fehler = set(senden_fehler)
+        self.verbindungen = 0
+        self.sendungen = 0
+
+    def __call__(self, *args):
+        self.verbindungen += 1
+        if self.verbindungen in self.verbinden_fehler:
+            raise ConnectionRefusedError("Verbindung abgelehnt")
+        server = verbinde_plain(*args)
+        sendmail = server.sendmail
+
+        def _sendmail(*sendmail_args):
+            self.sendungen += 1
+            if self.sendungen in self.senden_fehler:
+                raise TimeoutError("Zeitüberschreitung")
+            return sendmail(*sendmail_args)
+
+        server.sendmail = _sendmail
+        return server
+
+
+def test_batches_ueber_eine_verbindung(sink, msg):
+    empfaenger = _empfaenger(120) + ["reject@example.org", "ELTERN0@example.org"]
+    ergebnisse = sende_batches(empfaenger, msg, sink.host, sink.port, "u", "p", 50, verbinde_plain)
+
+    assert [len(ergebnis["angenommen"]) for ergebnis in ergebnisse] == [50, 50, 20]
+    assert list(ergebnisse[2]["abgelehnt"]) == ["reject@example.org"]
+    assert sink.verbindungen == 1
+    assert sink.empfaenger() == 120
+    assert all(b"Bcc" not in daten for _, _, daten, _ in sink.nachrichten)
+
+
+def test_zeitueberschreitung_wird_mit_neuer_verbindung_wiederholt(sink, msg):
+    verbinde = _Verbindungen(senden_fehler={2})
+    ergebnisse = sende_batches(_empfaenger(30), msg, sink.host, sink.port, "u", "p", 10, verbinde)
+
+    assert [ergebnis["fehler"] for ergebnis in ergebnisse] == [None, None, None]
+    assert sum(len(ergebnis["angenommen"]) for ergebnis in ergebnisse) == 30
+    assert verbinde.verbindungen == 2
+
+
+def test_fehlgeschlagener_batch_verliert_keine_ergebnisse(sink, msg):
+    verbinde = _Verbindungen(senden_fehler={2, 3})
+    ergebnisse = sende_batches(_empfaenger(30), msg, sink.host, sink.port, "u", "p", 10, verbinde)
+
+    assert [len(ergebnis["angenommen"]) for ergebnis in ergebnisse] == [10, 0, 10]
+    assert ergebnisse[1]["fehler"].startswith("Verbindungsfehler")
+    assert ergebnisse[0]["fehler"] is None and ergebnisse[2]["fehler"] is None
+    assert all(ergebnis["versucht"] for ergebnis in ergebnisse)
+    assert sink.empfaenger() == 20
+
+
+def test_abgelehnte_verbindung_bricht_den_versand_ab(sink, msg):
+    verbinde = _Verbindungen(verbinden_fehler={2, 3}, senden_fehler={2})
+    ergebnisse = sende_batches(_empfaenger(30), msg, sink.host, sink.port, "u", "p", 10, verbinde)
+
+    assert [len(ergebnis["angenommen"]) for ergebnis in ergebnisse] == [10, 0, 0]
+    assert ergebnisse[1]["fehler"].startswith("Verbindungsfehler")
+    assert [ergebnis["versucht"] for ergebnis in ergebnisse] == [True, True, False]
+    assert verbinde.verbindungen == 2
+    assert sink.empfaenger() == 10
+
+
+def test_abgelehnte_anmeldung_bricht_den_versand_ab(sink, msg):
+    anmeldungen = []
+
+    def verbinde(*args):
+        anmeldungen.append(args)
+        raise smtplib.SMTPAuthenticationError(535, b"5.7.8 Authentication credentials invalid")
+
+    ergebnisse = sende_batches(_empfaenger(30), msg, sink.host, sink.port, "u", "p", 10, verbinde)
+
+    assert len(anmeldungen) == 1
+    assert ergebnisse[0]["fehler"].startswith("Anmeldung fehlgeschlagen")
+    assert [ergebnis["versucht"] for ergebnis in ergebnisse] == [True, False, False]
+    assert not any(ergebnis["angenommen"] for ergebnis in ergebnisse)
+
+
+def test_umschlagabsender_aus_der_nachricht(sink):
+    msg = erstelle_nachricht("Betreff", "Text", "Schule am See <schule@example.org>", "schule@example.org")
+    sende_batches(_empfaenger(2), msg, sink.host, sink.port, "login-name", "p", 10, verbinde_plain)
+
+    assert [absender for absender, _, _, _ in sink.nachrichten] == ["schule@example.org"]
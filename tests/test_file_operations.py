@@ -0,0 +1,225 @@
+"""Tests of the WebDAV transfers in file_operations against a local stand-in server."""
+import io
+import os
+import pytest
+from file_operations import (
+    MIN_CHUNK_SIZE,
+    find_latest_export,
+    get_file,
+    put_file,
+    put_file_chunked,
+    put_stream,
+)
+from nextcloud_stub import NextcloudStub
+
+DATEI = "/remote.php/dav/files/u/daten.bin"
+
+
+@pytest.fixture
+def stub():
+    with NextcloudStub() as stub:
+        yield stub
+
+
+def test_generator_wird_nach_503_nicht_wiederholt(stub):
+    stub.fehler[("PUT", DATEI)] = [503]
+    chunks = (bytes([nr]) * 1000 for nr in range(5))
+
+    assert put_stream(stub.url(DATEI), chunks, "u", "p") is None
+    assert [anfrage for anfrage in stub.anfragen if anfrage[0] == "PUT"] == [("PUT", DATEI, 5000)]
+    assert DATEI not in stub.dateien
+
+
+def test_datei_wird_nach_503_erneut_gesendet(stub, tmp_path):
+    stub.fehler[("PUT", DATEI)] = [503]
+    daten = bytes(range(256)) * 20
+    pfad = tmp_path / "daten.bin"
+    pfad.write_bytes(daten)
+
+    with open(pfad, "rb") as datei:
+        assert put_stream(stub.url(DATEI), datei, "u", "p")
+    assert stub.anfragen == [("PUT", DATEI, len(daten)), ("PUT", DATEI, len(daten))]
+    assert stub.dateien[DATEI] == daten
+
+
+def test_generator_ohne_fehler(stub):
+    assert put_stream(stub.url(DATEI), iter([b"ab", b"cd"]), "u", "p")
+    assert stub.dateien[DATEI] == b"abcd"
+
+
+def test_nicht_zurueckspulbarer_datenstrom_wird_nicht_wiederholt(stub, tmp_path):
+    class Strom(io.BufferedReader):
+        def seekable(self):
+            return False
+
+    stub.fehler[("PUT", DATEI)] = [503]
+    pfad = tmp_path / "daten.bin"
+    pfad.write_bytes(b"x" * 100)
+    with open(pfad, "rb", buffering=0) as roh:
+        assert put_stream(stub.url(DATEI), Strom(roh), "u", "p") is None
+    assert len(stub.anfragen) == 1
+
+
+@pytest.fixture
+def grosse_datei(tmp_path):
+    pfad = tmp_path / "gross.bin"
+    pfad.write_bytes(os.urandom(2 * MIN_CHUNK_SIZE + 1000))
+    return str(pfad)
+
+
+def _datei(tmp_path, daten: bytes) -> str:
+    pfad = tmp_path / "upload.bin"
+    pfad.write_bytes(daten)
+    return str(pfad)
+
+
+def _anzahl(stub, methode: str) -> int:
+    return sum(1 for anfrage in stub.anfragen if anfrage[0] == methode)
+
+
+def test_chunked_upload(stub, grosse_datei):
+    assert put_file(stub.url(DATEI), grosse_datei, "u", "p", chunk_size=MIN_CHUNK_SIZE)
+    with open(grosse_datei, "rb") as datei:
+        assert stub.dateien[DATEI] == datei.read()
+    assert _anzahl(stub, "PUT") == 3
+    assert stub.ordner == set()
+
+
+@pytest.mark.parametrize("chunk_size", [MIN_CHUNK_SIZE - 1, 1 << 20, 0x150000000])
+def test_ungueltige_chunkgroesse(stub, grosse_datei, chunk_size):
+    with pytest.raises(ValueError):
+        put_file(stub.url(DATEI), grosse_datei, "u", "p", chunk_size=chunk_size)
+    with pytest.raises(ValueError):
+        put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", chunk_size=chunk_size)
+    assert stub.anfragen == []
+
+
+def test_abgebrochener_upload_wird_fortgesetzt(stub, grosse_datei):
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE, parallel=1)
+    stub.dateien.pop(DATEI)
+    ordner_pfad = next(pfad for methode, pfad, _ in stub.anfragen if methode == "MKCOL")
+    stub.anfragen.clear()
+    stub.fehler[("PUT", f"{ordner_pfad}/2")] = [403]
+
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE, parallel=1) is None
+    assert _anzahl(stub, "MOVE") == 0
+    stub.anfragen.clear()
+
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE, parallel=1)
+    assert [pfad for methode, pfad, _ in stub.anfragen if methode == "PUT"] == [f"{ordner_pfad}/2"]
+    with open(grosse_datei, "rb") as datei:
+        assert stub.dateien[DATEI] == datei.read()
+
+
+def test_move_wird_nicht_wiederholt(stub, grosse_datei):
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE)
+    ordner_pfad = next(pfad for methode, pfad, _ in stub.anfragen if methode == "MKCOL")
+    stub.dateien.pop(DATEI)
+    stub.anfragen.clear()
+    stub.fehler[("MOVE", f"{ordner_pfad}/.file")] = [503]
+
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE) is None
+    assert _anzahl(stub, "MOVE") == 1
+    stub.anfragen.clear()
+
+    assert put_file_chunked(stub.url(DATEI), grosse_datei, "u", "p", MIN_CHUNK_SIZE)
+    assert _anzahl(stub, "PUT") == 0
+    assert _anzahl(stub, "MOVE") == 1
+
+
+def test_unveraenderte_datei_kommt_aus_dem_cache(stub, tmp_path):
+    stub.dateien[DATEI] = b"Version 1"
+    cache_dir = str(tmp_path / "cache")
+    ziel = tmp_path / "daten.bin"
+
+    etag = get_file(stub.url(DATEI), str(ziel), "u", "p", cache_dir=cache_dir)
+    assert etag == stub.etag(DATEI)
+    ziel.write_bytes(b"lokal veraendert")
+
+    assert get_file(stub.url(DATEI), str(ziel), "u", "p", cache_dir=cache_dir) == etag
+    assert stub.antworten == [200, 304]
+    assert ziel.read_bytes() == b"Version 1"
+
+
+def test_geaenderte_datei_wird_neu_geladen(stub, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    ziel = tmp_path / "daten.bin"
+    assert put_file(stub.url(DATEI), _datei(tmp_path, b"Version 1"), "u", "p", cache_dir=cache_dir)
+    # Nach dem eigenen Upload ist der Cache bereits aktuell
+    assert get_file(stub.url(DATEI), str(ziel), "u", "p", cache_dir=cache_dir)
+    assert stub.antworten[-1] == 304
+
+    stub.dateien[DATEI] = b"Version 2"
+    stub.versionen[DATEI] += 1
+    assert get_file(stub.url(DATEI), str(ziel), "u", "p", cache_dir=cache_dir) == stub.etag(DATEI)
+    assert stub.antworten[-1] == 200
+    assert ziel.read_bytes() == b"Version 2"
+
+
+def test_bekannter_etag_spart_die_anfrage(stub, tmp_path):
+    stub.dateien[DATEI] = b"Version 1"
+    cache_dir = str(tmp_path / "cache")
+    etag = get_file(stub.url(DATEI), str(tmp_path / "a.bin"), "u", "p", cache_dir=cache_dir)
+    stub.anfragen.clear()
+
+    assert get_file(stub.url(DATEI), str(tmp_path / "b.bin"), "u", "p", cache_dir=cache_dir, etag=etag) == etag
+    assert stub.anfragen == []
+    assert (tmp_path / "b.bin").read_bytes() == b"Version 1"
+
+
+EXPORTE = "/remote.php/dav/files/u/Export"
+
+
+def test_neuester_export_wird_gefunden(stub, tmp_path):
+    for name, geaendert in [
+        ("00-Export20240901.csv", 300),
+        ("00-Export20241015.csv", 100),
+        ("00-Export20240315.csv", 200),
+        ("00-Export20991231.txt", 400),
+        ("Notizen.csv", 500),
+    ]:
+        stub.dateien[f"{EXPORTE}/{name}"] = b"x"
+        stub.geaendert[f"{EXPORTE}/{name}"] = geaendert
+    cache_path = str(tmp_path / "listing.json")
+
+    export = find_latest_export(stub.url(EXPORTE), "u", "p", cache_path=cache_path)
+
+    # Das Datum im Dateinamen entscheidet, nicht die Änderungszeit
+    assert export["name"] == "00-Export20241015.csv"
+    assert export["etag"] == stub.etag(f"{EXPORTE}/00-Export20241015.csv")
+
+
+def test_gleiches_datum_nach_aenderungszeit(stub, tmp_path):
+    for name, geaendert in [("00-Export20241015.csv", 200), ("00-Export20241015.CSV", 100)]:
+        stub.dateien[f"{EXPORTE}/{name}"] = b"x"
+        stub.geaendert[f"{EXPORTE}/{name}"] = geaendert
+
+    export = find_latest_export(
+        stub.url(EXPORTE), "u", "p", pattern=r"00-Export(\d{8})\.(?i:csv)", cache_path=None
+    )
+
+    assert export["name"] == "00-Export20241015.csv"
+
+
+def test_unveraenderter_ordner_kommt_aus_dem_cache(stub, tmp_path):
+    stub.dateien[f"{EXPORTE}/00-Export20240901.csv"] = b"x"
+    cache_path = str(tmp_path / "listing.json")
+    assert find_latest_export(stub.url(EXPORTE), "u", "p", cache_path=cache_path)["name"] == (
+        "00-Export20240901.csv"
+    )
+
+    assert find_latest_export(stub.url(EXPORTE), "u", "p", cache_path=cache_path)["name"] == (
+        "00-Export20240901.csv"
+    )
+    assert stub.antworten == [207, 412]
+
+    stub.dateien[f"{EXPORTE}/00-Export20241015.csv"] = b"x"
+    assert find_latest_export(stub.url(EXPORTE), "u", "p", cache_path=cache_path)["name"] == (
+        "00-Export20241015.csv"
+    )
+    assert stub.antworten == [207, 412, 207]
+
+
+def test_ordner_ohne_export(stub):
+    stub.dateien[f"{EXPORTE}/Notizen.csv"] = b"x"
+    assert find_latest_export(stub.url(EXPORTE), "u", "p", cache_path=None) is None
@@ -0,0 +1,126 @@
+"""Tests of the incremental submission sync in forms2 against a local stand-in server."""
+import io
+from zoneinfo import ZoneInfo
+import pandas as pd
+import pytest
+from forms2 import NextcloudFormsAPI, load_submission_store, submissions_to_dataframe
+from nextcloud_stub import NextcloudStub
+
+FRAGEN = [
+    {"id": 1, "order": 1, "text": "Vorname des Elternteils"},
+    {"id": 2, "order": 2, "text": "Nachname des Elternteils"},
+]
+
+
+def _submission(nr: int) -> dict:
+    return {
+        "id": nr,
+        "userId": f"anon-user-{nr}",
+        "timestamp": 1725177600 + nr * 60,
+        "answers": [
+            {"questionId": 1, "text": f"Vorname {nr}"},
+            {"questionId": 2, "text": "Müller"},
+        ],
+    }
+
+
+@pytest.fixture
+def api(arbeitsordner):
+    with NextcloudStub() as stub:
+        stub.formulare["F1"] = {"submissions": [_submission(nr) for nr in (1, 2)], "questions": FRAGEN}
+        api = NextcloudFormsAPI(stub.url(""), "u", "p")
+        api.stub = stub
+        yield api
+
+
+def test_ohne_commit_werden_die_eintraege_erneut_geliefert(api):
+    df, _ = api.fetchNewFormSubmissions("F1")
+    assert df.index.tolist() == [1, 2]
+
+    df, commit = api.fetchNewFormSubmissions("F1")
+    assert df.index.tolist() == [1, 2]
+    commit()
+
+    df, _ = api.fetchNewFormSubmissions("F1")
+    assert df.empty
+
+
+def test_nach_commit_nur_neue_eintraege(api):
+    _, commit = api.fetchNewFormSubmissions("F1")
+    commit()
+    api.stub.formulare["F1"]["submissions"].append(_submission(3))
+
+    df, _ = api.fetchNewFormSubmissions("F1")
+    assert df.index.tolist() == [3]
+    assert df["Vorname des Elternteils"].tolist() == ["Vorname 3"]
+
+
+def test_speicher_ist_vor_dem_commit_lesbar(api):
+    api.fetchNewFormSubmissions("F1")
+    api.fetchNewFormSubmissions("F1")
+
+    df = load_submission_store("F1")
+    assert df.index.tolist() == [1, 2]
+    assert df["Nachname des Elternteils"].tolist() == ["Müller", "Müller"]
+
+
+def test_sync_verschiebt_den_cursor_sofort(api):
+    assert len(api.syncFormSubmissions("F1")) == 2
+    assert api.syncFormSubmissions("F1").empty
+
+
+# Zeilen 1 und 2 des CSV-Exports von Nextcloud Forms (deutsche Oberfläche, Benutzer in Europe/Berlin)
+CSV_EXPORT = (
+    '"Benutzer-ID","Anzeigename","Zeitstempel","Vorname des Elternteils","Nachname des Elternteils"\n'
+    '"","Anonymer Benutzer","2024-09-01T10:01:00+02:00","Vorname 1","Müller"\n'
+    '"","Anonymer Benutzer","2024-09-01T10:02:00+02:00","Vorname 2","Müller"\n'
+)
+
+
+def test_dataframe_entspricht_dem_csv_export():
+    export = pd.read_csv(io.StringIO(CSV_EXPORT), keep_default_na=False)
+    df = submissions_to_dataframe(
+        {"submissions": [_submission(2), _submission(1)], "questions": FRAGEN},
+        zeitzone=ZoneInfo("Europe/Berlin"),
+    )
+
+    assert df.columns.tolist() == export.columns.tolist()
+    assert df.values.tolist() == export.values.tolist()
+    assert all(dtype == "string" for dtype in df.dtypes)
+    leer = submissions_to_dataframe({"submissions": [], "questions": FRAGEN})
+    assert leer.dtypes.tolist() == df.dtypes.tolist()
+
+
+def test_unbeantwortete_fragen_fehlen():
+    submission = dict(_submission(1), answers=[{"questionId": 1, "text": "Vorname 1"}])
+    df = submissions_to_dataframe({"submissions": [submission], "questions": FRAGEN})
+    assert df["Nachname des Elternteils"].isna().all()
+
+
+EXPORT_MIT_UMBRUCH = (
+    "\ufeff" + CSV_EXPORT
+    + '"","Anonymer Benutzer","2024-09-01T10:03:00+02:00","Anaïs","Müller\nLüdenscheidt"\n'
+).encode("utf-8")
+
+
+def test_csv_export_wird_zeilenweise_gelesen(api):
+    api.stub.exporte["F1"] = EXPORT_MIT_UMBRUCH
+    zeilen = list(api.iterFormSubmissionsCSV("F1"))
+
+    assert [zeile["Zeitstempel"] for zeile in zeilen] == [
+        "2024-09-01T10:01:00+02:00",
+        "2024-09-01T10:02:00+02:00",
+        "2024-09-01T10:03:00+02:00",
+    ]
+    assert next(iter(zeilen[0])) == "Benutzer-ID"
+    assert zeilen[2]["Vorname des Elternteils"] == "Anaïs"
+    assert zeilen[2]["Nachname des Elternteils"] == "Müller\nLüdenscheidt"
+
+
+def test_csv_export_in_chunks(api):
+    api.stub.exporte["F1"] = EXPORT_MIT_UMBRUCH
+    chunks = list(api.iterFormSubmissionsCSV("F1", chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1]["Nachname des Elternteils"].tolist() == ["Müller\nLüdenscheidt"]
+    assert pd.concat(chunks)["Vorname des Elternteils"].tolist() == ["Vorname 1", "Vorname 2", "Anaïs"]
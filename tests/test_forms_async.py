@@ -0,0 +1,58 @@
+"""Tests of the asynchronous Forms API client against a local stand-in server."""
+import asyncio
+import pytest
+import requests
+from forms_async import AsyncNextcloudFormsAPI
+from nextcloud_stub import NextcloudStub
+
+LATENZ = 0.1
+
+
+def _formular(nr: int) -> dict:
+    return {
+        "submissions": [{"id": nr, "userId": "", "timestamp": 1725177600, "answers": []}],
+        "questions": [],
+    }
+
+
+@pytest.fixture
+def stub():
+    with NextcloudStub(latenz=LATENZ) as stub:
+        for nr in range(12):
+            stub.formulare[f"F{nr}"] = _formular(nr)
+        yield stub
+
+
+async def _lade_viele(stub, formshashes, max_concurrency):
+    async with AsyncNextcloudFormsAPI(
+        stub.url(""), "u", "p", max_concurrency=max_concurrency
+    ) as api:
+        return await api.getManyFormSubmissions(formshashes)
+
+
+def test_viele_formulare_mit_begrenzter_parallelitaet(stub):
+    formshashes = [f"F{nr}" for nr in range(12)]
+    responses = asyncio.run(_lade_viele(stub, formshashes, max_concurrency=3))
+
+    assert list(responses) == formshashes
+    for nr, formshash in enumerate(formshashes):
+        assert responses[formshash].json()["ocs"]["data"] == _formular(nr)
+    # Die Latenz sorgt dafür, dass sich die Anfragen überlappen
+    assert stub.max_gleichzeitig == 3
+
+
+def test_unbekanntes_formular_meldet_fehler(stub):
+    with pytest.raises(requests.HTTPError):
+        asyncio.run(_lade_viele(stub, ["F0", "unbekannt"], max_concurrency=2))
+
+
+def test_dataframe(stub):
+    async def _lade():
+        async with AsyncNextcloudFormsAPI(stub.url(""), "u", "p") as api:
+            return await asyncio.gather(
+                api.getFormSubmissionsDataFrame("F1"), api.getFormSubmissionsDataFrame("F2")
+            )
+
+    eins, zwei = asyncio.run(_lade())
+    assert eins.index.tolist() == [1]
+    assert zwei.index.tolist() == [2]
@@ -0,0 +1,60 @@
+"""Tests of the shared pooled session in http_session."""
+import pytest
+from file_operations import get_file
+from forms2 import NextcloudFormsAPI
+from http_session import TIMEOUT, create_session, get_session
+from nextcloud_stub import NextcloudStub
+
+DATEI = "/remote.php/dav/files/u/daten.txt"
+
+
+@pytest.fixture
+def stub():
+    with NextcloudStub() as stub:
+        stub.dateien[DATEI] = b"Inhalt"
+        yield stub
+
+
+def test_eine_gemeinsame_session():
+    assert get_session() is get_session()
+    assert get_session(retries=False) is not get_session()
+    assert NextcloudFormsAPI("https://cloud.example.org", "u", "p").session is get_session()
+
+
+def test_verbindung_wird_wiederverwendet(stub):
+    session = create_session()
+    for _ in range(3):
+        assert session.get(stub.url(DATEI), auth=("u", "p")).content == b"Inhalt"
+    assert stub.verbindungen == 1
+
+
+def test_dateien_und_forms_teilen_die_verbindung(stub, tmp_path):
+    stub.formulare["F1"] = {"submissions": [], "questions": []}
+    api = NextcloudFormsAPI(stub.url(""), "u", "p")
+
+    assert get_file(stub.url(DATEI), str(tmp_path / "daten.txt"), "u", "p") is not None
+    assert api.getFormSubmissions("F1").json()["ocs"]["data"]["submissions"] == []
+    assert get_file(stub.url(DATEI), str(tmp_path / "daten.txt"), "u", "p") is not None
+    assert stub.verbindungen == 1
+
+
+def test_standard_timeout(monkeypatch):
+    gesendet = {}
+
+    def _send(request, **kwargs):
+        gesendet.update(kwargs)
+        raise ConnectionError("nicht gesendet")
+
+    session = create_session()
+    monkeypatch.setattr(session, "send", _send)
+    with pytest.raises(ConnectionError):
+        session.get("http://127.0.0.1:9/")
+    assert gesendet["timeout"] == TIMEOUT
+
+
+def test_wiederholung_nach_503(stub):
+    stub.fehler[("GET", DATEI)] = [503]
+    assert get_session().get(stub.url(DATEI), auth=("u", "p")).status_code == 200
+    assert get_session(retries=False).get(stub.url(DATEI)).status_code == 200
+    stub.fehler[("GET", DATEI)] = [503]
+    assert get_session(retries=False).get(stub.url(DATEI)).status_code == 503
@@ -0,0 +1,72 @@
+"""Tests of the persistent MailQueue and the MailDispatcher against the local SMTP server."""
+import pytest
+from email_operations import erstelle_nachricht
+from mail_dispatcher import (
+    FEHLER,
+    GESENDET,
+    MAX_VERSUCHE,
+    OFFEN,
+    MailDispatcher,
+    MailQueue,
+    enqueue_batches,
+)
+from smtp_sink import SmtpSink, verbinde_plain
+
+
+@pytest.fixture
+def msg():
+    return erstelle_nachricht("Zugang", "Text", "schule@example.org", "schule@example.org")
+
+
+def _empfaenger(anzahl: int) -> list:
+    return [f"eltern{nr}@example.org" for nr in range(anzahl)]
+
+
+def _versende(queue: MailQueue, sink: SmtpSink) -> dict:
+    return MailDispatcher(
+        queue, sink.host, sink.port, "u", "p", workers=2, rate=1e9, verbinde=verbinde_plain
+    ).run()
+
+
+def test_offene_eintraege_werden_nach_dem_oeffnen_gesendet(arbeitsordner, msg):
+    queue = MailQueue("queue.sqlite")
+    assert enqueue_batches(queue, "job", _empfaenger(50), msg, batch_size=10) == 5
+    # Abbruch mitten im Versand: ein Eintrag bestätigt, einer entnommen, aber nicht bestätigt
+    gesendet = queue.claim()[0]
+    queue.finish(gesendet, GESENDET)
+    queue.claim()
+    queue.close()
+
+    queue = MailQueue("queue.sqlite")
+    assert queue.counts("job") == {GESENDET: 1, OFFEN: 4}
+    assert enqueue_batches(queue, "job", _empfaenger(50), msg, batch_size=10) == 0
+    with SmtpSink() as sink:
+        ergebnis = _versende(queue, sink)
+
+    assert ergebnis[GESENDET] == 4
+    assert sink.empfaenger() == 40
+    assert "eltern0@example.org" not in {a for _, liste, _, _ in sink.nachrichten for a in liste}
+    assert queue.counts("job") == {GESENDET: 5}
+    queue.close()
+
+    queue = MailQueue("queue.sqlite")
+    assert queue.claim() is None
+    queue.close()
+
+
+def test_fehlgeschlagene_eintraege_bis_max_versuche(arbeitsordner, msg):
+    queue = MailQueue("queue.sqlite")
+    enqueue_batches(queue, "job", _empfaenger(5), msg)
+    eintrag_id = queue.claim()[0]
+    for versuch in range(1, MAX_VERSUCHE):
+        queue.finish(eintrag_id, FEHLER, "Zeitüberschreitung")
+        queue.close()
+        # Der Fehlversuch ist gespeichert, der Eintrag bleibt offen
+        queue = MailQueue("queue.sqlite")
+        assert queue.counts("job") == {OFFEN: 1}
+        assert queue.claim()[0] == eintrag_id
+    queue.finish(eintrag_id, FEHLER, "Zeitüberschreitung")
+
+    assert queue.counts("job") == {FEHLER: 1}
+    assert queue.claim() is None
+    queue.close()
@@ -0,0 +1,172 @@
+"""Tests of the mail merge: recipients, templates and the deduplication in the MailQueue."""
+import csv
+import smtplib
+import pytest
+from mail_dispatcher import FEHLER, MAX_VERSUCHE, MailDispatcher, MailQueue
+from mail_merge import (
+    enqueue_serienbriefe,
+    erstelle_serienbriefe,
+    kompiliere_vorlage,
+    lade_empfaenger,
+    sende_serienbriefe,
+)
+from smtp_sink import SmtpSink, verbinde_plain
+
+VORLAGE = "Hallo $name, Ihr Benutzername für $kind ist $benutzername."
+
+
+def _schreibe_csv(pfad, zeilen: list) -> None:
+    with open(pfad, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(zeilen[0]), delimiter=";")
+        writer.writeheader()
+        writer.writerows(zeilen)
+
+
+def _eltern(nr: int, email: str = None, student_id: str = None) -> dict:
+    return {
+        "Eltern Vorname": f"Jörg{nr}",
+        "Eltern Nachname": "Müller",
+        "email": email or f"eltern{nr}@example.org",
+        "student-id": student_id or str(nr),
+        "username": f"mueller{nr}",
+    }
+
+
+@pytest.fixture
+def csvs(arbeitsordner):
+    _schreibe_csv(
+        "elternaccounts.csv",
+        [_eltern(0), _eltern(1), _eltern(0, "ELTERN0@example.org", "2")],
+    )
+    _schreibe_csv(
+        "elternaccounts-control.csv",
+        [
+            {"student-id": str(nr), "Kind Vorname (schild)": vorname, "Kind Nachname (schild)": "Müller"}
+            for nr, vorname in enumerate(["Anna", "Ben", "Clara"])
+        ],
+    )
+    return "elternaccounts.csv", "elternaccounts-control.csv"
+
+
+def _nachrichten(csvs):
+    empfaenger = lade_empfaenger(*csvs)
+    return erstelle_serienbriefe(empfaenger, kompiliere_vorlage(VORLAGE), "Zugang", "schule@example.org")
+
+
+def test_eltern_werden_pro_adresse_zusammengefasst(csvs):
+    empfaenger = lade_empfaenger(*csvs)
+
+    assert [eintrag["email"] for eintrag in empfaenger] == ["eltern0@example.org", "eltern1@example.org"]
+    assert empfaenger[0]["kind"] == "Anna Müller und Clara Müller"
+    assert empfaenger[0]["benutzername"] == "mueller0"
+
+
+@pytest.mark.parametrize("text", ["Hallo $unbekannt", "Preis: 5 $"])
+def test_ungueltige_vorlage(text):
+    with pytest.raises(ValueError):
+        kompiliere_vorlage(text)
+
+
+def test_jeder_empfaenger_wird_nur_einmal_eingereiht(csvs):
+    queue = MailQueue("queue.sqlite")
+    assert enqueue_serienbriefe(queue, _nachrichten(csvs)) == 2
+    assert enqueue_serienbriefe(queue, _nachrichten(csvs)) == 0
+
+    _schreibe_csv(csvs[0], [_eltern(0), _eltern(1), _eltern(3)])
+    assert enqueue_serienbriefe(queue, _nachrichten(csvs)) == 1
+    queue.close()
+
+
+def test_gesendete_empfaenger_werden_nicht_erneut_angeschrieben(csvs):
+    queue = MailQueue("queue.sqlite")
+    enqueue_serienbriefe(queue, _nachrichten(csvs))
+    with SmtpSink() as sink:
+        MailDispatcher(queue, sink.host, sink.port, "u", "p", rate=1e9, verbinde=verbinde_plain).run()
+    assert sink.empfaenger() == 2
+    queue.close()
+
+    queue = MailQueue("queue.sqlite")
+    assert enqueue_serienbriefe(queue, _nachrichten(csvs)) == 0
+    queue.close()
+
+
+def test_fehlgeschlagene_empfaenger_werden_erneut_eingereiht(csvs):
+    queue = MailQueue("queue.sqlite")
+    enqueue_serienbriefe(queue, _nachrichten(csvs))
+    eintrag_id = queue.claim()[0]
+    for _ in range(MAX_VERSUCHE):
+        queue.finish(eintrag_id, FEHLER, "Zeitüberschreitung")
+
+    assert enqueue_serienbriefe(queue, _nachrichten(csvs)) == 1
+    queue.close()
+
+
+def test_verbindungsfehler_wird_mit_neuer_verbindung_wiederholt(csvs):
+    verbindungen = []
+
+    def verbinde(*args):
+        server = verbinde_plain(*args)
+        if not verbindungen:
+            def _sendmail(*sendmail_args):
+                raise TimeoutError("Zeitüberschreitung")
+
+            server.sendmail = _sendmail
+        verbindungen.append(server)
+        return server
+
+    with SmtpSink() as sink:
+        ergebnis = sende_serienbriefe(_nachrichten(csvs), sink.host, sink.port, "u", "p", verbinde)
+
+    assert ergebnis == {
+        "angenommen": ["eltern0@example.org", "eltern1@example.org"],
+        "abgelehnt": {},
+        "nicht_versucht": [],
+        "fehler": None,
+    }
+    assert len(verbindungen) == 2
+    assert sink.empfaenger() == 2
+
+
+def test_abgelehnte_anmeldung_bricht_den_versand_ab(csvs):
+    anmeldungen = []
+
+    def verbinde(*args):
+        anmeldungen.append(args)
+        raise smtplib.SMTPAuthenticationError(535, b"5.7.8 Authentication credentials invalid")
+
+    ergebnis = sende_serienbriefe(_nachrichten(csvs), "127.0.0.1", 9, "u", "p", verbinde)
+
+    assert len(anmeldungen) == 1
+    assert ergebnis["fehler"].startswith("Anmeldung fehlgeschlagen")
+    assert ergebnis["abgelehnt"] == {}
+    assert ergebnis["nicht_versucht"] == ["eltern0@example.org", "eltern1@example.org"]
+
+
+def test_verbindungsfehler_nach_der_wiederholung_bricht_den_versand_ab(csvs):
+    verbindungen = []
+
+    def verbinde(*args):
+        verbindungen.append(args)
+        raise ConnectionRefusedError("Verbindung abgelehnt")
+
+    ergebnis = sende_serienbriefe(_nachrichten(csvs), "127.0.0.1", 9, "u", "p", verbinde)
+
+    assert len(verbindungen) == 2
+    assert ergebnis["fehler"].startswith("Verbindungsfehler")
+    assert ergebnis["angenommen"] == [] and ergebnis["abgelehnt"] == {}
+    assert ergebnis["nicht_versucht"] == ["eltern0@example.org", "eltern1@example.org"]
+
+
+def test_abgelehnte_adresse_betrifft_nur_diesen_empfaenger(csvs):
+    _schreibe_csv(
+        csvs[0], [_eltern(0, "reject@example.org"), _eltern(1), _eltern(2, student_id="2")]
+    )
+    with SmtpSink() as sink:
+        ergebnis = sende_serienbriefe(
+            _nachrichten(csvs), sink.host, sink.port, "u", "p", verbinde_plain
+        )
+
+    assert list(ergebnis["abgelehnt"]) == ["reject@example.org"]
+    assert ergebnis["angenommen"] == ["eltern1@example.org", "eltern2@example.org"]
+    assert ergebnis["fehler"] is None and ergebnis["nicht_versucht"] == []
+    assert sink.verbindungen == 1
@@ -0,0 +1,174 @@
+"""Tests of the matching building blocks in matching.py and utils.py."""
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from matching import (
+    MatchCache,
+    build_phonetik_index,
+    klassen_fingerprint,
+    match_fallback,
+    match_klasse,
+    match_klassen,
+    normalisiere_forms,
+    normalisiere_schild,
+    top2,
+)
+from utils import normalisiere_name, similar, similar_matrix
+
+
+def _sequentiell(scores: np.ndarray) -> list:
+    """The original scan over the students: only strictly higher scores replace a match."""
+    ergebnis = []
+    for zeile in scores:
+        best, best_score, second, second_score = None, 0, None, 0
+        for pos, score in enumerate(zeile):
+            if score > best_score:
+                second, second_score = best, best_score
+                best, best_score = pos, score
+            elif score > second_score:
+                second, second_score = pos, score
+        ergebnis.append((best, best_score, second, second_score))
+    return ergebnis
+
+
+def test_similar_matrix_entspricht_similar():
+    a = ["Anna Müller", "ben SCHMIDT", "", "Zoë Lefèvre"]
+    b = ["anna mueller", "Ben Schmitt", "Zoe Lefevre", ""]
+    matrix = similar_matrix(a, b)
+    assert matrix.shape == (4, 4)
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            assert matrix[i, j] == pytest.approx(similar(x, y))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top2_entspricht_dem_sequentiellen_scan(seed):
+    rng = np.random.default_rng(seed)
+    # Wenige verschiedene Werte, damit Gleichstände und Nullen häufig vorkommen
+    scores = rng.choice([0.0, 0.25, 0.5, 0.75, 1.0], size=(30, 12))
+    best, best_score, second, second_score = top2(scores)
+    erwartet = _sequentiell(scores)
+    for nr, (b, bs, s, ss) in enumerate(erwartet):
+        assert (best[nr] if best[nr] >= 0 else None) == b
+        assert best_score[nr] == bs
+        assert (second[nr] if second[nr] >= 0 else None) == s
+        assert second_score[nr] == ss
+
+
+def test_match_klasse_liefert_schild_positionen():
+    positions = [10, 11, 12]
+    treffer = match_klasse(["anna mueller", "xyz"], ["ben weber", "anna mueller", "anna meier"], positions)
+
+    assert treffer[0][0] == 11 and treffer[0][1] == 1.0
+    assert treffer[0][2] == 12
+    assert match_klasse(["anna"], [], []) == [(None, 0.0, None, 0)]
+
+
+def test_match_klassen_parallel_in_job_reihenfolge():
+    jobs = [
+        (
+            f"{nr}a",
+            [f"kind {nr} {i}" for i in range(4)],
+            [f"kind {nr} {i}" for i in range(6)],
+            list(range(nr * 10, nr * 10 + 6)),
+        )
+        for nr in range(5)
+    ]
+    seriell = [matches for matches, _ in match_klassen(jobs)]
+    parallel = [matches for matches, _ in match_klassen(jobs, workers=2)]
+
+    assert parallel == seriell
+    assert [matches[0][0] for matches in parallel] == [0, 10, 20, 30, 40]
+
+
+@pytest.fixture
+def schild():
+    return pd.DataFrame(
+        {
+            "AT_webuntisUid": [1, 2, 3],
+            "US_firstName": ["Anna", "Ben", "Clara"],
+            "US_lastName": ["Müller", "Weber", "Wolf"],
+            "webuntisKlasse": ["5a", "5a", "5b"],
+        }
+    )
+
+
+def test_fingerprint_aendert_sich_nur_mit_der_klasse(schild):
+    fingerprint = klassen_fingerprint(schild, [0, 1])
+    geaendert = schild.copy()
+    geaendert.loc[2, "US_lastName"] = "Wolff"
+    assert klassen_fingerprint(geaendert, [0, 1]) == fingerprint
+
+    geaendert.loc[1, "US_lastName"] = "Webers"
+    assert klassen_fingerprint(geaendert, [0, 1]) != fingerprint
+
+
+def test_cache_treffer_bei_unveraendertem_fingerprint(schild, tmp_path):
+    pfad = str(tmp_path / "matchcache.json")
+    fingerprint = klassen_fingerprint(schild, [0, 1])
+    cache = MatchCache(pfad)
+    assert cache.get("Anna", "Müller", "5a", fingerprint, [0, 1]) is None
+    cache.put("Anna", "Müller", "5a", fingerprint, [0, 1], (0, 1.0, 1, 0.4))
+    cache.save()
+
+    cache = MatchCache(pfad)
+    # Die Positionen gelten relativ zur Klasse, auch wenn sich andere Klassen verschieben
+    assert cache.get("Anna", "Müller", "5a", fingerprint, [7, 8]) == (7, 1.0, 8, 0.4)
+    assert cache.get("Anna", "Müller", "5a", "anderer-fingerprint", [0, 1]) is None
+    assert cache.get("Anna", "Mueller", "5a", fingerprint, [0, 1]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_veralteter_cache_wird_verworfen(schild, tmp_path):
+    pfad = tmp_path / "matchcache.json"
+    fingerprint = klassen_fingerprint(schild, [0, 1])
+    cache = MatchCache(str(pfad))
+    cache.put("Anna", "Müller", "5a", fingerprint, [0, 1], (0, 1.0, None, 0))
+    cache.save()
+    daten = json.loads(pfad.read_text(encoding="utf-8"))
+    pfad.write_text(json.dumps(dict(daten, version=0)), encoding="utf-8")
+
+    assert MatchCache(str(pfad)).get("Anna", "Müller", "5a", fingerprint, [0, 1]) is None
+
+
+def test_fallback_findet_schreibvarianten_in_allen_klassen(schild):
+    normalisiere_schild(schild)
+    index = build_phonetik_index(schild)
+
+    # "Möller" und "Müller" haben denselben Phonetik-Code, "Wolf" einen anderen
+    best, score, _, _ = match_fallback("Anna", "Möller", "anna moeller", index)
+    assert best == 0 and score > 0.8
+    assert match_fallback("Anna", "Xyz", "anna xyz", index) is None
+
+
+@pytest.mark.parametrize(
+    "name, erwartet",
+    [
+        ("Müller-Lüdenscheidt", "mueller luedenscheidt"),
+        ("  Anaïs  LEFÈVRE ", "anais lefevre"),
+        ("Weiß", "weiss"),
+        (None, ""),
+        (float("nan"), ""),
+    ],
+)
+def test_normalisiere_name(name, erwartet):
+    assert normalisiere_name(name) == erwartet
+
+
+def test_normalisierte_spalten(schild):
+    normalisiere_schild(schild)
+    assert schild["fullName_norm"].tolist() == ["anna mueller", "ben weber", "clara wolf"]
+
+    forms = pd.DataFrame(
+        {
+            "Vorname des 1. Kindes": ["Anna", "Zoë"],
+            "Nachname des 1. Kindes": ["Müller", None],
+            "Vorname des 2. Kindes": ["Ben", None],
+        }
+    )
+    normalisiere_forms(forms)
+    assert forms["Name des 1. Kindes (norm)"].tolist() == ["anna mueller", "zoe"]
+    # Ohne Nachnamensspalte bleibt nur der Vorname
+    assert forms["Name des 2. Kindes (norm)"].tolist() == ["ben", ""]
+    assert "Name des 3. Kindes (norm)" not in forms.columns
@@ -0,0 +1,61 @@
+"""Tests of the GET response cache used by NextcloudFormsAPI."""
+import pytest
+import response_cache
+from forms2 import NextcloudFormsAPI
+from nextcloud_stub import FORMS_API, NextcloudStub
+from response_cache import ResponseCache
+
+FORMS = f"{FORMS_API}forms"
+
+
+@pytest.fixture
+def stub():
+    with NextcloudStub() as stub:
+        stub.dateien[FORMS] = b'{"ocs": {"data": []}}'
+        yield stub
+
+
+def _abrufe(stub) -> int:
+    return sum(1 for anfrage in stub.anfragen if anfrage[:2] == ("GET", FORMS))
+
+
+def test_zweiter_abruf_kommt_aus_dem_cache(stub):
+    api = NextcloudFormsAPI(stub.url(""), "u", "p", cache=ResponseCache())
+
+    assert api.get_forms().json() == {"ocs": {"data": []}}
+    assert api.get_forms().json() == {"ocs": {"data": []}}
+    assert _abrufe(stub) == 1
+    assert (api.cache.hits, api.cache.misses) == (1, 1)
+
+
+def test_benutzer_teilen_keine_eintraege(stub):
+    cache = ResponseCache()
+    NextcloudFormsAPI(stub.url(""), "u", "p", cache=cache).get_forms()
+    NextcloudFormsAPI(stub.url(""), "v", "p", cache=cache).get_forms()
+    NextcloudFormsAPI(stub.url(""), "u", "anderes-passwort", cache=cache).get_forms()
+
+    assert _abrufe(stub) == 3
+    assert cache.hits == 0
+
+
+def test_abgelaufene_eintraege_werden_neu_geladen(stub, monkeypatch):
+    jetzt = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: jetzt[0])
+    api = NextcloudFormsAPI(stub.url(""), "u", "p", cache=ResponseCache(ttl=60))
+
+    api.get_forms()
+    jetzt[0] += 59
+    api.get_forms()
+    jetzt[0] += 2
+    api.get_forms()
+    assert _abrufe(stub) == 2
+
+
+def test_persistenter_cache_ohne_klartext_passwort(stub, tmp_path):
+    pfad = str(tmp_path / "cache.sqlite")
+    NextcloudFormsAPI(stub.url(""), "u", "geheim", cache=ResponseCache(path=pfad)).get_forms()
+
+    cache = ResponseCache(path=pfad)
+    assert NextcloudFormsAPI(stub.url(""), "u", "geheim", cache=cache).get_forms().status_code == 200
+    assert _abrufe(stub) == 1
+    assert b"geheim" not in (tmp_path / "cache.sqlite").read_bytes()
@@ -0,0 +1,39 @@
+"""Tests of the dependency handling in transfer_scheduler."""
+import pytest
+from transfer_scheduler import Ergebnis, TransferScheduler
+
+
+def _fehler():
+    raise RuntimeError("Upload fehlgeschlagen")
+
+
+def test_ergebnisse_werden_weitergereicht():
+    scheduler = TransferScheduler()
+    scheduler.add("a", lambda: 2)
+    scheduler.add("b", lambda x, y: x * y, Ergebnis("a"), y=Ergebnis("a"))
+
+    assert scheduler.run() == {"a": 2, "b": 4}
+    assert scheduler.fehlgeschlagen == set()
+
+
+def test_fehler_ueberspringt_die_abhaengigen_schritte():
+    gelaufen = []
+    scheduler = TransferScheduler()
+    scheduler.add("update", lambda: gelaufen.append("update"))
+    scheduler.add("upload_xlsx", _fehler, after=["update"])
+    scheduler.add("forms_commit", lambda: gelaufen.append("forms_commit"), after=["upload_xlsx"])
+    scheduler.add("upload_csv", lambda: gelaufen.append("upload_csv"), after=["update"])
+
+    ergebnisse = scheduler.run()
+
+    assert set(ergebnisse) == {"update", "upload_csv"}
+    assert sorted(gelaufen) == ["update", "upload_csv"]
+    assert scheduler.fehlgeschlagen == {"upload_xlsx", "forms_commit"}
+
+
+def test_zyklus_wird_abgelehnt():
+    scheduler = TransferScheduler()
+    scheduler.add("a", lambda: None, after=["b"])
+    scheduler.add("b", lambda: None, after=["a"])
+    with pytest.raises(ValueError):
+        scheduler.run()
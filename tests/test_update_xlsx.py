@@ -0,0 +1,47 @@
+"""Tests of write_xlsx and the full (non-incremental) update_xlsx."""
+import openpyxl as px
+import pandas as pd
+import pytest
+import data_processing
+from data_processing import update_xlsx, write_xlsx
+
+
+@pytest.fixture
+def formulardaten():
+    return pd.DataFrame(
+        {
+            "Zeitstempel": ["2024-09-01T10:00:00+02:00", "2024-09-01T10:01:00+02:00"],
+            "Vorname des Elternteils": ["Jörg", None],
+            "Nachname des Elternteils": ["Müller", "Weber"],
+            "Kontrolliert": [1, pd.NA],
+        }
+    )
+
+
+def test_write_xlsx_in_einem_durchgang(arbeitsordner, formulardaten):
+    write_xlsx(formulardaten, "mappe.xlsx")
+
+    ws = px.load_workbook("mappe.xlsx").active
+    zeilen = list(ws.iter_rows(values_only=True))
+    assert list(zeilen[0]) == formulardaten.columns.tolist()
+    assert zeilen[2] == ("2024-09-01T10:01:00+02:00", None, "Weber", None)
+    assert ws.auto_filter.ref == "A1:D3"
+    assert all(ws.cell(1, spalte).font.bold for spalte in range(1, 5))
+    assert ws.column_dimensions["A"].width == 2
+    assert ws.column_dimensions["D"].width == 9
+
+
+def test_update_xlsx_ohne_index_entfernt_doppelte(arbeitsordner, formulardaten, monkeypatch):
+    backups = []
+    monkeypatch.setattr(
+        data_processing, "backup_file", lambda path, *args: backups.append(path) or "hochgeladen"
+    )
+    write_xlsx(formulardaten.iloc[:1], "mappe.xlsx")
+
+    update_xlsx(formulardaten.drop(columns="Kontrolliert"), "mappe.xlsx")
+
+    df = pd.read_excel("mappe.xlsx")
+    assert df["Zeitstempel"].tolist() == formulardaten["Zeitstempel"].tolist()
+    assert df["Kontrolliert"].tolist()[0] == 1
+    assert backups == ["mappe.xlsx"]
+
@@ -0,0 +1,171 @@
+"""
+transfer_scheduler.py
+
+This module runs independent steps of a pipeline, mostly network transfers, concurrently while respecting
+the dependencies between them. A step is started as soon as all steps it depends on have finished, so the
+total runtime approaches the longest chain of dependent steps instead of the sum of all steps.
+
+Classes:
+- Ergebnis: Placeholder for the return value of another step, passed as an argument.
+- TransferScheduler: Collects steps with their dependencies and runs them in a thread pool.
+
+Usage:
+    scheduler = TransferScheduler()
+    scheduler.add("forms", export_forms)
+    scheduler.add("xlsx", get_file, url, "testxlsx.xlsx", user, pw)
+    scheduler.add("update", update_xlsx, Ergebnis("forms"), "testxlsx.xlsx", after=["xlsx"])
+    ergebnisse = scheduler.run()
+
+Requirements:
+- Only the standard library (concurrent.futures) is used. The steps must be thread-safe with respect
+  to each other; steps that write the same file have to depend on each other.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Standardanzahl gleichzeitiger Schritte
+MAX_WORKERS = 4
+
+
+class Ergebnis:
+    """
+    Placeholder for the return value of another step.
+
+    Arguments of this type are replaced by the result of the named step when the step runs. The
+    named step automatically becomes a dependency.
+
+    Attributes:
+        name (str): Name of the step whose result is passed.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"Ergebnis({self.name!r})"
+
+
+class TransferScheduler:
+    """
+    Runs steps with dependencies concurrently in a thread pool.
+
+    Attributes:
+        max_workers (int): Maximum number of steps running at the same time.
+        steps (dict): The registered steps by name, as ``(func, args, kwargs, after)``.
+        fehlgeschlagen (set): Names of the steps that failed or were skipped in the last run.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        """
+        Initializes an empty scheduler.
+
+        Args:
+            max_workers (int): Maximum number of steps running at the same time.
+        """
+        self.max_workers = max_workers
+        self.steps = {}
+        self.fehlgeschlagen = set()
+
+    def add(self, name: str, func, *args, after=(), **kwargs) -> None:
+        """
+        Registers a step.
+
+        Args:
+            name (str): Unique name of the step, used for dependencies and results.
+            func (callable): The function to call as ``func(*args, **kwargs)``.
+            after (iterable): Names of the steps that have to finish before this step starts. Steps
+                whose results are passed as Ergebnis arguments are added automatically.
+
+        Raises:
+            ValueError: If a step with this name already exists.
+        """
+        if name in self.steps:
+            raise ValueError(f"Schritt {name} ist bereits vorhanden")
+        after = list(after)
+        for wert in (*args, *kwargs.values()):
+            if isinstance(wert, Ergebnis) and wert.name not in after:
+                after.append(wert.name)
+        self.steps[name] = (func, args, kwargs, tuple(after))
+
+    def _pruefe(self) -> None:
+        """Checks that all dependencies exist and that they contain no cycle."""
+        for name, (_, _, _, after) in self.steps.items():
+            for abhaengigkeit in after:
+                if abhaengigkeit not in self.steps:
+                    raise ValueError(f"Schritt {name} hängt vom unbekannten Schritt {abhaengigkeit} ab")
+        erledigt = set()
+        offen = set(self.steps)
+        while offen:
+            bereit = {name for name in offen if set(self.steps[name][3]) <= erledigt}
+            if not bereit:
+                raise ValueError(f"Zyklische Abhängigkeit zwischen {sorted(offen)}")
+            erledigt |= bereit
+            offen -= bereit
+
+    def _ausfuehren(self, name: str, ergebnisse: dict):
+        """Runs one step with the results of its Ergebnis arguments and logs its duration."""
+        func, args, kwargs, _ = self.steps[name]
+
+        def _einsetzen(wert):
+            return ergebnisse[wert.name] if isinstance(wert, Ergebnis) else wert
+
+        args = [_einsetzen(wert) for wert in args]
+        kwargs = {schluessel: _einsetzen(wert) for schluessel, wert in kwargs.items()}
+        start = time.perf_counter()
+        ergebnis = func(*args, **kwargs)
+        logger.info(f"Schritt {name} beendet nach {time.perf_counter() - start:.2f}s")
+        return ergebnis
+
+    def run(self) -> dict:
+        """
+        Runs all registered steps.
+
+        A step that raises an exception is logged as failed; the steps depending on it, directly or
+        indirectly, are skipped. All other steps still run. The failed and skipped steps are kept in
+        ``fehlgeschlagen``, so callers can tell a complete run from a partial one.
+
+        Returns:
+            dict: The return values of the successful steps by name.
+
+        Raises:
+            ValueError: If a dependency is unknown or the dependencies contain a cycle.
+        """
+        self._pruefe()
+        ergebnisse = {}
+        fehlgeschlagen = self.fehlgeschlagen = set()
+        offen = dict(self.steps)
+        laufend = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while offen or laufend:
+                for name, (_, _, _, after) in list(offen.items()):
+                    if any(abhaengigkeit in fehlgeschlagen for abhaengigkeit in after):
+                        logger.warning(f"Schritt {name} übersprungen, eine Abhängigkeit ist fehlgeschlagen")
+                        fehlgeschlagen.add(name)
+                        del offen[name]
+                    elif all(abhaengigkeit in ergebnisse for abhaengigkeit in after):
+                        laufend[executor.submit(self._ausfuehren, name, ergebnisse)] = name
+                        del offen[name]
+                if not laufend:
+                    # Alle verbleibenden Schritte hängen von fehlgeschlagenen Schritten ab
+                    continue
+                fertig, _ = wait(laufend, return_when=FIRST_COMPLETED)
+                for future in fertig:
+                    name = laufend.pop(future)
+                    try:
+                        ergebnisse[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Schritt {name} ist fehlgeschlagen: {e}")
+                        fehlgeschlagen.add(name)
+        logger.info(
+            f"{len(ergebnisse)} von {len(self.steps)} Schritten in "
+            f"{time.perf_counter() - start:.2f}s ausgeführt"
+        )
+        if fehlgeschlagen:
+            logger.error(f"Fehlgeschlagene oder übersprungene Schritte: {', '.join(sorted(fehlgeschlagen))}")
+        return ergebnisse
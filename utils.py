@@ -4,21 +4,34 @@ utils.py
 Dieses Modul enthält Hilfsfunktionen zur Verarbeitung von Zeichenfolgen, einschließlich:
 
 1. Berechnung der Ähnlichkeit zwischen zwei Strings unter Verwendung des Levenshtein-Verhältnisses.
-2. Generierung von Benutzernamen anhand von Vor- und Nachnamen, mit verschiedenen Formatoptionen.
+   Für viele Vergleiche auf einmal steht eine Matrix-Variante auf Basis von RapidFuzz zur Verfügung.
+2. Normalisierung von Namen für den Vergleich (Transliteration, Groß-/Kleinschreibung, Leerzeichen).
+3. Berechnung des phonetischen Codes eines Namens nach der Kölner Phonetik.
+4. Generierung von Benutzernamen anhand von Vor- und Nachnamen, mit verschiedenen Formatoptionen.
 
 Funktionen:
 - similar(a: str, b: str) -> float: Berechnet die Ähnlichkeit zwischen zwei Zeichenfolgen.
+- similar_matrix(a: list, b: list) -> np.ndarray: Berechnet die Ähnlichkeiten aller Paare zweier Listen.
+- normalisiere_name(name) -> str: Normalisiert einen Namen für den Vergleich.
+- koelner_phonetik(wort: str) -> str: Berechnet den Code eines Wortes nach der Kölner Phonetik.
 - returnUsername(given: str, last: str, typ: str) -> str: Erstellt einen Benutzernamen basierend auf verschiedenen Formatoptionen.
 
 Hinweis:
-- Dieses Modul verwendet die `Levenshtein`-Bibliothek. Stellen Sie sicher, dass sie installiert ist.
+- Dieses Modul verwendet die Bibliotheken `Levenshtein`, `rapidfuzz` und `numpy`. Stellen Sie sicher, dass sie installiert sind.
 """
 from Levenshtein import ratio
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+import re
 import mappings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Eine gemeinsame Zeichentabelle aus mappinguntis und mappingusername, bei Konflikten gilt mappingusername
+NORMALISIERUNG = str.maketrans({**mappings.mappinguntis, **mappings.mappingusername})
+
 
 def similar(a: str, b: str) -> float:
     """
@@ -37,6 +50,117 @@ def similar(a: str, b: str) -> float:
     return ratio(a.lower(), b.lower())
 
 
+def similar_matrix(a: list, b: list, lower: bool = True) -> np.ndarray:
+    """
+    Berechnet die Ähnlichkeit aller Paare aus zwei Listen von Strings in einem einzigen Aufruf.
+    Jeder String wird nur einmal in Kleinbuchstaben umgewandelt, der Vergleich selbst läuft
+    vollständig in RapidFuzz. Die Werte sind identisch mit denen von `similar`.
+
+    Args:
+        a (list): Die Strings, die den Zeilen der Matrix entsprechen.
+        b (list): Die Strings, die den Spalten der Matrix entsprechen.
+        lower (bool): Ob die Strings in Kleinbuchstaben umgewandelt werden. Bei bereits mit
+            `normalisiere_name` normalisierten Strings kann darauf verzichtet werden.
+
+    Returns:
+        np.ndarray: Eine Matrix der Form (len(a), len(b)) mit Werten zwischen 0 und 1.
+    """
+    if not a or not b:
+        return np.zeros((len(a), len(b)), dtype=np.float64)
+    if lower:
+        a = [s.lower() for s in a]
+        b = [s.lower() for s in b]
+    return process.cdist(
+        a,
+        b,
+        scorer=Indel.normalized_similarity,
+        dtype=np.float64,
+    )
+
+
+def normalisiere_name(name) -> str:
+    """
+    Normalisiert einen Namen, damit Schreibvarianten beim Vergleich nicht bestraft werden.
+    Umlaute und Akzente werden mit der Zeichentabelle NORMALISIERUNG transliteriert
+    ("Müller" -> "mueller"), anschließend wird casefold angewendet, Bindestriche werden
+    zu Leerzeichen und mehrfache Leerzeichen werden zusammengefasst.
+
+    Args:
+        name: Der Name. Fehlende Werte (None, NaN) ergeben einen leeren String.
+
+    Returns:
+        str: Der normalisierte Name.
+    """
+    if name is None or name != name:
+        return ""
+    name = str(name).translate(NORMALISIERUNG).casefold().replace("-", " ")
+    return " ".join(name.split())
+
+
+def koelner_phonetik(wort: str) -> str:
+    """
+    Berechnet den phonetischen Code eines Wortes nach der Kölner Phonetik.
+    Gleich klingende Namen wie "Meier", "Mayer" und "Maier" erhalten denselben Code,
+    sodass sich damit schnell Kandidaten für einen Namensvergleich finden lassen.
+    Umlaute und Akzente werden vorher mithilfe von mappings.mappingusername ersetzt,
+    alle anderen Zeichen außer Buchstaben werden ignoriert.
+
+    Args:
+        wort (str): Das zu kodierende Wort.
+
+    Returns:
+        str: Der phonetische Code aus Ziffern, leer wenn das Wort keine Buchstaben enthält.
+    """
+    wort = re.sub(r"[^A-Z]", "", wort.translate(mappings.mappingusername).upper())
+    ziffern = []
+    for i, zeichen in enumerate(wort):
+        vorher = wort[i - 1] if i > 0 else ""
+        nachher = wort[i + 1] if i + 1 < len(wort) else ""
+        if zeichen in "AEIJOUY":
+            code = "0"
+        elif zeichen == "H":
+            code = ""
+        elif zeichen == "B":
+            code = "1"
+        elif zeichen == "P":
+            code = "3" if nachher == "H" else "1"
+        elif zeichen in "DT":
+            code = "8" if nachher in ("C", "S", "Z") else "2"
+        elif zeichen in "FVW":
+            code = "3"
+        elif zeichen in "GKQ":
+            code = "4"
+        elif zeichen == "C":
+            if i == 0:
+                code = "4" if nachher in ("A", "H", "K", "L", "O", "Q", "R", "U", "X") else "8"
+            elif vorher in ("S", "Z"):
+                code = "8"
+            else:
+                code = "4" if nachher in ("A", "H", "K", "O", "Q", "U", "X") else "8"
+        elif zeichen == "X":
+            code = "8" if vorher in ("C", "K", "Q") else "48"
+        elif zeichen == "L":
+            code = "5"
+        elif zeichen in "MN":
+            code = "6"
+        elif zeichen == "R":
+            code = "7"
+        else:  # S, Z
+            code = "8"
+        ziffern.append(code)
+
+    ergebnis = ""
+    letzte = None
+    for code in ziffern:
+        if code == "":
+            continue
+        for ziffer in code:
+            if ziffer != letzte:
+                ergebnis += ziffer
+            letzte = ziffer
+    return ergebnis[:1] + ergebnis[1:].replace("0", "")
+
+
 def returnUsername(given: str, last: str, typ: str) -> str:
     """
     Generiert einen Benutzernamen basierend auf dem Vor- und Nachnamen des Benutzers